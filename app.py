@@ -1,21 +1,36 @@
-from flask import Flask, jsonify, request, render_template, session, redirect, url_for
+from flask import Blueprint, Flask, current_app, jsonify, request, render_template, session, redirect, url_for
 from flask_cors import CORS
 import sqlite3
 import hashlib
+import hmac
 import secrets
 import datetime
 import json
 import os
 
-app = Flask(__name__)
-app.secret_key = 'shiksha-leap-secret-key-2024'
-CORS(app)
+from config import Config
+from database import init_db, import_udise_data
+from db_pool import get_connection, get_pool, init_pool
+import identity
+import roster
+import school_search
+from udise_directory import get_directory as get_udise_directory, init_directory as init_udise_directory
+from stats import ensure_student_stats
+from game_logs import insert_game_logs, summarize, validate_log, write_batch
+from log_queue import QueueFull, get_writer, init_writer
+from otp_store import OtpRateLimited, get_store as get_otp_store, init_store as init_otp_store
+from content_cache import get_cache as get_content_cache, init_cache as init_content_cache
+from content_bundle import get_store as get_bundle_store, init_store as init_bundle_store
+from content_manifest import get_manifest as get_content_manifest, init_manifest as init_content_manifest
+from game_launcher import LauncherBusy, get_launcher, init_launcher, launcher_enabled
+from game_registry import get_registry as get_game_registry, init_registry as init_game_registry
+from dashboard_cache import get_cache as get_dashboard_cache, init_cache as init_dashboard_cache, invalidate_schools
+
+main = Blueprint('main', __name__)
 
 def get_db_connection():
-    """Get database connection with row factory"""
-    conn = sqlite3.connect('shiksha_leap.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get a pooled database connection with row factory (close() returns it to the pool)"""
+    return get_connection()
 
 def hash_password(password):
     """Hash password using SHA-256"""
@@ -30,120 +45,225 @@ def send_otp(contact, otp):
     print(f"OTP for {contact}: {otp}")
     return True
 
+def rate_limited(error):
+    """429 response with Retry-After for an OtpRateLimited error"""
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
 # ==================== MAIN ROUTES ====================
 
-@app.route('/')
+@main.route('/')
 def index():
     """Main landing page"""
     return render_template('index.html')
 
-@app.route('/home')
+@main.route('/home')
 def home():
     """Home page after login - choose student/teacher"""
     if 'user_id' not in session:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     return render_template('home.html')
 
-@app.route('/registration')
+@main.route('/registration')
 def registration():
     """Registration form page"""
     if 'user_id' not in session:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     return render_template('registration.html')
 
-@app.route('/student/dashboard')
+@main.route('/student/dashboard')
 def student_dashboard():
     """Student dashboard - grade selection"""
     if 'user_id' not in session or session.get('role') != 'student':
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
-    conn = get_db_connection()
-    student = conn.execute('''
-        SELECT s.*, u.email FROM students s 
-        JOIN users u ON s.user_id = u.id 
-        WHERE s.user_id = ?
-    ''', (session['user_id'],)).fetchone()
-    conn.close()
+    student = identity.get_student(session['user_id'])
     
     return render_template('student_dashboard.html', student=student)
 
-@app.route('/student/grade/<int:grade>')
+@main.route('/student/grade/<int:grade>')
 def grade_view(grade):
     """Grade-specific learning page"""
     if 'user_id' not in session or session.get('role') != 'student':
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     return render_template('grade_view.html', grade=grade)
 
-@app.route('/game/<path:game_path>')
+@main.route('/game/<path:game_path>')
 def game_player(game_path):
     """Generic game player"""
     if 'user_id' not in session or session.get('role') != 'student':
-        return redirect(url_for('index'))
-    
-    # Check if it's a Python game
-    if game_path.startswith('grade_') and '/' in game_path:
-        grade, subject = game_path.split('/', 1)
-        return render_template('panda3d_game.html', grade=grade, subject=subject)
-    else:
-        return render_template('game_player.html', game_path=game_path)
+        return redirect(url_for('main.index'))
+    
+    # grade_<N>/<subject> is a Panda3D game if the game registry has one
+    grade_dir, _, subject = game_path.partition('/')
+    if grade_dir.startswith('grade_') and grade_dir[6:].isdigit():
+        game = get_game_registry().python_game(int(grade_dir[6:]), subject)
+        if game is not None:
+            return render_template('panda3d_game.html', grade=game.grade, subject=game.subject_id,
+                                   title=game.title)
+    return render_template('game_player.html', game_path=game_path)
 
-@app.route('/api/run-game', methods=['POST'])
+@main.route('/api/run-game', methods=['POST'])
 def run_game():
-    """Run a Panda3D game"""
+    """Launch a Panda3D game in a pre-warmed process (see game_launcher.py)"""
     if 'user_id' not in session or session.get('role') != 'student':
         return jsonify({'error': 'Not authorized'}), 403
     
-    data = request.get_json()
-    grade = data.get('grade')
+    if not current_app.config['GAME_LAUNCHER_ENABLED']:
+        return jsonify({'error': 'Games cannot be launched on this server'}), 503
+    
+    data = request.get_json(silent=True) or {}
     subject = data.get('subject')
+    try:
+        grade = int(data.get('grade'))
+    except (TypeError, ValueError):
+        return jsonify({'error': "'grade' must be an integer"}), 400
+    if not isinstance(subject, str):
+        return jsonify({'error': "'subject' is required"}), 400
+    
+    # Only games found by the registry scan can be run
+    entry = get_game_registry().python_game(grade, subject.lower())
+    if entry is None:
+        return jsonify({'error': f'Game not found: grade {grade} {subject}'}), 404
     
     try:
-        # Import and run the appropriate game
-        game_module = f"games.grade_{grade}.{subject}_game"
-        game = __import__(game_module, fromlist=[''])
-        
-        # Start the game in a separate process or thread
-        # For now, return success
-        return jsonify({'status': 'Game started', 'game_id': f"{grade}_{subject}"})
-    except ImportError as e:
-        return jsonify({'error': f'Game not found: {str(e)}'}), 404
-    except Exception as e:
-        return jsonify({'error': f'Failed to start game: {str(e)}'}), 500
-@app.route('/games/grade_<int:grade>/<game_file>')
+        game = get_launcher().launch(entry, session['user_id'])
+    except LauncherBusy as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    if game['status'] == 'failed':
+        return jsonify({'error': f"Failed to start game: {game['error']}", 'game': game}), 500
+    return jsonify({'message': 'Game started', 'game_id': game['game_id'], 'game': game})
+
+def launched_game(game_id):
+    """A launch record the logged-in student may see, or None"""
+    if 'user_id' not in session or not current_app.config['GAME_LAUNCHER_ENABLED']:
+        return None
+    game = get_launcher().status(game_id)
+    if game is None or game['user_id'] != session['user_id']:
+        return None
+    return game
+
+@main.route('/api/run-game/<game_id>')
+def run_game_status(game_id):
+    """Status of a launched game"""
+    game = launched_game(game_id)
+    if game is None:
+        return jsonify({'error': 'Game not found'}), 404
+    return jsonify(game)
+
+@main.route('/api/run-game/<game_id>/stop', methods=['POST'])
+def stop_game(game_id):
+    """Stop a launched game"""
+    if launched_game(game_id) is None:
+        return jsonify({'error': 'Game not found'}), 404
+    return jsonify(get_launcher().stop(game_id))
+
+def encoded_response(body, gzip_body, etag):
+    """JSON response, gzipped when the client accepts it, or 304 if the client's copy is current.
+    The gzipped body gets its own ETag ("<etag>-gz"): a strong ETag must
+    change with the bytes, or caches may mix the two encodings up."""
+    gzipped = gzip_body is not None and 'gzip' in request.accept_encodings
+    if gzipped:
+        etag = f'{etag}-gz'
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    elif gzipped:
+        response = current_app.response_class(gzip_body, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+    
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@main.route('/games/grade_<int:grade>/<game_file>')
 def serve_game_file(grade, game_file):
-    """Serve game JSON files"""
+    """Serve game JSON files from the content cache"""
     try:
-        game_file_path = f'games/grade_{grade}/{game_file}'
-        if os.path.exists(game_file_path):
-            with open(game_file_path, 'r', encoding='utf-8') as f:
-                game_data = json.load(f)
-            return jsonify(game_data)
-        else:
-            return jsonify({'error': 'Game not found'}), 404
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        entry = get_content_cache().get(grade, game_file)
+    except ValueError as e:
+        # A broken content file is treated like a missing one, as in the grade bundles
+        print(f"Not serving invalid game file grade_{grade}/{game_file}: {e}")
+        entry = None
+    if entry is None:
+        return jsonify({'error': 'Game not found'}), 404
+    
+    response = encoded_response(entry.body, entry.gzip_body, entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@main.route('/api/content/bundle/<int:grade>')
+def content_bundle_info(grade):
+    """Describe the current content bundle for a grade (hash, URL and index)"""
+    bundle = get_bundle_store().get(grade)
+    if bundle is None:
+        return jsonify({'error': 'No content for this grade'}), 404
+    
+    response = jsonify(bundle.describe())
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@main.route('/api/content/manifest')
+def content_manifest():
+    """Size and hash of every offline asset, for service worker delta sync"""
+    manifest = get_content_manifest().get()
+    if request.if_none_match.contains(manifest['version']):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(manifest)
+    response.set_etag(manifest['version'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@main.route('/api/games/catalog')
+def games_catalog():
+    """Subjects and games of a grade with their metadata, from the game registry"""
+    grade = request.args.get('grade', type=int)
+    if grade is None:
+        return jsonify({'error': "'grade' must be an integer"}), 400
+    
+    body, etag = get_game_registry().catalog(grade)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
-@app.route('/quiz/<path:quiz_path>')
+@main.route('/games/bundles/grade_<int:grade>/<bundle_hash>.json')
+def serve_content_bundle(grade, bundle_hash):
+    """Serve a content-addressed grade bundle; its URL changes whenever its content does"""
+    bundle = get_bundle_store().get(grade)
+    if bundle is None or bundle.hash != bundle_hash:
+        return jsonify({'error': 'Bundle not found'}), 404
+    
+    response = encoded_response(bundle.body, bundle.gzip_body, bundle.hash)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@main.route('/quiz/<path:quiz_path>')
 def quiz_player(quiz_path):
     """Quiz player"""
     if 'user_id' not in session or session.get('role') != 'student':
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     return render_template('quiz_player.html', quiz_path=quiz_path)
 
-@app.route('/student/profile')
+@main.route('/student/profile')
 def student_profile():
     """Student profile with achievements"""
     if 'user_id' not in session or session.get('role') != 'student':
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     conn = get_db_connection()
-    student = conn.execute('''
-        SELECT s.*, u.email FROM students s 
-        JOIN users u ON s.user_id = u.id 
-        WHERE s.user_id = ?
-    ''', (session['user_id'],)).fetchone()
+    student = identity.get_student(session['user_id'], conn)
     
     achievements = conn.execute('''
         SELECT * FROM achievements WHERE student_id = ? ORDER BY awarded_at DESC
@@ -153,25 +273,19 @@ def student_profile():
     
     return render_template('profile.html', student=student, achievements=achievements)
 
-@app.route('/teacher/dashboard')
+@main.route('/teacher/dashboard')
 def teacher_dashboard():
     """Teacher dashboard"""
     if 'user_id' not in session or session.get('role') != 'teacher':
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
-    conn = get_db_connection()
-    teacher = conn.execute('''
-        SELECT t.*, u.email FROM teachers t 
-        JOIN users u ON t.user_id = u.id 
-        WHERE t.user_id = ?
-    ''', (session['user_id'],)).fetchone()
-    conn.close()
+    teacher = identity.get_teacher(session['user_id'])
     
     return render_template('teacher_dashboard.html', teacher=teacher)
 
 # ==================== API ROUTES ====================
 
-@app.route('/api/send-otp', methods=['POST'])
+@main.route('/api/send-otp', methods=['POST'])
 def send_otp_api():
     """Send OTP to mobile/email"""
     data = request.get_json()
@@ -180,19 +294,12 @@ def send_otp_api():
     if not contact:
         return jsonify({'error': 'Contact is required'}), 400
     
-    # Generate OTP
+    # Generate and store OTP (see otp_store.py)
     otp = generate_otp()
-    otp_hash = hash_password(otp)
-    expires_at = datetime.datetime.now() + datetime.timedelta(minutes=10)
-    
-    # Store OTP in database
-    conn = get_db_connection()
-    conn.execute('''
-        INSERT INTO otp_verifications (contact, otp_code, otp_hash, expires_at)
-        VALUES (?, ?, ?, ?)
-    ''', (contact, otp, otp_hash, expires_at))
-    conn.commit()
-    conn.close()
+    try:
+        get_otp_store().issue(contact, otp)
+    except OtpRateLimited as e:
+        return rate_limited(e)
     
     # Send OTP (mock implementation)
     if send_otp(contact, otp):
@@ -200,7 +307,7 @@ def send_otp_api():
     else:
         return jsonify({'error': 'Failed to send OTP'}), 500
 
-@app.route('/api/verify-otp', methods=['POST'])
+@main.route('/api/verify-otp', methods=['POST'])
 def verify_otp_api():
     """Verify OTP and login/register user"""
     data = request.get_json()
@@ -210,21 +317,16 @@ def verify_otp_api():
     if not contact or not otp:
         return jsonify({'error': 'Contact and OTP are required'}), 400
     
-    conn = get_db_connection()
-    
     # Verify OTP
-    otp_record = conn.execute('''
-        SELECT * FROM otp_verifications 
-        WHERE contact = ? AND otp_code = ? AND expires_at > ? AND verified = 0
-        ORDER BY created_at DESC LIMIT 1
-    ''', (contact, otp, datetime.datetime.now())).fetchone()
+    try:
+        valid = get_otp_store().verify(contact, otp)
+    except OtpRateLimited as e:
+        return rate_limited(e)
     
-    if not otp_record:
-        conn.close()
+    if not valid:
         return jsonify({'error': 'Invalid or expired OTP'}), 400
     
-    # Mark OTP as verified
-    conn.execute('UPDATE otp_verifications SET verified = 1 WHERE id = ?', (otp_record['id'],))
+    conn = get_db_connection()
     
     # Check if user exists
     user = conn.execute('SELECT * FROM users WHERE email = ? OR mobile = ?', (contact, contact)).fetchone()
@@ -233,7 +335,6 @@ def verify_otp_api():
         # Existing user - login
         session['user_id'] = user['id']
         session['role'] = user['role']
-        conn.commit()
         conn.close()
         
         if user['role'] == 'student':
@@ -262,21 +363,44 @@ def verify_otp_api():
         
         return jsonify({'redirect': '/registration', 'new_user': True})
 
-@app.route('/api/school-info/<udise_code>')
+@main.route('/api/school-info/<udise_code>')
 def get_school_info(udise_code):
-    """Get school information by UDISE code"""
-    conn = get_db_connection()
-    school = conn.execute('''
-        SELECT * FROM udise_schools WHERE udise_code = ?
-    ''', (udise_code,)).fetchone()
-    conn.close()
-    
+    """Get school information by UDISE code (from the in-memory directory)"""
+    school = get_udise_directory().get(udise_code)
     if school:
-        return jsonify(dict(school))
+        return jsonify(school)
     else:
         return jsonify({'error': 'UDISE code not found'}), 404
 
-@app.route('/api/school-search')
+@main.route('/api/udise/districts')
+def udise_districts():
+    """Districts with block and school counts"""
+    return jsonify(get_udise_directory().districts())
+
+@main.route('/api/udise/districts/<district>/blocks')
+def udise_blocks(district):
+    """Blocks of a district with school counts"""
+    blocks = get_udise_directory().blocks(district)
+    if blocks is None:
+        return jsonify({'error': 'District not found'}), 404
+    return jsonify(blocks)
+
+@main.route('/api/udise/districts/<district>/blocks/<block>/schools')
+def udise_block_schools(district, block):
+    """Schools of a block, sorted by name (offset/limit paging)"""
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 100)), 1), 500)
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+    
+    result = get_udise_directory().schools(district, block, offset, limit)
+    if result is None:
+        return jsonify({'error': 'Block not found'}), 404
+    schools, total = result
+    return jsonify({'schools': schools, 'total': total, 'offset': offset, 'limit': limit})
+
+@main.route('/api/school-search')
 def search_schools():
     """Search schools by name or UDISE code"""
     query = request.args.get('q', '').strip()
@@ -285,16 +409,12 @@ def search_schools():
         return jsonify([])
     
     conn = get_db_connection()
-    schools = conn.execute('''
-        SELECT * FROM udise_schools 
-        WHERE udise_code LIKE ? OR school_name LIKE ? OR district LIKE ?
-        LIMIT 20
-    ''', (f'%{query}%', f'%{query}%', f'%{query}%')).fetchall()
+    schools = school_search.search_schools(conn, query, limit=20)
     conn.close()
     
     return jsonify([dict(school) for school in schools])
 
-@app.route('/api/register-student', methods=['POST'])
+@main.route('/api/register-student', methods=['POST'])
 def register_student():
     """Complete student registration"""
     if 'user_id' not in session:
@@ -303,7 +423,7 @@ def register_student():
     data = request.get_json()
     
     conn = get_db_connection()
-    conn.execute('''
+    cursor = conn.execute('''
         INSERT INTO students 
         (user_id, first_name, last_name, dob, grade, school_name, district, state, udise_code, medium)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -319,6 +439,7 @@ def register_student():
         data['udise_code'],
         data['medium']
     ))
+    ensure_student_stats(conn, cursor.lastrowid, data['udise_code'])
     
     # Update user role if needed
     conn.execute('UPDATE users SET role = ? WHERE id = ?', ('student', session['user_id']))
@@ -326,12 +447,16 @@ def register_student():
     conn.commit()
     conn.close()
     
+    # The school's roster and this user's identity changed
+    invalidate_schools([data['udise_code']])
+    identity.invalidate(session['user_id'])
+    
     session['role'] = 'student'
     session.pop('needs_registration', None)
     
     return jsonify({'message': 'Registration successful', 'redirect': '/student/dashboard'})
 
-@app.route('/api/register-teacher', methods=['POST'])
+@main.route('/api/register-teacher', methods=['POST'])
 def register_teacher():
     """Complete teacher registration"""
     if 'user_id' not in session:
@@ -363,159 +488,277 @@ def register_teacher():
     conn.commit()
     conn.close()
     
+    identity.invalidate(session['user_id'])
+    
     session['role'] = 'teacher'
     session.pop('needs_registration', None)
     
     return jsonify({'message': 'Registration successful', 'redirect': '/teacher/dashboard'})
 
-@app.route('/api/teacher/dashboard-data')
-def teacher_dashboard_data():
-    """Get teacher dashboard data"""
-    if 'user_id' not in session or session.get('role') != 'teacher':
-        return jsonify({'error': 'Not authorized'}), 403
-    
-    # Get filters
-    grade_filter = request.args.get('grade')
-    school_filter = request.args.get('school')
-    district_filter = request.args.get('district')
-    
-    conn = get_db_connection()
-    
-    # Get teacher info
-    teacher = conn.execute('''
-        SELECT * FROM teachers WHERE user_id = ?
-    ''', (session['user_id'],)).fetchone()
-    
-    # Build query for students in same school/district
+def load_dashboard_data(conn, udise_code, grade_filter=None):
+    """Students of a school with their summary stats, and subject-wise performance"""
+    # Students in the same school, with their summary stats (see stats.py)
     query = '''
         SELECT s.id, s.first_name, s.last_name, s.grade, s.school_name, s.district,
-               COUNT(gl.id) as total_games,
-               AVG(gl.score * 100.0 / gl.max_score) as avg_score,
-               MAX(gl.played_at) as last_activity
+               COALESCE(ss.total_games, 0) as total_games,
+               ss.score_pct_sum / ss.scored_games as avg_score,
+               ss.last_activity as last_activity
         FROM students s
-        LEFT JOIN game_logs gl ON s.id = gl.student_id
+        LEFT JOIN student_stats ss ON ss.student_id = s.id
         WHERE s.udise_code = ?
     '''
-    params = [teacher['udise_code']]
+    params = [udise_code]
     
     if grade_filter:
         query += ' AND s.grade = ?'
         params.append(grade_filter)
     
-    query += ' GROUP BY s.id ORDER BY s.grade, s.first_name'
+    query += ' ORDER BY s.grade, s.first_name'
     
     students = conn.execute(query, params).fetchall()
     
     # Get subject-wise performance
     subject_performance = conn.execute('''
-        SELECT gl.subject, AVG(gl.score * 100.0 / gl.max_score) as avg_score, COUNT(*) as total_attempts
-        FROM game_logs gl
-        JOIN students s ON gl.student_id = s.id
-        WHERE s.udise_code = ?
-        GROUP BY gl.subject
-    ''', (teacher['udise_code'],)).fetchall()
+        SELECT subject, score_pct_sum / scored_attempts as avg_score, total_attempts
+        FROM school_subject_stats
+        WHERE udise_code = ?
+        ORDER BY subject
+    ''', (udise_code,)).fetchall()
     
-    conn.close()
-    
-    return jsonify({
+    return {
         'students': [dict(student) for student in students],
-        'subject_performance': [dict(perf) for perf in subject_performance],
-        'teacher': dict(teacher)
-    })
+        'subject_performance': [dict(perf) for perf in subject_performance]
+    }
+
+@main.route('/api/teacher/dashboard-data')
+def teacher_dashboard_data():
+    """Get teacher dashboard data"""
+    if 'user_id' not in session or session.get('role') != 'teacher':
+        return jsonify({'error': 'Not authorized'}), 403
+    
+    # Only the grade filters the payload: the students are all from the teacher's
+    # school, so school and district filters would change nothing
+    grade_filter = request.args.get('grade') or None
+    if grade_filter is not None:
+        try:
+            grade_filter = int(grade_filter)
+        except ValueError:
+            return jsonify({'error': "'grade' must be an integer"}), 400
+    
+    # Get teacher info
+    teacher = identity.get_teacher(session['user_id'])
+    if not teacher:
+        return jsonify({'error': 'Teacher not found'}), 404
+    
+    # Student and subject data are shared by every teacher of the school
+    cache = get_dashboard_cache()
+    cache_key = (teacher['udise_code'], grade_filter)
+    entry = cache.get(cache_key)
+    if entry is None:
+        # Taken before reading, so a log write landing meanwhile keeps this payload out of the cache
+        generation = cache.generation(teacher['udise_code'])
+        conn = get_db_connection()
+        entry = cache.put(cache_key, teacher['udise_code'], load_dashboard_data(conn, teacher['udise_code'], grade_filter),
+                          generation)
+        conn.close()
+    
+    # The teacher's own row is not part of the cached payload
+    teacher_json = json.dumps(teacher, separators=(',', ':'), default=str).encode('utf-8')
+    etag = f"{entry.etag}-{hashlib.sha256(teacher_json).hexdigest()[:12]}"
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(entry.body[:-1] + b',"teacher":' + teacher_json + b'}',
+                                      mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@main.route('/api/teacher/roster')
+def teacher_roster():
+    """One page of the teacher's school roster (keyset pagination, see roster.py)"""
+    if 'user_id' not in session or session.get('role') != 'teacher':
+        return jsonify({'error': 'Not authorized'}), 403
+    
+    order = request.args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': "'order' must be asc or desc"}), 400
+    
+    teacher = identity.get_teacher(session['user_id'])
+    if not teacher:
+        return jsonify({'error': 'Teacher not found'}), 404
+    
+    conn = get_db_connection()
+    try:
+        page = roster.fetch_page(
+            conn, teacher['udise_code'],
+            sort=request.args.get('sort', 'name'),
+            descending=order == 'desc',
+            grade=request.args.get('grade') or None,
+            school=request.args.get('school') or None,
+            district=request.args.get('district') or None,
+            cursor=request.args.get('cursor') or None,
+            limit=request.args.get('limit', roster.DEFAULT_LIMIT)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+    
+    return jsonify(page)
 
-@app.route('/api/game-log', methods=['POST'])
+@main.route('/api/game-log', methods=['POST'])
 def log_game_performance():
     """Log student game/quiz performance"""
     if 'user_id' not in session or session.get('role') != 'student':
         return jsonify({'error': 'Not authorized'}), 403
     
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON body required'}), 400
     
-    conn = get_db_connection()
+    # played_at is always the server time here
+    try:
+        row = validate_log(dict(data, played_at=None))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Get student ID
-    student = conn.execute('SELECT id FROM students WHERE user_id = ?', (session['user_id'],)).fetchone()
+    student = identity.get_student(session['user_id'])
     if not student:
-        conn.close()
         return jsonify({'error': 'Student not found'}), 404
     
-    # Log the performance
-    conn.execute('''
-        INSERT INTO game_logs 
-        (student_id, subject, grade, game_id, game_type, level, score, max_score, time_spent, synced)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-    ''', (
-        student['id'],
-        data['subject'],
-        data['grade'],
-        data['game_id'],
-        data.get('game_type', 'game'),
-        data.get('level', 'medium'),
-        data['score'],
-        data['max_score'],
-        data.get('time_spent', 0)
-    ))
-    
-    conn.commit()
-    conn.close()
+    if not current_app.config['LOG_QUEUE_ENABLED']:
+        conn = get_db_connection()
+        status = write_batch(conn, [(student, row)])[0]
+        conn.close()
+        return jsonify({'message': 'Performance logged successfully', 'status': status})
     
-    return jsonify({'message': 'Performance logged successfully'})
+    # Hand the log to the group-commit writer thread (see log_queue.py)
+    try:
+        client_log_id = get_writer().submit(student, row)
+    except QueueFull:
+        response = jsonify({'error': 'Server busy, please retry'})
+        response.headers['Retry-After'] = str(current_app.config['LOG_QUEUE_RETRY_AFTER'])
+        return response, 503
+    
+    return jsonify({'message': 'Performance logged successfully', 'status': 'queued',
+                    'client_log_id': client_log_id}), 202
 
-@app.route('/api/sync-offline-data', methods=['POST'])
+@main.route('/api/sync-offline-data', methods=['POST'])
 def sync_offline_data():
-    """Sync offline game logs"""
+    """Sync offline game logs in one batch; retried logs are de-duplicated by client_log_id"""
     if 'user_id' not in session or session.get('role') != 'student':
         return jsonify({'error': 'Not authorized'}), 403
     
-    data = request.get_json()
-    logs = data.get('logs', [])
-    
-    conn = get_db_connection()
-    student = conn.execute('SELECT id FROM students WHERE user_id = ?', (session['user_id'],)).fetchone()
+    data = request.get_json(silent=True)
+    logs = data.get('logs', []) if isinstance(data, dict) else None
+    if not isinstance(logs, list):
+        return jsonify({'error': "'logs' must be a list"}), 400
+    if len(logs) > current_app.config['SYNC_MAX_BATCH']:
+        return jsonify({'error': f"At most {current_app.config['SYNC_MAX_BATCH']} logs per batch"}), 413
     
+    student = identity.get_student(session['user_id'])
     if not student:
-        conn.close()
         return jsonify({'error': 'Student not found'}), 404
     
-    synced_count = 0
-    for log in logs:
-        try:
-            conn.execute('''
-                INSERT INTO game_logs 
-                (student_id, subject, grade, game_id, game_type, level, score, max_score, time_spent, played_at, synced)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-            ''', (
-                student['id'],
-                log['subject'],
-                log['grade'],
-                log['game_id'],
-                log.get('game_type', 'game'),
-                log.get('level', 'medium'),
-                log['score'],
-                log['max_score'],
-                log.get('time_spent', 0),
-                log.get('played_at', datetime.datetime.now())
-            ))
-            synced_count += 1
-        except Exception as e:
-            print(f"Error syncing log: {e}")
-    
-    conn.commit()
+    conn = get_db_connection()
+    results = insert_game_logs(conn, student, logs, default_played_at=datetime.datetime.now())
     conn.close()
     
-    return jsonify({'message': f'Synced {synced_count} logs successfully'})
+    counts = summarize(results)
+    return jsonify({
+        'message': f"Synced {counts['accepted']} logs successfully",
+        **counts,
+        'results': results
+    })
+
+@main.route('/api/metrics')
+def metrics():
+    """Runtime counters for monitoring (teachers, or a request with the metrics token)"""
+    token = current_app.config['METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    has_token = bool(token) and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+    if not has_token and ('user_id' not in session or session.get('role') != 'teacher'):
+        return jsonify({'error': 'Not authorized'}), 403
 
-@app.route('/logout')
+    return jsonify({
+        'db_pool': get_pool().stats(),
+        'game_log_queue': get_writer().stats(),
+        'content_cache': get_content_cache().stats(),
+        'content_bundles': get_bundle_store().stats(),
+        'content_manifest': get_content_manifest().stats(),
+        'dashboard_cache': get_dashboard_cache().stats(),
+        'identity_cache': identity.get_cache().stats(),
+        'otp_store': get_otp_store().stats(),
+        'game_registry': get_game_registry().stats(),
+        'game_launcher': get_launcher().stats()
+    })
+
+@main.route('/logout')
 def logout():
     """Logout user"""
     session.clear()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-if __name__ == '__main__':
-    # Initialize database if it doesn't exist
-    if not os.path.exists('shiksha_leap.db'):
-        from database import init_db, import_udise_data
+# ==================== APP FACTORY ====================
+
+def create_app(config=Config):
+    """Build the Flask app and this process's shared state from a configuration object
+
+    Safe to run in every worker at once (migrations serialize on the write
+    lock), or once before forking when the server preloads the app: the
+    pool and game log writer notice the fork and start afresh in each
+    worker, while the UDISE directory and content manifest loaded here are
+    shared copy-on-write.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
+    if not app.config['SECRET_KEY']:
+        # Identical in every worker only if the app is created before forking
+        print("Warning: SHIKSHA_SECRET_KEY is not set; using a random key, sessions end on restart")
+        app.config['SECRET_KEY'] = secrets.token_hex(32)
+    if config.GAME_LAUNCHER_ENABLED and not launcher_enabled(config):
+        print(f"Warning: the game launcher needs SHIKSHA_WORKERS=1 (not {config.WORKERS}); games cannot be launched")
+    app.config['GAME_LAUNCHER_ENABLED'] = launcher_enabled(config)
+    CORS(app)
+    app.register_blueprint(main)
+
+    init_pool(config)
+    if config.DB_INIT_ON_STARTUP:
         init_db()
+    conn = get_connection()
+    try:
+        school_search.init_search(conn)
+    finally:
+        conn.close()
+
+    init_writer(config)
+    init_dashboard_cache(config)
+    identity.init_cache(config)
+    init_otp_store(config)
+    init_bundle_store(init_content_cache(config))
+    init_game_registry(config)
+    # Game processes are only spawned on first use, in the process that serves the request
+    init_launcher(config)
+
+    # Hash the offline assets and load the UDISE directory up front rather
+    # than on the first request
+    init_content_manifest(config).get()
+    init_udise_directory(config)
+
+    # Don't hand connections opened here to forked workers
+    get_pool().close_all()
+    return app
+
+if __name__ == '__main__':
+    # Load UDISE data the first time the database is created
+    is_new_db = not os.path.exists(Config.DATABASE_PATH)
+    app = create_app()
+    if is_new_db:
         import_udise_data()
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    if launcher_enabled() and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Warm game processes in the reloader's serving process only
+        get_launcher().start()
+
+    app.run(debug=True, host='0.0.0.0', port=5000)
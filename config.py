@@ -0,0 +1,106 @@
+"""
+Configuration for Shiksha Leap
+Every setting can be overridden through an environment variable of the same
+name prefixed with SHIKSHA_ (e.g. SHIKSHA_DATABASE_PATH=/data/shiksha.db)
+"""
+
+import os
+
+
+def _env(name, default, cast=str):
+    """Read a SHIKSHA_* environment variable, falling back to a default"""
+    value = os.environ.get(f'SHIKSHA_{name}')
+    if value is None:
+        return default
+    return cast(value)
+
+
+def _flag(value):
+    return value.lower() in ('1', 'true', 'yes')
+
+
+class Config:
+    """Default application configuration"""
+
+    # Session signing key; must be the same in every worker (set it in production)
+    SECRET_KEY = _env('SECRET_KEY', None)
+
+    # Create tables and apply pending migrations when the app is created
+    # (safe from several workers at once; turn off to migrate out of band)
+    DB_INIT_ON_STARTUP = _env('DB_INIT_ON_STARTUP', True, _flag)
+
+    # /api/metrics is open to logged-in teachers, and to monitoring that sends
+    # "Authorization: Bearer <token>" when this is set
+    METRICS_TOKEN = _env('METRICS_TOKEN', None)
+
+    # SQLite database file shared by all workers
+    DATABASE_PATH = _env('DATABASE_PATH', 'shiksha_leap.db')
+
+    # Connection pool - connections kept open per worker process
+    DB_POOL_SIZE = _env('DB_POOL_SIZE', 8, int)
+    DB_POOL_TIMEOUT = _env('DB_POOL_TIMEOUT', 10.0, float)  # seconds to wait for a free connection
+
+    # SQLite pragmas applied to every pooled connection
+    DB_BUSY_TIMEOUT_MS = _env('DB_BUSY_TIMEOUT_MS', 5000, int)
+    DB_SYNCHRONOUS = _env('DB_SYNCHRONOUS', 'NORMAL')  # NORMAL is durable enough under WAL
+    DB_CACHE_SIZE_KB = _env('DB_CACHE_SIZE_KB', 16384, int)
+    DB_MMAP_SIZE = _env('DB_MMAP_SIZE', 64 * 1024 * 1024, int)
+
+    # Largest batch of offline game logs accepted by /api/sync-offline-data
+    SYNC_MAX_BATCH = _env('SYNC_MAX_BATCH', 50000, int)
+
+    # Write-behind queue for /api/game-log (group commit from a writer thread)
+    LOG_QUEUE_ENABLED = _env('LOG_QUEUE_ENABLED', True, _flag)
+    LOG_QUEUE_CAPACITY = _env('LOG_QUEUE_CAPACITY', 10000, int)
+    LOG_QUEUE_BATCH_ROWS = _env('LOG_QUEUE_BATCH_ROWS', 500, int)
+    LOG_QUEUE_FLUSH_MS = _env('LOG_QUEUE_FLUSH_MS', 50, int)
+    LOG_QUEUE_SPILL_DIR = _env('LOG_QUEUE_SPILL_DIR', 'spill')
+    LOG_QUEUE_RETRY_AFTER = _env('LOG_QUEUE_RETRY_AFTER', 2, int)  # seconds, sent with 503 when full
+
+    # Directory holding games/grade_N/*.json content served by the app
+    GAMES_DIR = _env('GAMES_DIR', 'games')
+
+    # How often the game registry checks games/grade_N/ for added or changed games (seconds)
+    GAME_REGISTRY_POLL_SECONDS = _env('GAME_REGISTRY_POLL_SECONDS', 2.0, float)
+
+    # How often /api/content/manifest re-scans the asset directories (seconds)
+    MANIFEST_REFRESH_SECONDS = _env('MANIFEST_REFRESH_SECONDS', 2.0, float)
+
+    # Teacher dashboard response cache (per worker; writes invalidate a school's entries)
+    DASHBOARD_CACHE_MAX_ENTRIES = _env('DASHBOARD_CACHE_MAX_ENTRIES', 1024, int)
+    DASHBOARD_CACHE_TTL = _env('DASHBOARD_CACHE_TTL', 30.0, float)  # seconds
+
+    # How often each worker checks whether the UDISE directory needs reloading (seconds)
+    UDISE_DIRECTORY_CHECK_SECONDS = _env('UDISE_DIRECTORY_CHECK_SECONDS', 30.0, float)
+
+    # Per-worker cache of the logged-in user's student/teacher record
+    IDENTITY_CACHE_MAX_ENTRIES = _env('IDENTITY_CACHE_MAX_ENTRIES', 10000, int)
+    IDENTITY_CACHE_TTL = _env('IDENTITY_CACHE_TTL', 300.0, float)  # seconds
+
+    # OTP storage: 'memory' (per worker, default) or 'sqlite' (shared by all workers)
+    OTP_STORE = _env('OTP_STORE', 'memory')
+    OTP_TTL_SECONDS = _env('OTP_TTL_SECONDS', 600, int)
+    OTP_MAX_SENDS = _env('OTP_MAX_SENDS', 5, int)  # per contact per send window
+    OTP_SEND_WINDOW_SECONDS = _env('OTP_SEND_WINDOW_SECONDS', 900, int)
+    OTP_MAX_ATTEMPTS = _env('OTP_MAX_ATTEMPTS', 5, int)  # wrong codes before a lockout
+    OTP_LOCKOUT_SECONDS = _env('OTP_LOCKOUT_SECONDS', 900, int)
+    OTP_PURGE_INTERVAL_SECONDS = _env('OTP_PURGE_INTERVAL_SECONDS', 300, int)  # sqlite store only
+
+    # Pre-warmed Panda3D processes behind /api/run-game (lab kiosks with a display)
+    GAME_LAUNCHER_ENABLED = _env('GAME_LAUNCHER_ENABLED', False, _flag)
+    GAME_LAUNCHER_POOL_SIZE = _env('GAME_LAUNCHER_POOL_SIZE', 1, int)  # idle warm processes
+    GAME_LAUNCHER_MAX_RUNNING = _env('GAME_LAUNCHER_MAX_RUNNING', 2, int)
+    GAME_LAUNCHER_TIMEOUT_SECONDS = _env('GAME_LAUNCHER_TIMEOUT_SECONDS', 3600, int)
+    GAME_LAUNCHER_WINDOW_TYPE = _env('GAME_LAUNCHER_WINDOW_TYPE', 'onscreen')  # or offscreen / none
+    # Record every launched game here for replay (game_replay.py); unset to not record
+    GAME_RECORDINGS_DIR = _env('GAME_RECORDINGS_DIR', None)
+    # Games' procedural scenery compiled to .bam files (games/asset_cache.py)
+    GAME_ASSET_CACHE_DIR = _env('GAME_ASSET_CACHE_DIR', 'asset_cache')
+
+    # Production server (gunicorn.conf.py)
+    BIND = _env('BIND', '0.0.0.0:5000')
+    # Server processes sharing the database; 1 for `python app.py`, and set by
+    # gunicorn.conf.py (one per CPU unless SHIKSHA_WORKERS is given)
+    WORKERS = _env('WORKERS', 1, int)
+    WORKER_THREADS = _env('WORKER_THREADS', 4, int)  # request threads per worker
+    WORKER_TIMEOUT = _env('WORKER_TIMEOUT', 120, int)  # seconds
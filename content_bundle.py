@@ -0,0 +1,159 @@
+"""
+Per-grade content bundles for Shiksha Leap
+Packs every game/quiz JSON of a grade into a single gzipped JSON document
+with an index, so a device can take a grade offline in one request. Bundles are named by the hash of
+their contents and served as immutable; clients find the current one
+through /api/content/bundle/<grade>. Every worker builds byte-identical
+bundles from the same files, so the hash is the same behind any worker.
+
+Game files carry no language (the UI is translated, see static/locales/),
+so there is one bundle per grade.
+
+Bundle format: {"grade", "index": [{file, game_id, title,
+subject, game_type, etag, size}], "files": {file: <game JSON>}}
+
+Usage: python content_bundle.py [grade ...]
+"""
+
+import gzip
+import hashlib
+import json
+import sys
+import threading
+
+from content_cache import get_cache
+
+
+class Bundle:
+    """One built bundle"""
+
+    __slots__ = ('grade', 'hash', 'body', 'gzip_body', 'index', 'signature')
+
+    def __init__(self, grade, body, index, signature):
+        self.grade = grade
+        self.hash = hashlib.sha256(body).hexdigest()[:32]
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        self.index = index
+        self.signature = signature
+
+    @property
+    def url(self):
+        return f'/games/bundles/grade_{self.grade}/{self.hash}.json'
+
+    def describe(self):
+        """Pointer document for /api/content/bundle/<grade>"""
+        return {
+            'grade': self.grade,
+            'hash': self.hash,
+            'url': self.url,
+            'size': len(self.body),
+            'compressed_size': len(self.gzip_body),
+            'files': self.index
+        }
+
+
+class BundleStore:
+    """Builds bundles on first use and rebuilds them when a file changes"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._bundles = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def _entries(self, grade):
+        """(file, entry) for every readable game file of a grade"""
+        entries = []
+        for name in self.cache.list_files(grade):
+            try:
+                entry = self.cache.get(grade, name)
+            except ValueError as e:
+                print(f"Skipping invalid game file grade_{grade}/{name}: {e}")
+                continue
+            if entry is not None:
+                entries.append((name, entry))
+        return entries
+
+    def get(self, grade):
+        """Current bundle for a grade (None if it has no content)"""
+        entries = self._entries(grade)
+        signature = tuple((name, entry.etag) for name, entry in entries)
+
+        bundle = self._bundles.get(grade)
+        if bundle is not None and bundle.signature == signature:
+            return bundle
+
+        with self._lock:
+            bundle = self._bundles.get(grade)
+            if bundle is not None and bundle.signature == signature:
+                return bundle
+            bundle = self._build(grade, entries, signature)
+            # Grades without content aren't kept, so only real grades take up memory
+            if bundle is None:
+                self._bundles.pop(grade, None)
+            else:
+                self._bundles[grade] = bundle
+            return bundle
+
+    def _build(self, grade, entries, signature):
+        index = []
+        parts = []
+        for name, entry in entries:
+            data = json.loads(entry.body)
+            index.append({
+                'file': name,
+                'game_id': data.get('game_id', name[:-len('.json')]),
+                'title': data.get('title'),
+                'subject': data.get('subject'),
+                'game_type': data.get('game_type'),
+                'etag': entry.etag,
+                'size': len(entry.body)
+            })
+            # Splice the cached bytes in rather than re-serializing each file
+            parts.append(json.dumps(name).encode('utf-8') + b':' + entry.body)
+        if not index:
+            return None
+
+        header = json.dumps({'grade': grade, 'index': index},
+                            ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        body = header[:-1] + b',"files":{' + b','.join(parts) + b'}}'
+        self.builds += 1
+        return Bundle(grade, body, index, signature)
+
+    def stats(self):
+        """Bundle counters for monitoring"""
+        bundles = list(self._bundles.values())
+        return {
+            'bundles': len(bundles),
+            'builds': self.builds,
+            'bytes': sum(len(b.body) + len(b.gzip_body) for b in bundles)
+        }
+
+
+_store = None
+
+
+def init_store(cache=None):
+    """Create the process-wide bundle store over a content cache"""
+    global _store
+    _store = BundleStore(cache or get_cache())
+    return _store
+
+
+def get_store():
+    """Get the process-wide bundle store, creating it if needed"""
+    if _store is None:
+        return init_store()
+    return _store
+
+
+if __name__ == '__main__':
+    grades = [int(arg) for arg in sys.argv[1:]] or range(6, 13)
+    for grade in grades:
+        bundle = get_store().get(grade)
+        if bundle is None:
+            print(f"grade {grade}: no content")
+            continue
+        print(f"grade {grade}: {len(bundle.index)} files, {len(bundle.body):,} bytes "
+              f"-> {len(bundle.gzip_body):,} gzipped, hash {bundle.hash}")
@@ -0,0 +1,141 @@
+"""
+Game content cache for Shiksha Leap
+Keeps each games/grade_N/*.json file as ready-to-send bytes (plain and
+gzipped) with a content-hash ETag, so serving it costs a stat() instead of
+open + json.load + jsonify (the gzipped body is sent as "<etag>-gz"). An
+entry is reloaded when the file's mtime or size changes.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+
+from config import Config
+
+# Game and quiz files are plain names like maths_game1.json
+GAME_FILE_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_\-]*\.json$')
+
+# Below this the gzip header costs more than it saves
+GZIP_MIN_BYTES = 256
+
+
+class ContentEntry:
+    """One serialized game file"""
+
+    __slots__ = ('body', 'gzip_body', 'etag', 'mtime_ns', 'size')
+
+    def __init__(self, body, mtime_ns, size):
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=9, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+
+class ContentCache:
+    """Thread-safe cache of game JSON files under one root directory"""
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.errors = 0
+
+    def resolve(self, grade, filename):
+        """Absolute path of a game file, or None if the name is not allowed"""
+        if not GAME_FILE_RE.match(filename):
+            return None
+        path = os.path.realpath(os.path.join(self.root, f'grade_{int(grade)}', filename))
+        if os.path.commonpath([path, self.root]) != self.root:
+            return None
+        return path
+
+    def list_files(self, grade):
+        """Sorted names of the servable game files for a grade"""
+        try:
+            names = os.listdir(os.path.join(self.root, f'grade_{int(grade)}'))
+        except OSError:
+            return []
+        return sorted(name for name in names if GAME_FILE_RE.match(name))
+
+    def get(self, grade, filename):
+        """Cached entry for a game file, or None if it doesn't exist
+
+        Raises ValueError if the file is not valid JSON.
+        """
+        path = self.resolve(grade, filename)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+
+        entry = self._entries.get(path)
+        if entry is not None and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+            self.hits += 1
+            return entry
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError:
+            # Don't keep serving the previous version (and its ETag) of a file that is now broken
+            with self._lock:
+                self._entries.pop(path, None)
+                self.errors += 1
+            raise
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        new_entry = ContentEntry(body, st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+            self._entries[path] = new_entry
+        return new_entry
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Cache counters for monitoring"""
+        entries = list(self._entries.values())
+        lookups = self.hits + self.misses + self.reloads
+        return {
+            'entries': len(entries),
+            'bytes': sum(len(e.body) + len(e.gzip_body or b'') for e in entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+            'errors': self.errors,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+_cache = None
+
+
+def init_cache(config=Config):
+    """Create the process-wide cache for a configuration's games directory"""
+    global _cache
+    _cache = ContentCache(config.GAMES_DIR)
+    return _cache
+
+
+def get_cache():
+    """Get the process-wide cache, creating it from the default config if needed"""
+    if _cache is None:
+        return init_cache()
+    return _cache
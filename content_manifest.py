@@ -0,0 +1,258 @@
+"""
+Content manifest for Shiksha Leap
+Lists every asset the service worker keeps offline (game JSON under
+GAMES_DIR, static/locales/ and static/js/) with its size and a content hash,
+so a device can diff its cached copy against the server and download only
+what changed. Files are re-hashed only when their mtime or size changes; the
+directories are re-scanned at most every MANIFEST_REFRESH_SECONDS.
+
+Usage: python content_manifest.py          # print the manifest
+       python content_manifest.py --check  # one-file change -> one download (with node
+                                           # installed, also through service-worker.js)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from config import Config
+
+# (directory relative to the app root, URL prefix, file extensions); the
+# games directory comes from the configuration, see manifest_sources()
+STATIC_SOURCES = [
+    ('static/locales', '/static/locales', ('.json',)),
+    ('static/js', '/static/js', ('.js',))
+]
+
+SERVICE_WORKER = 'service-worker.js'
+
+
+def manifest_sources(config=Config):
+    """Manifest sources, with game JSON read from GAMES_DIR (what /games/... serves)"""
+    return [(config.GAMES_DIR, '/games', ('.json',))] + STATIC_SOURCES
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()[:32]
+
+
+def diff_manifests(previous, current):
+    """URLs to download and to drop when moving from one manifest to another
+
+    Mirrors diffManifests() in service-worker.js.
+    """
+    old_assets = (previous or {}).get('assets', {})
+    new_assets = current.get('assets', {})
+    changed = sorted(url for url, asset in new_assets.items()
+                     if old_assets.get(url, {}).get('hash') != asset['hash'])
+    removed = sorted(url for url in old_assets if url not in new_assets)
+    return changed, removed
+
+
+class ContentManifest:
+    """Incrementally maintained manifest of offline assets under one root"""
+
+    def __init__(self, root='.', sources=None, refresh_seconds=2.0):
+        self.root = root
+        self.sources = manifest_sources() if sources is None else sources
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._files = {}
+        self._manifest = None
+        self._checked_at = 0.0
+        self.scans = 0
+        self.hashed = 0
+
+    def _walk(self):
+        """Yield (url, path) for every asset in the manifest sources"""
+        for directory, prefix, extensions in self.sources:
+            base = os.path.join(self.root, directory)
+            for dirpath, dirnames, filenames in os.walk(base):
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith(('.', '__')))
+                relative = os.path.relpath(dirpath, base)
+                for name in sorted(filenames):
+                    if not name.endswith(extensions):
+                        continue
+                    parts = [prefix] if relative == '.' else [prefix, relative.replace(os.sep, '/')]
+                    yield '/'.join(parts + [name]), os.path.join(dirpath, name)
+
+    def refresh(self):
+        """Re-scan the asset directories, re-hashing only changed files"""
+        files = {}
+        for url, path in self._walk():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            known = self._files.get(url)
+            if known is not None and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+                files[url] = known
+            else:
+                files[url] = (st.st_mtime_ns, st.st_size, _file_hash(path))
+                self.hashed += 1
+        self.scans += 1
+
+        if self._manifest is None or files != self._files:
+            assets = {url: {'size': size, 'hash': digest} for url, (_, size, digest) in sorted(files.items())}
+            version = hashlib.sha256(json.dumps(assets, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+            self._manifest = {'version': version, 'assets': assets}
+        self._files = files
+        self._checked_at = time.monotonic()
+        return self._manifest
+
+    def get(self):
+        """Current manifest, re-scanning if the last scan is older than the refresh interval"""
+        if self._manifest is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return self._manifest
+        with self._lock:
+            if self._manifest is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+                return self._manifest
+            return self.refresh()
+
+    def stats(self):
+        """Manifest counters for monitoring"""
+        return {
+            'assets': len(self._files),
+            'version': self._manifest['version'] if self._manifest else None,
+            'scans': self.scans,
+            'files_hashed': self.hashed
+        }
+
+
+_manifest = None
+
+
+def init_manifest(config=Config):
+    """Create the process-wide manifest from a configuration object"""
+    global _manifest
+    _manifest = ContentManifest(sources=manifest_sources(config), refresh_seconds=config.MANIFEST_REFRESH_SECONDS)
+    return _manifest
+
+
+def get_manifest():
+    """Get the process-wide manifest, creating it from the default config if needed"""
+    if _manifest is None:
+        return init_manifest()
+    return _manifest
+
+
+# Runs service-worker.js in a node vm with an in-memory Cache Storage and a
+# fake server, calling syncContent() once per step of the JSON read from stdin
+# ({"steps": [{"manifest", "fail": [urls]}]}); prints the URLs each step fetched
+_SYNC_HARNESS = r"""
+const fs = require('fs');
+const vm = require('vm');
+const stored = new Map();
+const cache = {
+  match: async url => stored.has(url) ? new Response(stored.get(url)) : undefined,
+  put: async (url, response) => { stored.set(url, await response.text()); },
+  delete: async url => stored.delete(url)
+};
+let step = null;
+let fetched = [];
+const context = vm.createContext({
+  self: { addEventListener() {} },
+  caches: { open: async () => cache },
+  clients: {},
+  console: { log() {}, error() {} },
+  Response,
+  fetch: async url => {
+    if (url === '/api/content/manifest') {
+      return new Response(JSON.stringify(step.manifest));
+    }
+    fetched.push(url);
+    if (step.fail.includes(url)) {
+      throw new TypeError('network error');
+    }
+    return new Response(url);
+  }
+});
+vm.runInContext(fs.readFileSync(process.argv[1], 'utf8'), context);
+(async () => {
+  const results = [];
+  for (step of JSON.parse(fs.readFileSync(0, 'utf8')).steps) {
+    fetched = [];
+    await vm.runInContext('syncContent()', context);
+    results.push(fetched.sort());
+  }
+  console.log(JSON.stringify(results));
+})();
+"""
+
+
+def _service_worker_syncs(steps):
+    """URLs service-worker.js syncContent() downloads for each (manifest, failing URLs) step"""
+    data = json.dumps({'steps': [{'manifest': manifest, 'fail': fail} for manifest, fail in steps]})
+    result = subprocess.run(['node', '-e', _SYNC_HARNESS, os.path.abspath(SERVICE_WORKER)],
+                            input=data, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def check():
+    """Change one file in a copy of the assets and verify only it is downloaded, by
+    diff_manifests() and, if node is installed, by the service worker's syncContent()"""
+    with tempfile.TemporaryDirectory() as tmp:
+        # Copy each source to the path of its URL prefix, wherever GAMES_DIR is
+        sources = []
+        for directory, prefix, extensions in manifest_sources():
+            shutil.copytree(directory, os.path.join(tmp, prefix.lstrip('/')))
+            sources.append((prefix.lstrip('/'), prefix, extensions))
+
+        manifest = ContentManifest(tmp, sources, refresh_seconds=0)
+        before = manifest.refresh()
+        changed, removed = diff_manifests(None, before)
+        assert changed == sorted(before['assets']) and not removed
+        hashed = manifest.hashed
+
+        same = manifest.refresh()
+        assert diff_manifests(before, same) == ([], []) and same['version'] == before['version']
+        assert manifest.hashed == hashed, 'unchanged files were re-hashed'
+
+        def update(url):
+            path = os.path.join(tmp, url.lstrip('/'))
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            data['title'] += ' (updated)'
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            return manifest.refresh()
+
+        first, second = '/games/grade_6/maths_game1.json', '/games/grade_6/maths_game2.json'
+        after = update(first)
+        changed, removed = diff_manifests(before, after)
+        assert changed == [first], changed
+        assert not removed and after['version'] != before['version']
+        assert manifest.hashed == hashed + 1
+        print(f"OK: {len(before['assets'])} assets, one change -> {len(changed)} download")
+
+        if shutil.which('node') is None:
+            print("Skipped the service worker check: node is not installed")
+            return
+        later = update(second)
+        syncs = _service_worker_syncs([
+            (before, []),        # empty cache: everything
+            (same, []),          # same version: nothing
+            (after, []),         # one file changed: just it
+            (later, [second]),   # its download fails...
+            (later, [])          # ...so the next sync of the same version retries just it
+        ])
+        assert syncs == [sorted(before['assets']), [], [first], [second], [second]], syncs
+        print(f"OK: service-worker.js syncContent() downloaded {len(syncs[0])}, 0, 1, then retried "
+              f"1 failed download")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--check']:
+        check()
+    else:
+        print(json.dumps(get_manifest().get(), indent=2))
@@ -0,0 +1,156 @@
+"""
+Teacher dashboard response cache for Shiksha Leap
+Keeps the serialized student/subject payload of /api/teacher/dashboard-data
+keyed by (udise_code, grade), with a TTL and an LRU size limit. Game log
+writes drop the entries of the schools they touch (see
+game_logs.write_batch); the TTL bounds staleness for writes that happened
+in another worker process. A payload computed while its school was
+invalidated is not stored: callers take generation() before reading the
+database and pass it to put().
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+
+class CachedResponse:
+    """One serialized dashboard payload"""
+
+    __slots__ = ('body', 'etag', 'expires', 'udise_code')
+
+    def __init__(self, body, udise_code, expires):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.expires = expires
+        self.udise_code = udise_code
+
+
+class DashboardCache:
+    """Thread-safe TTL + LRU cache of dashboard payloads, invalidated per school"""
+
+    def __init__(self, max_entries=1024, ttl_seconds=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._by_school = {}
+        self._generations = {}  # udise_code -> invalidations so far
+        self._clears = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_fills = 0
+
+    def generation(self, udise_code):
+        """Token that changes whenever a school's entries are invalidated"""
+        with self._lock:
+            return (self._clears, self._generations.get(udise_code, 0))
+
+    def get(self, key):
+        """Fresh cached response for a key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires <= time.monotonic():
+                self._remove(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, udise_code, payload, generation=None):
+        """Serialize and store a payload dict; returns the cached response. With the
+        generation() taken before the payload was read, it is only stored if the
+        school wasn't invalidated meanwhile"""
+        body = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+        entry = CachedResponse(body, udise_code, time.monotonic() + self.ttl)
+        with self._lock:
+            if generation is not None and generation != (self._clears, self._generations.get(udise_code, 0)):
+                self.stale_fills += 1
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._by_school.setdefault(udise_code, set()).add(key)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+        keys = self._by_school.get(entry.udise_code)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_school[entry.udise_code]
+
+    def invalidate_schools(self, udise_codes):
+        """Drop every cached response for the given schools"""
+        with self._lock:
+            for udise_code in set(udise_codes):
+                self._generations[udise_code] = self._generations.get(udise_code, 0) + 1
+                for key in list(self._by_school.get(udise_code, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._entries.clear()
+            self._by_school.clear()
+            self._clears += 1
+            self._bytes = 0
+
+    def stats(self):
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'stale_fills': self.stale_fills
+        }
+
+
+_cache = None
+
+
+def init_cache(config=Config):
+    """Create the process-wide dashboard cache from a configuration object"""
+    global _cache
+    _cache = DashboardCache(config.DASHBOARD_CACHE_MAX_ENTRIES, config.DASHBOARD_CACHE_TTL)
+    return _cache
+
+
+def get_cache():
+    """Get the process-wide dashboard cache, creating it from the default config if needed"""
+    if _cache is None:
+        return init_cache()
+    return _cache
+
+
+def invalidate_schools(udise_codes):
+    """Drop cached dashboards for schools whose data just changed"""
+    if _cache is not None:
+        _cache.invalidate_schools(udise_codes)
@@ -1,10 +1,13 @@
-import sqlite3
-import csv
 import os
 
+from db_pool import get_connection
+from migrations import apply_migrations
+from udise_directory import reload_if_loaded
+from udise_import import import_schools
+
 def init_db():
     """Initialize the SQLite database with all required tables"""
-    conn = sqlite3.connect('shiksha_leap.db')
+    conn = get_connection()
     cursor = conn.cursor()
 
     # User table for both students and teachers
@@ -132,42 +135,27 @@ def init_db():
     )''')
 
     conn.commit()
+
+    # Indexes and later schema changes are versioned migrations
+    apply_migrations(conn)
     conn.close()
     print("Database initialized successfully!")
 
-def import_udise_data():
-    """Import UDISE school data from CSV file"""
-    if not os.path.exists('a.csv'):
-        print("Warning: a.csv file not found. UDISE data not imported.")
+def import_udise_data(path='a.csv'):
+    """Import UDISE school data from CSV file (see udise_import.py)"""
+    if not os.path.exists(path):
+        print(f"Warning: {path} file not found. UDISE data not imported.")
         return
     
-    conn = sqlite3.connect('shiksha_leap.db')
-    cursor = conn.cursor()
-    
-    # Clear existing data
-    cursor.execute('DELETE FROM udise_schools')
-    
-    with open('a.csv', 'r', encoding='utf-8') as file:
-        csv_reader = csv.DictReader(file)
-        for row in csv_reader:
-            cursor.execute('''
-                INSERT INTO udise_schools 
-                (udise_code, school_name, district, block, category, area, management)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                row['UDISE_Code'],
-                row['School_Name'],
-                row['District'],
-                row['Block'],
-                row.get('Category', ''),
-                row.get('Area', ''),
-                row.get('Management', '')
-            ))
-    
-    conn.commit()
-    count = cursor.execute('SELECT COUNT(*) FROM udise_schools').fetchone()[0]
-    conn.close()
-    print(f"Imported {count} UDISE school records successfully!")
+    try:
+        counts = import_schools(path)
+    except ValueError as e:
+        print(f"Warning: UDISE data not imported, existing schools kept: {e}")
+        return
+    print(f"Imported {counts['rows']} UDISE school records successfully! "
+          f"({counts['inserted']} new, {counts['updated']} updated, "
+          f"{counts['unchanged']} unchanged, {counts['deleted']} removed)")
+    reload_if_loaded()
 
 if __name__ == '__main__':
     init_db()
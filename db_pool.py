@@ -0,0 +1,209 @@
+"""
+SQLite connection manager for Shiksha Leap
+Keeps a small pool of open WAL-mode connections per worker process so that
+requests don't pay connect + page-cache warmup every time.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from config import Config
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection became free within the pool timeout"""
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool"""
+
+    pool = None
+
+    def close(self):
+        """Return the connection to the pool instead of closing it"""
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def discard(self):
+        """Really close the underlying database handle"""
+        self.pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Bounded pool of configured SQLite connections for one worker process"""
+
+    def __init__(self, database, size=8, timeout=10.0, busy_timeout_ms=5000,
+                 synchronous='NORMAL', cache_size_kb=16384, mmap_size=0):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._reset()
+
+    def _reset(self):
+        """(Re)initialise pool state, e.g. in a freshly forked worker"""
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = []
+        self._open = 0
+        self._in_use = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _connect(self):
+        """Open a new connection and apply the configured pragmas"""
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False,
+            factory=PooledConnection
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        return conn
+
+    def acquire(self):
+        """Get a connection, reusing an idle one when possible"""
+        if os.getpid() != self._pid:
+            # Connections inherited across fork() must not be used by the child
+            self._reset()
+
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        conn = None
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    self.hits += 1
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    self.misses += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f'No database connection free after {self.timeout}s')
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+            wait_time = time.perf_counter() - start
+            self.total_wait += wait_time
+            self.max_wait = max(self.max_wait, wait_time)
+            self._in_use += 1
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        conn.pool = self
+        return conn
+
+    def release(self, conn):
+        """Give a connection back; uncommitted work is rolled back like close() would"""
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            if os.getpid() != self._pid:
+                return
+            self._in_use -= 1
+            if healthy:
+                self._idle.append(conn)
+            else:
+                self._open -= 1
+                conn.discard()
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (connections in use are closed on release)"""
+        with self._cond:
+            for conn in self._idle:
+                conn.discard()
+            self._open -= len(self._idle)
+            self._idle = []
+
+    def stats(self):
+        """Pool counters for monitoring"""
+        with self._cond:
+            requests = self.hits + self.misses
+            return {
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / requests, 4) if requests else None,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'total_wait_ms': round(self.total_wait * 1000, 3),
+                'avg_wait_ms': round(self.total_wait * 1000 / requests, 3) if requests else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3)
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(config=Config):
+    """Create the process-wide pool from a configuration object"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = ConnectionPool(
+            config.DATABASE_PATH,
+            size=config.DB_POOL_SIZE,
+            timeout=config.DB_POOL_TIMEOUT,
+            busy_timeout_ms=config.DB_BUSY_TIMEOUT_MS,
+            synchronous=config.DB_SYNCHRONOUS,
+            cache_size_kb=config.DB_CACHE_SIZE_KB,
+            mmap_size=config.DB_MMAP_SIZE
+        )
+    return _pool
+
+
+def get_pool():
+    """Get the process-wide pool, creating it from the default config if needed"""
+    if _pool is None:
+        return init_pool()
+    return _pool
+
+
+def get_connection():
+    """Borrow a connection from the pool; call close() to return it"""
+    return get_pool().acquire()
@@ -0,0 +1,464 @@
+"""
+Panda3D game launcher for Shiksha Leap lab kiosks
+Keeps a small pool of pre-warmed worker processes that have already imported
+Panda3D and every game in the game registry, so /api/run-game only has to
+hand a game to an idle worker instead of paying interpreter start-up and
+imports per launch.
+
+A worker runs exactly one game (ShowBase is a per-process singleton) and
+exits when the game window closes; the pool is refilled in the background.
+Launches are tracked by game_id with their status (starting, running,
+finished, failed, stopped, timeout). At most GAME_LAUNCHER_MAX_RUNNING games
+run at once, and a game is stopped after GAME_LAUNCHER_TIMEOUT_SECONDS.
+
+Workers talk to the launcher over a JSON-lines pipe (their stdout); game
+output goes to stderr. With GAME_RECORDINGS_DIR set, every session is
+recorded to <dir>/<game_id>.replay for game_replay.py.
+
+Usage: python game_launcher.py --benchmark [launches] [grade subject]
+"""
+
+import atexit
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from config import Config
+from game_registry import GameRegistry
+
+START_TIMEOUT = 60.0  # seconds for a worker to warm up or show a game's first frame
+MONITOR_INTERVAL = 0.5
+STOP_TIMEOUT = 5.0  # seconds a stopped game gets to exit before it is killed
+HISTORY = 200  # finished launches kept for status queries
+
+_ACTIVE = ('starting', 'running')
+
+
+class LauncherBusy(Exception):
+    """GAME_LAUNCHER_MAX_RUNNING games are already running"""
+
+
+class _Worker:
+    """One pre-warmed game process and what it has reported"""
+
+    def __init__(self, process):
+        self.process = process
+        self.ready = threading.Event()
+        self.started = threading.Event()
+        self.warmup_ms = None
+        self.error = None
+
+    def read_events(self):
+        """Follow the worker's status pipe until it exits"""
+        for line in self.process.stdout:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get('event') == 'ready':
+                self.warmup_ms = event.get('warmup_ms')
+                self.ready.set()
+            elif event.get('event') == 'started':
+                self.started.set()
+            elif event.get('event') == 'failed':
+                self.error = event.get('error')
+                self.started.set()
+        # Wake anyone still waiting on a worker that died
+        self.ready.set()
+        self.started.set()
+
+
+class GameLauncher:
+    """Bounded pool of pre-warmed Panda3D processes for one server process"""
+
+    def __init__(self, games_dir='games', pool_size=2, max_running=2, timeout=3600,
+                 window_type='onscreen', recordings_dir=None):
+        self.games_dir = games_dir
+        self.recordings_dir = recordings_dir
+        self.pool_size = pool_size
+        self.max_running = max_running
+        self.timeout = timeout
+        self.window_type = window_type
+        self._lock = threading.Lock()
+        self._pid = None
+        self._idle = []
+        self._running = {}   # game_id -> _Worker
+        self._records = {}   # game_id -> status dict, oldest first
+        self._monitor = None
+        self.launches = 0
+        self.warm_launches = 0
+        self.cold_launches = 0
+        self.rejected_busy = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.total_launch_ms = 0.0
+
+    def start(self):
+        """Warm the pool and start the monitor thread in this process (idempotent, fork-aware)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Workers of a parent process belong to it, not to a forked child
+            self._pid = os.getpid()
+            self._idle = []
+            self._running = {}
+            self._records = {}
+            self._monitor = threading.Thread(target=self._run_monitor, name='game-launcher', daemon=True)
+            self._monitor.start()
+            self._fill_pool()
+
+    def _spawn(self):
+        """Start a worker process that imports Panda3D and the games, then waits for a command"""
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--worker', self.window_type, self.games_dir],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1,
+            cwd=os.path.dirname(os.path.abspath(self.games_dir)) or None
+        )
+        worker = _Worker(process)
+        threading.Thread(target=worker.read_events, name=f'game-worker-{process.pid}', daemon=True).start()
+        return worker
+
+    def _fill_pool(self):
+        """Top the idle pool up to pool_size (caller holds the lock)"""
+        self._idle = [worker for worker in self._idle if worker.process.poll() is None]
+        while len(self._idle) < self.pool_size:
+            self._idle.append(self._spawn())
+
+    def launch(self, game, user_id=None):
+        """Start a registry game (see game_registry.py) in a warm worker and wait for
+        its first frame; returns its status record"""
+        self.start()
+
+        requested = time.perf_counter()
+        game_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            if sum(1 for record in self._records.values() if record['status'] in _ACTIVE) >= self.max_running:
+                self.rejected_busy += 1
+                raise LauncherBusy(f'{self.max_running} games are already running')
+            # Prefer a worker that has finished warming up
+            self._idle.sort(key=lambda worker: not worker.ready.is_set())
+            worker = None
+            while self._idle and worker is None:
+                candidate = self._idle.pop(0)
+                if candidate.process.poll() is None:
+                    worker = candidate
+            warm = worker is not None and worker.ready.is_set()
+            if worker is None:
+                worker = self._spawn()
+            recording = None
+            if self.recordings_dir:
+                recording = os.path.join(os.path.abspath(self.recordings_dir), f'{game_id}.replay')
+            record = {
+                'game_id': game_id, 'grade': game.grade, 'subject': game.subject_id, 'title': game.title,
+                'user_id': user_id, 'status': 'starting', 'pid': worker.process.pid,
+                'warm': warm, 'started_at': time.time(), 'launch_ms': None,
+                'ended_at': None, 'exit_code': None, 'error': None, 'recording': recording
+            }
+            self._records[game_id] = record
+            self._running[game_id] = worker
+
+        failed = None
+        if not worker.ready.wait(START_TIMEOUT) or worker.process.poll() is not None:
+            failed = 'Game process did not start'
+        else:
+            try:
+                command = {'module': game.module, 'game_id': game.game_id, 'record_to': recording}
+                worker.process.stdin.write(json.dumps(command) + '\n')
+                worker.process.stdin.flush()
+            except OSError:
+                failed = 'Game process exited'
+            if failed is None and (not worker.started.wait(START_TIMEOUT) or worker.error):
+                failed = worker.error or 'Game did not show its first frame in time'
+
+        launch_ms = (time.perf_counter() - requested) * 1000
+        with self._lock:
+            self.launches += 1
+            if warm:
+                self.warm_launches += 1
+            else:
+                self.cold_launches += 1
+            record['launch_ms'] = round(launch_ms, 1)
+            if failed is None:
+                self.total_launch_ms += launch_ms
+                if record['status'] == 'starting':
+                    record['status'] = 'running'
+            else:
+                self.failures += 1
+                stopped = self._finish(game_id, 'failed', error=failed)
+            # Refill only now, so warming a replacement doesn't slow this game's start
+            self._fill_pool()
+        if failed is not None:
+            self._reap(game_id, stopped)
+        with self._lock:
+            return dict(record)
+
+    def _finish(self, game_id, status, error=None):
+        """Move a launch out of the running set and ask its process to exit (caller holds the lock);
+        returns the worker for _reap, which must be called after releasing the lock"""
+        worker = self._running.pop(game_id, None)
+        record = self._records[game_id]
+        if worker is not None:
+            if worker.process.poll() is None:
+                # SIGTERM first so a recorded game can save its session
+                worker.process.terminate()
+            error = error or worker.error
+        record['status'] = status
+        record['error'] = error
+        record['ended_at'] = time.time()
+        finished = [key for key, value in self._records.items() if value['status'] not in _ACTIVE]
+        for key in finished[:max(0, len(finished) - HISTORY)]:
+            del self._records[key]
+        return worker
+
+    def _reap(self, game_id, worker):
+        """Wait for a finished launch's process, killing it after STOP_TIMEOUT, and record its
+        exit code (without the lock, so launches and status calls aren't held up meanwhile)"""
+        if worker is None:
+            return
+        try:
+            worker.process.wait(STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            worker.process.kill()
+            worker.process.wait()
+        with self._lock:
+            record = self._records.get(game_id)
+            if record is not None:
+                record['exit_code'] = worker.process.returncode
+
+    def _run_monitor(self):
+        """Reap exited games, enforce the timeout and keep the pool warm"""
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(MONITOR_INTERVAL)
+            now = time.time()
+            stopped = {}
+            with self._lock:
+                for game_id, worker in list(self._running.items()):
+                    record = self._records[game_id]
+                    if record['status'] == 'starting':
+                        continue
+                    code = worker.process.poll()
+                    if code is not None:
+                        if code == 0 and not worker.error:
+                            stopped[game_id] = self._finish(game_id, 'finished')
+                        else:
+                            self.failures += 1
+                            stopped[game_id] = self._finish(game_id, 'failed', error=worker.error or f'exit code {code}')
+                    elif now - record['started_at'] > self.timeout:
+                        self.timeouts += 1
+                        stopped[game_id] = self._finish(game_id, 'timeout', error=f'Stopped after {self.timeout}s')
+                if not any(record['status'] == 'starting' for record in self._records.values()):
+                    self._fill_pool()
+            for game_id, worker in stopped.items():
+                self._reap(game_id, worker)
+
+    def status(self, game_id):
+        """Status record of a launch, or None"""
+        with self._lock:
+            record = self._records.get(game_id)
+            return dict(record) if record is not None else None
+
+    def stop(self, game_id):
+        """Stop a running game; returns its status record, or None if unknown"""
+        with self._lock:
+            record = self._records.get(game_id)
+            if record is None:
+                return None
+            if record['status'] not in _ACTIVE:
+                return dict(record)
+            worker = self._finish(game_id, 'stopped')
+        self._reap(game_id, worker)
+        with self._lock:
+            return dict(record)
+
+    def shutdown(self):
+        """Kill every worker this process started"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._pid = None
+            stopped = {game_id: self._finish(game_id, 'stopped') for game_id in list(self._running)}
+            idle, self._idle = self._idle, []
+        for game_id, worker in stopped.items():
+            self._reap(game_id, worker)
+        for worker in idle:
+            if worker.process.poll() is None:
+                worker.process.kill()
+                worker.process.wait()
+
+    def stats(self):
+        """Launcher counters for monitoring"""
+        with self._lock:
+            succeeded = self.launches - self.failures
+            return {
+                'pool_size': self.pool_size,
+                'idle': len(self._idle),
+                'warm_idle': sum(1 for worker in self._idle if worker.ready.is_set()),
+                'running': len(self._running),
+                'max_running': self.max_running,
+                'launches': self.launches,
+                'warm_launches': self.warm_launches,
+                'cold_launches': self.cold_launches,
+                'rejected_busy': self.rejected_busy,
+                'failures': self.failures,
+                'timeouts': self.timeouts,
+                'avg_launch_ms': round(self.total_launch_ms / succeeded, 1) if succeeded > 0 else 0.0
+            }
+
+
+_launcher = None
+
+
+def launcher_enabled(config=Config):
+    """GAME_LAUNCHER_ENABLED, unless the server runs several workers: each would keep its own
+    pool and launch records, so status and stop calls would miss games started by another"""
+    return bool(config.GAME_LAUNCHER_ENABLED) and config.WORKERS <= 1
+
+
+def init_launcher(config=Config):
+    """Create the process-wide launcher from a configuration object (workers start on first use)"""
+    global _launcher
+    if _launcher is not None:
+        _launcher.shutdown()
+    _launcher = GameLauncher(
+        config.GAMES_DIR,
+        pool_size=config.GAME_LAUNCHER_POOL_SIZE,
+        max_running=config.GAME_LAUNCHER_MAX_RUNNING,
+        timeout=config.GAME_LAUNCHER_TIMEOUT_SECONDS,
+        window_type=config.GAME_LAUNCHER_WINDOW_TYPE,
+        recordings_dir=config.GAME_RECORDINGS_DIR
+    )
+    return _launcher
+
+
+def get_launcher():
+    """Get the process-wide launcher, creating it from the default config if needed"""
+    if _launcher is None:
+        return init_launcher()
+    return _launcher
+
+
+@atexit.register
+def _stop_workers():
+    if _launcher is not None:
+        _launcher.shutdown()
+
+
+def _send(channel, **event):
+    channel.write(json.dumps(event) + '\n')
+    channel.flush()
+
+
+def worker_main(window_type, games_dir):
+    """Body of a worker process: warm up, run the one game we are sent, exit"""
+    # Keep the real stdout for status events; anything the game prints goes to stderr
+    channel = os.fdopen(os.dup(1), 'w')
+    os.dup2(2, 1)
+    sys.path.insert(0, os.getcwd())
+
+    start = time.perf_counter()
+    from panda3d.core import loadPrcFileData
+    loadPrcFileData('game-launcher', f'window-type {window_type}')
+    import importlib
+    import direct.showbase.ShowBase  # noqa: F401  (the expensive part of every game's imports)
+    from direct.showbase.Loader import Loader
+    from direct.task.TaskManagerGlobal import taskMgr
+    import game_replay
+
+    # ShowBase's loader scans installed packages for model loaders on creation
+    Loader._loadPythonFileTypes()
+
+    def load(module_name):
+        try:
+            modules[module_name] = importlib.import_module(module_name)
+        except Exception as e:
+            modules[module_name] = e
+
+    # Only registry games can be run: the command names one of their modules
+    registry = GameRegistry(games_dir)
+    modules = {}
+    for game in registry.python_games():
+        load(game.module)
+    _send(channel, event='ready', warmup_ms=round((time.perf_counter() - start) * 1000, 1))
+
+    line = sys.stdin.readline()
+    if not line:
+        return 0  # the launcher went away before using us
+    command = json.loads(line)
+    module_name = command['module']
+    if module_name not in modules and any(game.module == module_name for game in registry.python_games()):
+        # Added to games/ after this worker warmed up
+        load(module_name)
+    module = modules.get(module_name)
+    if not hasattr(module, 'main'):
+        _send(channel, event='failed', error=f'Game module unavailable: {module}')
+        return 1
+
+    def announce(task):
+        # Runs after the first frame has been rendered (igLoop has sort 50)
+        _send(channel, event='started')
+        return task.done
+
+    taskMgr.add(announce, 'game-launcher-started', sort=100)
+    try:
+        if command.get('record_to'):
+            # Stopping the game (SIGTERM) unwinds through record(), which saves the session
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            os.makedirs(os.path.dirname(command['record_to']), exist_ok=True)
+            game_replay.record(module_name, command['record_to'], command.get('game_id'))
+        else:
+            module.main()
+    except SystemExit as e:
+        # ShowBase.run() ends with sys.exit() when the window is closed
+        return e.code or 0
+    except Exception as e:
+        _send(channel, event='failed', error=f'{type(e).__name__}: {e}')
+        return 1
+    return 0
+
+
+def benchmark(launches=5, grade=None, subject=None):
+    """Time launches into cold processes (the old per-launch import) and pre-warmed ones"""
+    registry = GameRegistry(Config.GAMES_DIR)
+    game = registry.python_game(grade, subject) if grade is not None else registry.python_games()[0]
+    print(f"Launching grade {game.grade} {game.subject_id} {launches} times each (offscreen windows)")
+
+    for label, pool_size in (('cold process per launch', 0), ('pre-warmed pool', 1)):
+        launcher = GameLauncher(Config.GAMES_DIR, pool_size=pool_size, max_running=1,
+                                window_type='offscreen')
+        launcher.start()
+        times = []
+        for _ in range(launches):
+            with launcher._lock:
+                idle = list(launcher._idle)
+            for worker in idle:
+                worker.ready.wait(START_TIMEOUT)
+            record = launcher.launch(game)
+            if record['status'] != 'running':
+                print(f"  launch failed: {record['error']}")
+                continue
+            times.append(record['launch_ms'])
+            launcher.stop(record['game_id'])
+        launcher.shutdown()
+        if times:
+            print(f"{label}: median {statistics.median(times):.0f} ms, "
+                  f"min {min(times):.0f} ms, max {max(times):.0f} ms")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--worker']:
+        sys.exit(worker_main(sys.argv[2], sys.argv[3]))
+    elif sys.argv[1:2] == ['--benchmark']:
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+        if len(sys.argv) > 4:
+            benchmark(count, int(sys.argv[3]), sys.argv[4])
+        else:
+            benchmark(count)
+    else:
+        print(__doc__.strip())
@@ -0,0 +1,260 @@
+"""
+Game log ingestion for Shiksha Leap
+Validates incoming game/quiz logs and inserts a whole batch with one
+executemany() in one transaction, skipping logs whose client_log_id was
+already stored for the student (devices retry whole batches).
+
+Usage: python game_logs.py --benchmark
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from dashboard_cache import invalidate_schools
+from db_pool import get_connection
+from stats import record_game_logs
+
+GAME_TYPES = ('game', 'quiz')
+LEVELS = ('easy', 'medium', 'hard')
+MAX_CLIENT_LOG_ID_LENGTH = 64
+
+# SQLite's default limit on host parameters is 999 on older builds
+_LOOKUP_CHUNK = 500
+
+
+def _as_int(value, field, minimum=None):
+    if isinstance(value, bool):
+        raise ValueError(f"'{field}' must be an integer")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{field}' must be an integer")
+    if isinstance(value, float) and number != value:
+        raise ValueError(f"'{field}' must be an integer")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"'{field}' must be at least {minimum}")
+    return number
+
+
+def validate_log(log):
+    """Normalize one posted log, raising ValueError with a reason if invalid"""
+    if not isinstance(log, dict):
+        raise ValueError('log must be an object')
+
+    for field in ('subject', 'game_id'):
+        if not isinstance(log.get(field), str) or not log[field].strip():
+            raise ValueError(f"'{field}' is required")
+
+    game_type = log.get('game_type', 'game')
+    if game_type not in GAME_TYPES:
+        raise ValueError(f"'game_type' must be one of {', '.join(GAME_TYPES)}")
+
+    level = log.get('level', 'medium')
+    if level not in LEVELS:
+        raise ValueError(f"'level' must be one of {', '.join(LEVELS)}")
+
+    for field in ('grade', 'score', 'max_score'):
+        if field not in log:
+            raise ValueError(f"'{field}' is required")
+
+    client_log_id = log.get('client_log_id')
+    if client_log_id is not None:
+        if not isinstance(client_log_id, str) or not client_log_id \
+                or len(client_log_id) > MAX_CLIENT_LOG_ID_LENGTH:
+            raise ValueError(f"'client_log_id' must be a string of at most {MAX_CLIENT_LOG_ID_LENGTH} characters")
+
+    played_at = log.get('played_at')
+    if played_at is not None and not isinstance(played_at, str):
+        raise ValueError("'played_at' must be a timestamp string")
+
+    return {
+        'client_log_id': client_log_id,
+        'subject': log['subject'].strip(),
+        'grade': _as_int(log['grade'], 'grade'),
+        'game_id': log['game_id'].strip(),
+        'game_type': game_type,
+        'level': level,
+        'score': _as_int(log['score'], 'score', 0),
+        'max_score': _as_int(log['max_score'], 'max_score', 0),
+        'time_spent': _as_int(log.get('time_spent', 0) or 0, 'time_spent', 0),
+        'played_at': played_at
+    }
+
+
+def _existing_ids_query(count):
+    placeholders = ', '.join('?' * count)
+    return f'SELECT client_log_id FROM game_logs WHERE student_id = ? AND client_log_id IN ({placeholders})'
+
+
+def plan_samples():
+    """The client_log_id lookup as _existing_client_ids() issues it, for migrations.query_plans"""
+    yield _existing_ids_query(2)
+
+
+def _existing_client_ids(conn, student_id, client_log_ids):
+    """Which of the given client_log_ids are already stored for the student"""
+    found = set()
+    ids = list(client_log_ids)
+    for i in range(0, len(ids), _LOOKUP_CHUNK):
+        chunk = ids[i:i + _LOOKUP_CHUNK]
+        rows = conn.execute(_existing_ids_query(len(chunk)), [student_id, *chunk])
+        found.update(row[0] for row in rows)
+    return found
+
+
+def write_batch(conn, items):
+    """Store validated logs for any number of students in one transaction; commits
+
+    items is a list of (student, row) where student needs 'id' and
+    'udise_code' and row comes from validate_log(). Returns one status per
+    item: 'accepted' or 'duplicate' (client_log_id already stored).
+    """
+    statuses = ['accepted'] * len(items)
+    if not items:
+        return statuses
+
+    by_student = {}
+    for position, (student, row) in enumerate(items):
+        by_student.setdefault(student['id'], (student, []))[1].append((position, row))
+
+    # The write lock is held from the duplicate check to the commit, so two
+    # concurrent retries of the same batch can't both insert
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        new_rows = []
+        for student_id, (student, entries) in by_student.items():
+            client_ids = {row['client_log_id'] for _, row in entries if row['client_log_id']}
+            seen = _existing_client_ids(conn, student_id, client_ids) if client_ids else set()
+
+            student_rows = []
+            for position, row in entries:
+                client_log_id = row['client_log_id']
+                if client_log_id:
+                    if client_log_id in seen:
+                        statuses[position] = 'duplicate'
+                        continue
+                    seen.add(client_log_id)
+                student_rows.append(row)
+                new_rows.append((student_id, row))
+
+            record_game_logs(conn, student, student_rows)
+
+        conn.executemany('''
+            INSERT INTO game_logs
+            (student_id, client_log_id, subject, grade, game_id, game_type, level,
+             score, max_score, time_spent, played_at, synced)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), 1)
+        ''', [(
+            student_id, row['client_log_id'], row['subject'], row['grade'], row['game_id'],
+            row['game_type'], row['level'], row['score'], row['max_score'], row['time_spent'],
+            row['played_at']
+        ) for student_id, row in new_rows])
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    invalidate_schools(student['udise_code'] for student, _ in by_student.values())
+    return statuses
+
+
+def insert_game_logs(conn, student, logs, default_played_at=None):
+    """Validate and store a batch of logs for one student; commits
+
+    student needs 'id' and 'udise_code'. Logs without played_at get
+    default_played_at (None = CURRENT_TIMESTAMP). Returns one result per log,
+    in order: {'index', 'client_log_id', 'status': accepted|duplicate|rejected,
+    'error' (rejected only)}.
+    """
+    results = []
+    valid = []
+    for index, log in enumerate(logs):
+        client_log_id = log.get('client_log_id') if isinstance(log, dict) else None
+        try:
+            row = validate_log(log)
+        except ValueError as e:
+            results.append({'index': index, 'client_log_id': client_log_id,
+                            'status': 'rejected', 'error': str(e)})
+            continue
+        if row['played_at'] is None and default_played_at is not None:
+            row['played_at'] = str(default_played_at)
+        result = {'index': index, 'client_log_id': client_log_id, 'status': 'accepted'}
+        results.append(result)
+        valid.append((result, row))
+
+    statuses = write_batch(conn, [(student, row) for _, row in valid])
+    for (result, _), status in zip(valid, statuses):
+        result['status'] = status
+
+    return results
+
+
+def summarize(results):
+    """Count accepted/duplicate/rejected results"""
+    counts = {'accepted': 0, 'duplicate': 0, 'rejected': 0}
+    for result in results:
+        counts[result['status']] += 1
+    return counts
+
+
+def benchmark(batch_sizes=(10, 1000, 50000), rounds=3):
+    """Measure ingestion throughput for fresh and fully duplicated batches"""
+    from config import Config
+    from database import init_db
+    from db_pool import init_pool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        Config.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        init_pool(Config)
+        init_db()
+
+        conn = get_connection()
+        conn.execute('''
+            INSERT INTO students (id, user_id, first_name, last_name, dob, grade,
+                                  school_name, district, state, udise_code, medium)
+            VALUES (1, 1, 'Bench', 'Student', '2012-01-01', 6, 'School', 'District', 'Odisha', '21150222902', 'English')
+        ''')
+        conn.commit()
+        student = {'id': 1, 'udise_code': '21150222902'}
+
+        for size in batch_sizes:
+            fresh, retried = [], []
+            for _ in range(rounds):
+                logs = [{
+                    'client_log_id': str(uuid.uuid4()),
+                    'subject': 'Mathematics' if i % 2 else 'Science',
+                    'grade': 6,
+                    'game_id': 'maths_game1',
+                    'game_type': 'game',
+                    'level': 'medium',
+                    'score': i % 11,
+                    'max_score': 10,
+                    'time_spent': 60,
+                    'played_at': datetime.datetime.now().isoformat(' ')
+                } for i in range(size)]
+
+                start = time.perf_counter()
+                insert_game_logs(conn, student, logs)
+                fresh.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                counts = summarize(insert_game_logs(conn, student, logs))
+                retried.append(time.perf_counter() - start)
+                assert counts['duplicate'] == size
+
+            best_fresh, best_retry = min(fresh), min(retried)
+            print(f"batch {size:>6}: new {best_fresh * 1000:8.1f} ms ({size / best_fresh:>9,.0f} logs/s), "
+                  f"retried {best_retry * 1000:8.1f} ms ({size / best_retry:>9,.0f} logs/s)")
+        conn.close()
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--benchmark']:
+        benchmark()
+    else:
+        print(__doc__.strip())
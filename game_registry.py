@@ -0,0 +1,308 @@
+"""
+Game registry for Shiksha Leap
+Knows every game under games/grade_N/: Panda3D games (<subject>_game.py
+defining main(), checked by parsing the source - nothing is imported here)
+and JSON games and quizzes. Each has its grade, subject, type, title and
+difficulty. Routes, the game launcher and run_game.py resolve games through
+these dictionaries instead of importing a module named by the request, and
+the catalog behind /api/games/catalog is built from them.
+
+The grade directories are re-scanned at most every GAME_REGISTRY_POLL_SECONDS;
+only files whose mtime or size changed are parsed again.
+
+Usage: python game_registry.py [grade]   # print the catalog
+"""
+
+import ast
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from config import Config
+
+GRADE_DIR_RE = re.compile(r'^grade_(\d+)$')
+PYTHON_GAME_RE = re.compile(r'^([a-z][a-z0-9_]*)_game\.py$')
+JSON_GAME_RE = re.compile(r'^([A-Za-z0-9][A-Za-z0-9_\-]*)\.json$')
+
+# Subjects abbreviated in JSON file names
+_SUBJECT_NAMES = {'maths': 'Mathematics', 'social': 'Social Studies'}
+
+
+class GameEntry:
+    """Metadata of one game file (type is 'panda3d', 'game' or 'quiz')"""
+
+    __slots__ = ('game_id', 'grade', 'subject', 'type', 'title', 'description', 'difficulty',
+                 'filename', 'module', 'mtime_ns', 'size')
+
+    def __init__(self, game_id, grade, subject, type, title, description=None, difficulty=None,
+                 filename=None, module=None, mtime_ns=0, size=0):
+        self.game_id = game_id
+        self.grade = grade
+        self.subject = subject
+        self.type = type
+        self.title = title
+        self.description = description
+        self.difficulty = difficulty
+        self.filename = filename
+        self.module = module
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+    @property
+    def subject_id(self):
+        return self.subject.lower().replace(' ', '_')
+
+    def describe(self):
+        """Catalog entry for the API"""
+        if self.module is not None:
+            play_url = f'/game/grade_{self.grade}/{self.subject_id}'
+            content_url = None
+        else:
+            play_url = f'/game/{self.game_id}'
+            content_url = f'/games/grade_{self.grade}/{self.filename}'
+        return {
+            'id': self.game_id,
+            'grade': self.grade,
+            'subject': self.subject,
+            'subject_id': self.subject_id,
+            'type': self.type,
+            'title': self.title,
+            'description': self.description,
+            'difficulty': self.difficulty,
+            'play_url': play_url,
+            'content_url': content_url
+        }
+
+
+def _subject_name(key):
+    return _SUBJECT_NAMES.get(key) or key.replace('_', ' ').title()
+
+
+def parse_python_game(path, grade, subject):
+    """Entry for a Panda3D game file, or None if it doesn't define main()"""
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), filename=path)
+    if not any(isinstance(node, ast.FunctionDef) and node.name == 'main' for node in tree.body):
+        return None
+
+    # Docstrings read "Grade 6 Mathematics Game - Panda3D\nNumber Ninja - Learn ..."
+    lines = [line.strip() for line in (ast.get_docstring(tree) or '').splitlines() if line.strip()]
+    title, _, description = (lines[1] if len(lines) > 1 else '').partition(' - ')
+    constants = {
+        node.targets[0].id: node.value.value
+        for node in tree.body
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)
+        and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+    }
+    games_package = os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(path))))
+    return GameEntry(
+        game_id=f'grade_{grade}_{subject}',
+        grade=grade,
+        subject=_subject_name(subject),
+        type='panda3d',
+        title=constants.get('TITLE') or title or f'{_subject_name(subject)} Game',
+        description=constants.get('DESCRIPTION') or description or None,
+        difficulty=constants.get('DIFFICULTY'),
+        filename=os.path.basename(path),
+        module=f'{games_package}.grade_{grade}.{subject}_game'
+    )
+
+
+def parse_json_game(path, grade, stem):
+    """Entry for a JSON game or quiz file, or None if it isn't a JSON object"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        return None
+    key = re.sub(r'_(game|quiz)\d*$', '', stem)
+    return GameEntry(
+        game_id=str(data.get('game_id') or data.get('quiz_id') or stem),
+        grade=grade,
+        subject=str(data.get('subject') or _subject_name(key)),
+        type='quiz' if 'quiz_id' in data else 'game',
+        title=str(data.get('title') or stem),
+        description=data.get('description'),
+        difficulty=data.get('difficulty'),
+        filename=os.path.basename(path)
+    )
+
+
+class GameRegistry:
+    """Metadata of every game under one games directory, refreshed by mtime polling"""
+
+    def __init__(self, games_dir='games', poll_seconds=2.0):
+        self.games_dir = games_dir
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._files = {}         # path -> (mtime_ns, size, GameEntry or None)
+        self._python = {}        # (grade, subject key) -> GameEntry
+        self._by_id = {}         # game_id -> GameEntry
+        self._by_grade = {}      # grade -> [GameEntry]
+        self._catalogs = {}      # grade -> (body, etag)
+        self._checked_at = None
+        self.version = None
+        self.scans = 0
+        self.parsed = 0
+        self.errors = 0
+
+    def _walk(self):
+        """Yield (path, grade, kind, key) for every game file"""
+        try:
+            grade_dirs = sorted(os.listdir(self.games_dir))
+        except OSError:
+            return
+        for grade_dir in grade_dirs:
+            match = GRADE_DIR_RE.match(grade_dir)
+            if not match:
+                continue
+            grade = int(match.group(1))
+            directory = os.path.join(self.games_dir, grade_dir)
+            try:
+                filenames = sorted(os.listdir(directory))
+            except OSError:
+                continue
+            for filename in filenames:
+                python = PYTHON_GAME_RE.match(filename)
+                if python:
+                    yield os.path.join(directory, filename), grade, 'python', python.group(1)
+                    continue
+                content = JSON_GAME_RE.match(filename)
+                if content:
+                    yield os.path.join(directory, filename), grade, 'json', content.group(1)
+
+    def refresh(self):
+        """Re-scan the grade directories, re-parsing only changed files"""
+        files = {}
+        for path, grade, kind, key in self._walk():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            known = self._files.get(path)
+            if known is not None and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+                files[path] = known
+                continue
+            try:
+                if kind == 'python':
+                    entry = parse_python_game(path, grade, key)
+                else:
+                    entry = parse_json_game(path, grade, key)
+            except (OSError, SyntaxError, ValueError) as e:
+                print(f"Game registry: skipping {path}: {e}")
+                self.errors += 1
+                entry = None
+            if entry is not None:
+                entry.mtime_ns, entry.size = st.st_mtime_ns, st.st_size
+            files[path] = (st.st_mtime_ns, st.st_size, entry)
+            self.parsed += 1
+        self.scans += 1
+
+        if self.version is None or files.keys() != self._files.keys() or any(
+                files[path] is not self._files[path] for path in files):
+            python, by_id, by_grade = {}, {}, {}
+            for path, (_, _, entry) in sorted(files.items()):
+                if entry is None:
+                    continue
+                if entry.module is not None:
+                    python[(entry.grade, entry.subject_id)] = entry
+                by_id.setdefault(entry.game_id, entry)
+                by_grade.setdefault(entry.grade, []).append(entry)
+            signature = json.dumps(sorted((path, mtime, size) for path, (mtime, size, _) in files.items()))
+            self._python, self._by_id, self._by_grade = python, by_id, by_grade
+            self._catalogs = {}
+            self.version = hashlib.sha256(signature.encode('utf-8')).hexdigest()[:16]
+        self._files = files
+        self._checked_at = time.monotonic()
+
+    def _poll(self):
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.poll_seconds:
+            return
+        with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.poll_seconds:
+                return
+            self.refresh()
+
+    def python_game(self, grade, subject):
+        """The Panda3D game for a grade and subject (e.g. 6, 'mathematics'), or None"""
+        self._poll()
+        return self._python.get((grade, subject))
+
+    def python_games(self):
+        """Every Panda3D game"""
+        self._poll()
+        return list(self._python.values())
+
+    def get(self, game_id):
+        """A game by id, or None"""
+        self._poll()
+        return self._by_id.get(game_id)
+
+    def games(self, grade):
+        """Every game of a grade"""
+        self._poll()
+        return list(self._by_grade.get(grade, ()))
+
+    def catalog(self, grade):
+        """Serialized catalog of a grade and its ETag, rebuilt only when a game changed"""
+        self._poll()
+        catalogs, by_grade = self._catalogs, self._by_grade
+        cached = catalogs.get(grade)
+        if cached is not None:
+            return cached
+        games = by_grade.get(grade, ())
+        subjects = {}
+        for entry in games:
+            subject = subjects.setdefault(entry.subject_id, {'id': entry.subject_id, 'name': entry.subject,
+                                                             'game_count': 0})
+            subject['game_count'] += 1
+        body = json.dumps({
+            'grade': grade,
+            'subjects': sorted(subjects.values(), key=lambda subject: subject['name']),
+            'games': [entry.describe() for entry in games]
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        cached = (body, hashlib.sha256(body).hexdigest()[:32])
+        # Only grades that have games are kept, so arbitrary ?grade= values can't grow the cache
+        if grade in by_grade:
+            catalogs[grade] = cached
+        return cached
+
+    def stats(self):
+        """Registry counters for monitoring"""
+        return {
+            'games': sum(len(entries) for entries in self._by_grade.values()),
+            'python_games': len(self._python),
+            'version': self.version,
+            'scans': self.scans,
+            'files_parsed': self.parsed,
+            'errors': self.errors
+        }
+
+
+_registry = None
+
+
+def init_registry(config=Config):
+    """Create and scan the process-wide registry from a configuration object"""
+    global _registry
+    registry = GameRegistry(config.GAMES_DIR, config.GAME_REGISTRY_POLL_SECONDS)
+    registry.refresh()
+    _registry = registry
+    return registry
+
+
+def get_registry():
+    """Get the process-wide registry, creating it from the default config if needed"""
+    if _registry is None:
+        return init_registry()
+    return _registry
+
+
+if __name__ == '__main__':
+    registry = get_registry()
+    grades = [int(arg) for arg in sys.argv[1:]] or sorted(registry._by_grade)
+    for grade in grades:
+        print(json.dumps(json.loads(registry.catalog(grade)[0]), ensure_ascii=False, indent=2))
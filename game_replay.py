@@ -0,0 +1,407 @@
+"""
+Session recording and deterministic replay for the Panda3D games
+A recording holds a game's RNG seed, the frame time (dt) of every frame and
+the key events the game received, numbered by frame. Replaying it runs the
+game offscreen on a non-real-time clock that hands out the recorded frame
+times and puts each event into Panda3D's event queue on its frame, so the
+game gets the same input, dt and random numbers as the student did, ends in
+the same state, and runs as fast as the machine can render.
+
+Files are gzipped JSON with frame times in microseconds; a minute of play
+is a few kilobytes. Lab kiosks record every launched game when
+GAME_RECORDINGS_DIR is set, and recordings double as a benchmark corpus.
+
+Usage: python game_replay.py record <grade> <subject> [file]
+       python game_replay.py replay <file> [<file> ...] [--warmup N] [--output results.json]
+       python game_replay.py --check  # record a scripted session and replay it
+"""
+
+import gzip
+import importlib
+import json
+import os
+import platform
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from config import Config
+from game_registry import GameRegistry
+
+FORMAT_VERSION = 1
+
+# Game attributes compared between a recording and its replay
+STATE_FIELDS = ('score', 'level', 'lives', 'specimens_collected', 'experiments_completed',
+                'game_running', 'player_pos')
+
+
+class Recording:
+    """One game session: seed, game options, per-frame dt and (frame, event) key input"""
+
+    __slots__ = ('module', 'game_id', 'seed', 'options', 'frame_us', 'events', 'state')
+
+    def __init__(self, module, game_id=None, seed=0, frame_us=None, events=None, state=None, options=None):
+        self.module = module
+        self.game_id = game_id
+        self.seed = seed
+        self.options = options or {}  # extra game constructor arguments, e.g. specimen_count
+        self.frame_us = frame_us if frame_us is not None else []
+        self.events = events if events is not None else []
+        self.state = state
+
+    @property
+    def frames(self):
+        return len(self.frame_us)
+
+    def save(self, path):
+        """Write the recording as gzipped JSON"""
+        data = {
+            'version': FORMAT_VERSION,
+            'module': self.module,
+            'game_id': self.game_id,
+            'seed': self.seed,
+            'options': self.options,
+            'frame_us': self.frame_us,
+            'events': self.events,
+            'state': self.state
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        """Read a recording written by save(); raises ValueError if it isn't one"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get('version') != FORMAT_VERSION:
+            raise ValueError(f'{path} is not a version {FORMAT_VERSION} game recording')
+        return cls(data['module'], data.get('game_id'), data['seed'], data['frame_us'],
+                   [tuple(event) for event in data['events']], data.get('state'), data.get('options'))
+
+
+def game_class(module_name):
+    """The ShowBase subclass a game module defines (not one it imports, like GameEngine)"""
+    from direct.showbase.ShowBase import ShowBase
+    module = importlib.import_module(module_name)
+    return next(value for value in vars(module).values()
+                if isinstance(value, type) and issubclass(value, ShowBase) and value.__module__ == module.__name__)
+
+
+def game_state(game):
+    """The STATE_FIELDS a game has, as JSON-compatible values"""
+    state = {}
+    for name in STATE_FIELDS:
+        if hasattr(game, name):
+            value = getattr(game, name)
+            state[name] = [round(v, 4) for v in value] if isinstance(value, list) else value
+    return state
+
+
+class Recorder:
+    """Records a running game's frame times and the key events it handles"""
+
+    def __init__(self, game, recording):
+        self.game = game
+        self.recording = recording
+        from panda3d.core import ClockObject
+        self._clock = ClockObject.getGlobalClock()
+        self._send = game.messenger.send
+        game.messenger.send = self._record_send
+        game.taskMgr.add(self._record_frame, 'game-replay-recorder', sort=-100)
+        # Leave the game's set-up time out of the first frame: the first tick ends the
+        # interval it spans, the second makes the first recorded dt ~0
+        self._clock.tick()
+        self._clock.tick()
+
+    def _record_frame(self, task):
+        # Runs first in every frame, so events handled later in it get this frame's number.
+        # The clock ticked when the previous frame was rendered, so this dt is already part
+        # of the frame time that doMethodLater and intervals see in this frame
+        self.recording.frame_us.append(round(self._clock.getDt() * 1000000))
+        return task.cont
+
+    def _record_send(self, event, sentArgs=[], taskChain=None):
+        if not sentArgs and self.game.isAccepting(event):
+            self.recording.events.append((max(0, self.recording.frames - 1), event))
+        return self._send(event, sentArgs, taskChain)
+
+    def finish(self):
+        """Stop recording and capture the game's final state"""
+        self.game.messenger.send = self._send
+        self.game.taskMgr.remove('game-replay-recorder')
+        self.recording.state = game_state(self.game)
+        return self.recording
+
+
+def record(module_name, path, game_id=None, seed=None):
+    """Play a game in a window, writing the session to path when it ends"""
+    seed = secrets.randbits(32) if seed is None else seed
+    game = game_class(module_name)(seed=seed)
+    recorder = Recorder(game, Recording(module_name, game_id, seed))
+    try:
+        game.run()
+    finally:
+        # ShowBase.run() ends with sys.exit() when the window is closed
+        recording = recorder.finish()
+        recording.save(path)
+        print(f"Recorded {recording.frames} frames and {len(recording.events)} events to {path}",
+              file=sys.stderr)
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {'mean': 0.0, 'p50': 0.0, 'p90': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+
+    def at(fraction):
+        return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 3)
+
+    return {
+        'mean': round(sum(samples) / len(samples), 3),
+        'p50': at(0.50),
+        'p90': at(0.90),
+        'p95': at(0.95),
+        'p99': at(0.99),
+        'max': round(samples[-1], 3)
+    }
+
+
+def _node_counts(game):
+    from panda3d.core import SceneGraphAnalyzer
+    analyzer = SceneGraphAnalyzer()
+    analyzer.addNode(game.render.node())
+    return {
+        'render': game.render.findAllMatches('**').getNumPaths(),
+        'render_geom_nodes': game.render.findAllMatches('**/+GeomNode').getNumPaths(),
+        # One draw call each (an instanced Geom draws all its copies in one)
+        'render_geoms': analyzer.getNumGeoms(),
+        'render2d': game.render2d.findAllMatches('**').getNumPaths()
+    }
+
+
+def _set_dt(clock, dt_us):
+    if dt_us is not None:
+        # Panda3D rejects a dt of 0, which a recording can hold for its first frame
+        clock.setDt(max(dt_us, 1) / 1000000)
+
+
+def replay(recording, warmup=0):
+    """Replay a recording offscreen in this process as fast as possible; returns
+    frame time percentiles, per-task timings, node counts and whether the game
+    ended in the recorded state. Call once per process (one ShowBase each)."""
+    from panda3d.core import ClockObject, Event, EventQueue, PandaSystem, loadPrcFileData
+    from games import asset_cache
+    loadPrcFileData('game-replay', '\n'.join([
+        'window-type offscreen',
+        'audio-library-name null',
+        'sync-video false'
+    ]))
+
+    start = time.perf_counter()
+    game = game_class(recording.module)(seed=recording.seed, **recording.options)
+    setup_ms = (time.perf_counter() - start) * 1000
+
+    clock = ClockObject.getGlobalClock()
+    clock.setMode(ClockObject.MNonRealTime)
+    queue = EventQueue.getGlobalEventQueue()
+
+    # In non-real-time mode each tick advances the frame time by the dt set before it,
+    # and igLoop (sort 50) ticks the clock when it renders. A recorded dt is already part
+    # of its frame's frame time, so tick into frame 0 here and, just before igLoop in
+    # every frame, set the dt that its tick carries into the next one
+    upcoming = iter(recording.frame_us[1:])
+
+    def set_next_dt(task):
+        _set_dt(clock, next(upcoming, None))
+        return task.cont
+
+    if recording.frame_us:
+        _set_dt(clock, recording.frame_us[0])
+        clock.tick()
+    game.taskMgr.add(set_next_dt, 'game-replay-clock', sort=49)
+    nodes_start = _node_counts(game)
+
+    events = {}
+    for frame, event in recording.events:
+        events.setdefault(frame, []).append(event)
+
+    frame_ms = []
+    tasks = {}
+    exited = False
+    for frame in range(recording.frames):
+        start = time.perf_counter()
+        for event in events.get(frame, ()):
+            queue.queueEvent(Event(event))
+        try:
+            game.taskMgr.step()
+        except SystemExit:
+            exited = True  # the session ended with escape
+        elapsed = (time.perf_counter() - start) * 1000
+        if exited:
+            break
+        if frame < warmup:
+            continue
+        frame_ms.append(elapsed)
+        # Panda3D keeps average/max run time per task; remember the latest
+        # figures of every task seen, including ones that finish mid-run
+        for task in game.taskMgr.mgr.getTasks():
+            name = task.getName()
+            seen = tasks.get(name)
+            tasks[name] = (task.getAverageDt(), task.getMaxDt(), (seen[2] if seen else 0) + 1)
+
+    state = game_state(game)
+    result = {
+        'module': recording.module,
+        'game_id': recording.game_id,
+        'seed': recording.seed,
+        'options': recording.options,
+        'panda3d': PandaSystem.getVersionString(),
+        'setup_ms': round(setup_ms, 3),
+        'asset_cache': asset_cache.stats(),  # scenery loaded from / built into the .bam cache during setup
+        'frames': len(frame_ms),
+        'warmup_frames': min(warmup, recording.frames),
+        'recorded_seconds': round(sum(recording.frame_us) / 1000000, 3),
+        'replay_seconds': round(sum(frame_ms) / 1000, 3),
+        'frame_ms': _percentiles(frame_ms),
+        'tasks': sorted(({
+            'name': name,
+            'frames_alive': alive,
+            'mean_ms': round(average * 1000, 4),
+            'max_ms': round(maximum * 1000, 4),
+            'approx_total_ms': round(average * alive * 1000, 3)
+        } for name, (average, maximum, alive) in tasks.items()),
+            key=lambda task: task['approx_total_ms'], reverse=True),
+        'nodes_start': nodes_start,
+        'nodes_end': _node_counts(game),
+        # Fixed-step loop, frame time histogram and task budgets of games on games/engine.py
+        'engine': game.engine_stats() if hasattr(game, 'engine_stats') else None,
+        'state': state,
+        'state_matches': None if recording.state is None else state == recording.state
+    }
+    if not exited:
+        game.destroy()
+    return result
+
+
+def replay_isolated(recording, warmup=0):
+    """replay() in a fresh process (Panda3D allows one ShowBase per process)"""
+    with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(replay, recording, warmup).result()
+
+
+def write_report(results, output=None):
+    """Write replay results as a JSON report to output, or stdout"""
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(),
+                 'cpus': os.cpu_count()},
+        'games': results
+    }
+    body = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(body + '\n')
+    else:
+        print(body)
+    return report
+
+
+def summary(result):
+    """One line per replayed game"""
+    frame_ms = result['frame_ms']
+    line = (f"{result['game_id'] or result['module']}: {result['frames']} frames, "
+            f"p50 {frame_ms['p50']:.2f} ms, p95 {frame_ms['p95']:.2f} ms, p99 {frame_ms['p99']:.2f} ms, "
+            f"max {frame_ms['max']:.2f} ms, {result['nodes_end']['render']} render nodes")
+    if result.get('engine'):
+        line += f", {result['engine']['frame_overruns']} frames over budget"
+    if result['state_matches'] is False:
+        line += ' - DIVERGED from the recorded state'
+    return line
+
+
+def _scripted_session(module_name, game_id, seed, frames=300):
+    """Play a quiz game (one with current_problem, like grade 6 mathematics) offscreen on
+    the real clock, typing each answer on the first frame its problem is shown; returns
+    the recording. New problems come from doMethodLater, so a replay whose frame time
+    lags the recording types an answer into the previous problem and diverges."""
+    from panda3d.core import Event, EventQueue, loadPrcFileData
+    loadPrcFileData('game-replay', '\n'.join([
+        'window-type offscreen',
+        'audio-library-name null',
+        'sync-video false'
+    ]))
+    game = game_class(module_name)(seed=seed)
+    recorder = Recorder(game, Recording(module_name, game_id, seed))
+    queue = EventQueue.getGlobalEventQueue()
+    answered = None
+    for _ in range(frames):
+        problem = game.current_problem
+        if game.game_running and problem is not answered:
+            for digit in str(problem['answer']):
+                queue.queueEvent(Event(digit))
+            answered = problem
+        game.taskMgr.step()
+        time.sleep(0.01)
+    recording = recorder.finish()
+    game.destroy()
+    return recording
+
+
+def check(grade=6, subject='mathematics'):
+    """Record a scripted session of a game driven by doMethodLater and check that its
+    replay ends in the recorded state"""
+    game = GameRegistry(Config.GAMES_DIR).python_game(grade, subject)
+    with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+        recording = pool.submit(_scripted_session, game.module, game.game_id, 1234).result()
+    result = replay_isolated(recording)
+    print(summary(result))
+    assert recording.state['score'] >= 20, f'the scripted session answered too little: {recording.state}'
+    assert result['state_matches'], f"replay ended in {result['state']}, recorded {recording.state}"
+    print(f"OK: {recording.frames} recorded frames replayed to the same state {recording.state}")
+
+
+def _main(args):
+    options = {}
+    for name in ('--warmup', '--output'):
+        if name in args:
+            index = args.index(name)
+            options[name[2:]] = args[index + 1]
+            del args[index:index + 2]
+
+    if args[:1] == ['record'] and len(args) in (3, 4):
+        grade, subject = int(args[1]), args[2].lower()
+        game = GameRegistry(Config.GAMES_DIR).python_game(grade, subject)
+        if game is None:
+            print(f"Game not found: grade {grade} {subject}")
+            return 1
+        path = args[3] if len(args) == 4 else f"{game.game_id}-{time.strftime('%Y%m%d-%H%M%S')}.replay"
+        try:
+            record(game.module, path, game.game_id)
+        except SystemExit:
+            pass
+        return 0
+
+    if args[:1] == ['replay'] and len(args) > 1:
+        results = []
+        diverged = False
+        for path in args[1:]:
+            result = replay_isolated(Recording.load(path), int(options.get('warmup', 0)))
+            result['recording'] = path
+            print(summary(result), file=sys.stderr)
+            diverged = diverged or result['state_matches'] is False
+            results.append(result)
+        write_report(results, options.get('output'))
+        return 2 if diverged else 0
+
+    if args == ['--check']:
+        check()
+        return 0
+
+    print(__doc__.strip())
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,224 @@
+"""
+Compiled scenery cache for the Panda3D games
+Each game module lists the static scenery and props it builds procedurally
+in a module-level ASSETS dict (name -> function returning a NodePath). The
+first launch builds them and writes them as .bam files; later launches load
+the .bam instead of re-running the Python that builds and flattens them.
+
+Files live in GAME_ASSET_CACHE_DIR/<Panda3D version>-v<FORMAT_VERSION>/ and
+are named after the asset and a hash of the source code that generates it
+(the game module and scene_builder.py), so editing a generator, upgrading
+Panda3D or changing the cache format makes the next launch rebuild. Files
+are written to a temporary name and renamed, so two games starting at once
+never read a half-written file. Textures are stored as raw pixels inside the
+.bam, which makes files bigger but skips decoding the images on every launch.
+
+Usage: python -m games.asset_cache --build [<grade> <subject> ...]
+       python -m games.asset_cache --benchmark [<grade> <subject> ...] [--output results.json]
+"""
+
+import glob
+import hashlib
+import importlib
+import inspect
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from config import Config
+
+FORMAT_VERSION = 1
+
+_source_hashes = {}  # source file -> sha256 of its contents
+_lock = threading.Lock()
+_counters = {'hits': 0, 'builds': 0, 'load_ms': 0.0, 'build_ms': 0.0}
+
+
+def cache_dir(root=None):
+    """The versioned directory cached assets are read from and written to"""
+    from panda3d.core import PandaSystem
+    return os.path.join(root or Config.GAME_ASSET_CACHE_DIR,
+                        f'panda3d-{PandaSystem.getVersionString()}-v{FORMAT_VERSION}')
+
+
+def _file_hash(path):
+    digest = _source_hashes.get(path)
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = _source_hashes[path] = hashlib.sha256(f.read()).hexdigest()
+    return digest
+
+
+def source_key(builder):
+    """Hash of the code that generates an asset: the builder's module and scene_builder.py"""
+    from games import scene_builder
+    digest = hashlib.sha256()
+    for path in sorted({inspect.getsourcefile(builder), inspect.getsourcefile(scene_builder)}):
+        digest.update(_file_hash(path).encode())
+    digest.update(builder.__qualname__.encode())
+    return digest.hexdigest()[:16]
+
+
+def asset_path(name, builder, root=None):
+    """Where the .bam file of an asset built by builder is (or would be) cached"""
+    return os.path.join(cache_dir(root), f'{name}-{source_key(builder)}.bam')
+
+
+def _load(path):
+    from panda3d.core import Filename, Loader, LoaderOptions, NodePath
+    # Our own cache: bypass Panda3D's model cache and error reporting for missing files
+    options = LoaderOptions(LoaderOptions.LF_no_cache | LoaderOptions.LF_report_errors)
+    node = Loader.getGlobalPtr().loadSync(Filename.fromOsSpecific(path), options)
+    return NodePath(node) if node is not None else None
+
+
+def _write(nodepath, path):
+    """Write a .bam atomically and remove the asset's files built from older code"""
+    from panda3d.core import BamFile, BamWriter, Filename
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix='.bam', dir=directory)
+    os.close(fd)
+    try:
+        bam = BamFile()
+        if not bam.openWrite(Filename.fromOsSpecific(tmp)):
+            raise OSError(f'could not write {tmp}')
+        # Store decoded texture pixels: reading them back is several times faster than decoding the images
+        bam.getWriter().setFileTextureMode(BamWriter.BTM_rawdata)
+        written = bam.writeObject(nodepath.node())
+        bam.close()
+        if not written:
+            raise OSError(f'could not write {tmp}')
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Asset cache: not caching {os.path.basename(path)}: {e}", file=sys.stderr)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return
+    name = os.path.basename(path).rsplit('-', 1)[0]
+    for stale in glob.glob(os.path.join(directory, f'{name}-*.bam')):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def load_asset(name, builder, root=None):
+    """The asset from the cache, built and cached first if it isn't there (or its code changed)"""
+    path = asset_path(name, builder, root)
+    start = time.perf_counter()
+    if os.path.exists(path):
+        nodepath = _load(path)
+        if nodepath is not None:
+            with _lock:
+                _counters['hits'] += 1
+                _counters['load_ms'] += (time.perf_counter() - start) * 1000
+            return nodepath
+        print(f"Asset cache: {path} is unreadable, rebuilding", file=sys.stderr)
+
+    nodepath = builder()
+    _write(nodepath, path)
+    with _lock:
+        _counters['builds'] += 1
+        _counters['build_ms'] += (time.perf_counter() - start) * 1000
+    return nodepath
+
+
+def build(module_names, root=None):
+    """Build and cache every asset of the given game modules; returns {asset name: path}"""
+    paths = {}
+    for module_name in module_names:
+        module = importlib.import_module(module_name)
+        for name, builder in getattr(module, 'ASSETS', {}).items():
+            load_asset(name, builder, root)
+            paths[name] = asset_path(name, builder, root)
+    return paths
+
+
+def stats():
+    """Asset loads served from the cache and assets (re)built this process"""
+    with _lock:
+        return {
+            'hits': _counters['hits'],
+            'builds': _counters['builds'],
+            'load_ms': round(_counters['load_ms'], 3),
+            'build_ms': round(_counters['build_ms'], 3)
+        }
+
+
+def _entries(args):
+    from game_registry import GameRegistry
+    registry = GameRegistry(Config.GAMES_DIR)
+    if not args:
+        return sorted(registry.python_games(), key=lambda entry: (entry.grade, entry.subject_id))
+    entries = []
+    for grade, subject in zip(args[0::2], args[1::2]):
+        entry = registry.python_game(int(grade), subject.lower())
+        if entry is None:
+            raise ValueError(f"Game not found: grade {grade} {subject}")
+        entries.append(entry)
+    return entries
+
+
+def benchmark(entries, output=None, runs=3):
+    """Game start-up time (constructor, offscreen) with an empty and with a filled cache"""
+    from game_replay import Recording, replay_isolated, write_report
+
+    results = []
+    saved = os.environ.get('SHIKSHA_GAME_ASSET_CACHE_DIR')
+    try:
+        for entry in entries:
+            timings = {'cold': [], 'warm': []}
+            for _ in range(runs):
+                with tempfile.TemporaryDirectory() as root:
+                    # Replays run in spawned processes, which read the cache location from the environment
+                    os.environ['SHIKSHA_GAME_ASSET_CACHE_DIR'] = root
+                    for kind in ('cold', 'warm'):
+                        result = replay_isolated(Recording(entry.module, entry.game_id, 0, [16667]))
+                        timings[kind].append((result['setup_ms'], result['asset_cache']))
+            cold = min(timings['cold'], key=lambda timing: timing[0])
+            warm = min(timings['warm'], key=lambda timing: timing[0])
+            print(f"{entry.game_id}: start-up {cold[0]:.1f} ms with an empty cache "
+                  f"({cold[1]['build_ms']:.1f} ms building scenery), {warm[0]:.1f} ms cached "
+                  f"({warm[1]['load_ms']:.1f} ms loading it), best of {runs}", file=sys.stderr)
+            results.append({'module': entry.module, 'game_id': entry.game_id, 'grade': entry.grade,
+                            'subject': entry.subject,
+                            'cold': [{'setup_ms': setup_ms, 'asset_cache': assets} for setup_ms, assets in timings['cold']],
+                            'warm': [{'setup_ms': setup_ms, 'asset_cache': assets} for setup_ms, assets in timings['warm']]})
+    finally:
+        if saved is None:
+            os.environ.pop('SHIKSHA_GAME_ASSET_CACHE_DIR', None)
+        else:
+            os.environ['SHIKSHA_GAME_ASSET_CACHE_DIR'] = saved
+    return write_report(results, output)
+
+
+def _main(args):
+    output = None
+    if '--output' in args:
+        index = args.index('--output')
+        output = args[index + 1]
+        del args[index:index + 2]
+    if args[:1] not in (['--build'], ['--benchmark']) or len(args) % 2 == 0:
+        print(__doc__.strip())
+        return 1
+    try:
+        entries = _entries(args[1:])
+    except ValueError as e:
+        print(e)
+        return 1
+
+    if args[0] == '--build':
+        for name, path in build([entry.module for entry in entries]).items():
+            print(f"{name}: {path}")
+        print(f"Built {stats()['builds']} assets, {stats()['hits']} already cached in {cache_dir()}")
+    else:
+        benchmark(entries, output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,230 @@
+"""
+Common base class for the Panda3D games
+GameEngine is a ShowBase that runs game logic on a fixed timestep: every
+frame the clock's dt goes into an accumulator, and fixed tasks (movement,
+collisions...) run once per FIXED_DT it holds, so they see the same dt on a
+lab PC rendering at 15 fps as on one rendering at 144. Frame tasks run once
+per rendered frame after the steps, with alpha - how far the clock is
+between the last step and the next - to interpolate what they draw. When a
+frame is so slow that catching up would take more than MAX_STEPS_PER_FRAME
+steps, the rest is dropped (the game slows down instead of stalling).
+
+Every engine task has a time budget; runs over it are counted per task, and
+wall-clock frame times go into a histogram. F3 shows them on screen, and
+engine_stats() returns them as JSON-compatible data (benchmark and replay
+reports include it, see game_replay.py).
+"""
+
+import bisect
+import json
+import random
+import time
+
+from direct.showbase.ShowBase import ShowBase
+from direct.gui.OnscreenText import OnscreenText
+from panda3d.core import ClockObject, TextNode
+
+FIXED_DT = 1.0 / 60
+MAX_STEPS_PER_FRAME = 8  # keeps logic at full speed down to 7.5 fps
+TASK_BUDGET_MS = 2.0  # default per run of an engine task
+FRAME_BUDGET_MS = 1000.0 / 30  # frames slower than this are counted as overruns
+HISTOGRAM_BOUNDS_MS = (4, 8, 16.7, 33.3, 50, 100, 250)
+STATS_REFRESH_SECONDS = 0.5
+
+
+class FrameHistogram:
+    """Counts of frame times (ms) in buckets with the given upper bounds, plus an overflow bucket"""
+
+    def __init__(self, bounds=HISTOGRAM_BOUNDS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+        self.total += 1
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of frames (max_ms for the overflow bucket)"""
+        target = self.total * fraction
+        seen = 0
+        for bound, count in zip(self.bounds + (self.max_ms,), self.counts):
+            seen += count
+            if seen >= target and seen:
+                return bound
+        return 0.0
+
+    def as_dict(self):
+        labels = [f'<{bound}' for bound in self.bounds] + [f'>={self.bounds[-1]}']
+        return dict(zip(labels, self.counts))
+
+
+class _EngineTask:
+    """A fixed or frame task and the cost of its runs"""
+
+    __slots__ = ('name', 'function', 'kind', 'budget_ms', 'calls', 'total_ms', 'max_ms', 'overruns')
+
+    def __init__(self, name, function, kind, budget_ms):
+        self.name = name
+        self.function = function
+        self.kind = kind
+        self.budget_ms = budget_ms
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.overruns = 0
+
+    def run(self, argument):
+        start = time.perf_counter()
+        self.function(argument)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.calls += 1
+        self.total_ms += elapsed
+        if elapsed > self.max_ms:
+            self.max_ms = elapsed
+        if elapsed > self.budget_ms:
+            self.overruns += 1
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'budget_ms': self.budget_ms,
+            'calls': self.calls,
+            'mean_ms': round(self.total_ms / self.calls, 4) if self.calls else 0.0,
+            'max_ms': round(self.max_ms, 4),
+            'overruns': self.overruns
+        }
+
+
+class GameEngine(ShowBase):
+    """ShowBase with a fixed-timestep update loop, per-task time budgets and frame statistics"""
+
+    def __init__(self, seed=None, fixed_dt=FIXED_DT):
+        ShowBase.__init__(self)
+
+        # All game randomness comes from here, so a seed makes a session replayable
+        self.rng = random.Random(seed)
+
+        self.fixed_dt = fixed_dt
+        self.accumulator = 0.0
+        self.alpha = 0.0  # 0..1 between the last fixed step and the next
+        self.sim_time = 0.0  # game time advanced by fixed steps
+        self.frames = 0
+        self.steps = 0
+        self.max_steps = 0  # most steps run in one frame
+        self.dropped_ms = 0.0  # game time skipped when frames were too slow to catch up
+        self.frame_overruns = 0
+        self.frame_histogram = FrameHistogram()
+        self._fixed_tasks = []
+        self._frame_tasks = []
+        self._last_frame = None
+        self._stats_text = None
+        self._stats_refreshed = 0.0
+
+        self.accept("f3", self.toggle_stats)
+        # After input events (eventManager) and intervals, before rendering (igLoop)
+        self.taskMgr.add(self._engine_frame, "engine_frame", sort=40)
+
+    def add_fixed_task(self, function, name, budget_ms=TASK_BUDGET_MS):
+        """Call function(dt) on every fixed step"""
+        self._fixed_tasks.append(_EngineTask(name, function, 'fixed', budget_ms))
+
+    def add_frame_task(self, function, name, budget_ms=TASK_BUDGET_MS):
+        """Call function(alpha) once per rendered frame, after the frame's fixed steps"""
+        self._frame_tasks.append(_EngineTask(name, function, 'frame', budget_ms))
+
+    def remove_engine_task(self, name):
+        """Stop a fixed or frame task"""
+        self._fixed_tasks = [task for task in self._fixed_tasks if task.name != name]
+        self._frame_tasks = [task for task in self._frame_tasks if task.name != name]
+
+    def lerp(self, previous, current):
+        """A position between its values at the last two fixed steps, for drawing"""
+        alpha = self.alpha
+        return [p + (c - p) * alpha for p, c in zip(previous, current)]
+
+    @property
+    def render_time(self):
+        """Game time of the frame being drawn (between the last two fixed steps)"""
+        return self.sim_time - (1.0 - self.alpha) * self.fixed_dt
+
+    def _engine_frame(self, task):
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            frame_ms = (now - self._last_frame) * 1000
+            self.frame_histogram.add(frame_ms)
+            if frame_ms > FRAME_BUDGET_MS:
+                self.frame_overruns += 1
+        self._last_frame = now
+        self.frames += 1
+
+        self.accumulator += ClockObject.getGlobalClock().getDt()
+        steps = 0
+        while self.accumulator >= self.fixed_dt:
+            if steps == MAX_STEPS_PER_FRAME:
+                self.dropped_ms += self.accumulator * 1000
+                self.accumulator = 0.0
+                break
+            for fixed_task in self._fixed_tasks:
+                fixed_task.run(self.fixed_dt)
+            self.accumulator -= self.fixed_dt
+            self.sim_time += self.fixed_dt
+            steps += 1
+        self.steps += steps
+        self.max_steps = max(self.max_steps, steps)
+
+        self.alpha = self.accumulator / self.fixed_dt
+        for frame_task in self._frame_tasks:
+            frame_task.run(self.alpha)
+
+        if self._stats_text is not None and now - self._stats_refreshed >= STATS_REFRESH_SECONDS:
+            self._stats_refreshed = now
+            self._stats_text.setText(self._stats_summary())
+        return task.cont
+
+    def engine_stats(self):
+        """Loop, frame time and per-task budget figures as JSON-compatible data"""
+        return {
+            'fixed_dt_ms': round(self.fixed_dt * 1000, 3),
+            'frames': self.frames,
+            'steps': self.steps,
+            'max_steps_per_frame': self.max_steps,
+            'dropped_ms': round(self.dropped_ms, 3),
+            'frame_budget_ms': round(FRAME_BUDGET_MS, 3),
+            'frame_overruns': self.frame_overruns,
+            'frame_ms_histogram': self.frame_histogram.as_dict(),
+            'tasks': {task.name: task.as_dict() for task in self._fixed_tasks + self._frame_tasks}
+        }
+
+    def write_stats(self, path):
+        """Write engine_stats() to a JSON file"""
+        with open(path, 'w') as f:
+            json.dump(self.engine_stats(), f, indent=2)
+            f.write('\n')
+
+    def _stats_summary(self):
+        histogram = self.frame_histogram
+        lines = [
+            f"frame p50 <{histogram.percentile(0.5):.1f} ms  p95 <{histogram.percentile(0.95):.1f} ms  "
+            f"max {histogram.max_ms:.1f} ms",
+            f"steps/frame {self.steps / max(1, self.frames):.2f} (max {self.max_steps})  "
+            f"overruns {self.frame_overruns}  dropped {self.dropped_ms:.0f} ms"
+        ]
+        for task in self._fixed_tasks + self._frame_tasks:
+            mean = task.total_ms / task.calls if task.calls else 0.0
+            lines.append(f"{task.name}: {mean:.2f} / {task.budget_ms:.1f} ms, max {task.max_ms:.2f}, "
+                         f"overruns {task.overruns}")
+        return '\n'.join(lines)
+
+    def toggle_stats(self):
+        """Show or hide the engine statistics overlay"""
+        if self._stats_text is None:
+            self._stats_text = OnscreenText(text=self._stats_summary(), parent=self.a2dTopRight,
+                                            pos=(-0.05, -0.08), scale=0.04, fg=(1, 1, 0, 1),
+                                            bg=(0, 0, 0, 0.5), align=TextNode.ARight, mayChange=True)
+            self._stats_refreshed = time.perf_counter()
+        else:
+            self._stats_text.destroy()
+            self._stats_text = None
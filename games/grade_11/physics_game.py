@@ -15,9 +15,32 @@ import random
 import math
 import sys
 
-class PhysicsGame(ShowBase):
-    def __init__(self):
-        ShowBase.__init__(self)
+import numpy as np
+
+from games.asset_cache import load_asset
+from games.engine import GameEngine
+from games.scene_builder import flatten_static, make_box, make_plane
+
+def build_laboratory():
+    """Lab floor, walls and bench; they never move, so they are merged into one Geom"""
+    lab = NodePath("laboratory")
+    make_plane("floor", frame=(-20, 20, -20, 20), z=-1, color=(0.8, 0.8, 0.9, 1)).reparentTo(lab)  # Light blue lab floor
+    
+    # Back and side walls
+    wall_color = (0.9, 0.9, 0.9, 1)
+    make_box("back_wall", size=(40, 0.2, 10), center=(0, 20, 5), color=wall_color).reparentTo(lab)
+    make_box("left_wall", size=(0.2, 20, 10), center=(-20, -10, 5), color=wall_color).reparentTo(lab)
+    make_box("right_wall", size=(0.2, 20, 10), center=(20, 10, 5), color=wall_color).reparentTo(lab)
+    
+    make_box("bench", size=(16, 4, 0.2), center=(0, 5, 0.9), color=(0.6, 0.4, 0.2, 1)).reparentTo(lab)  # Wood color
+    return flatten_static(lab)
+
+# Static scenery compiled to .bam files by games/asset_cache.py
+ASSETS = {"physics_laboratory": build_laboratory}
+
+class PhysicsGame(GameEngine):
+    def __init__(self, seed=None, wave_resolution=160):
+        GameEngine.__init__(self, seed)
         
         # Game state
         self.score = 0
@@ -26,6 +49,9 @@ class PhysicsGame(ShowBase):
         self.current_experiment = None
         self.game_running = True
         
+        # Samples along the wave demonstration (more is smoother)
+        self.wave_resolution = wave_resolution
+        
         # Physics experiments for Grade 11
         self.physics_experiments = {
             'projectile_motion': {
@@ -73,8 +99,8 @@ class PhysicsGame(ShowBase):
         self.setup_controls()
         self.start_experiment()
         
-        # Start the game loop
-        self.taskMgr.add(self.game_loop, "game_loop")
+        # Game logic on the engine's fixed timestep
+        self.add_fixed_task(self.game_loop, "game_loop")
         
     def setup_environment(self):
         """Setup the physics laboratory environment"""
@@ -85,22 +111,9 @@ class PhysicsGame(ShowBase):
         self.camera.setPos(0, -30, 10)
         self.camera.lookAt(0, 0, 0)
         
-        # Create laboratory environment
-        self.lab = self.render.attachNewNode("laboratory")
-        
-        # Lab floor
-        floor_cm = CardMaker("floor")
-        floor_cm.setFrame(-20, 20, -20, 20)
-        self.floor = self.lab.attachNewNode(floor_cm.generate())
-        self.floor.setP(-90)
-        self.floor.setColor(0.8, 0.8, 0.9, 1)  # Light blue lab floor
-        self.floor.setPos(0, 0, -1)
-        
-        # Lab walls
-        self.create_lab_walls()
-        
-        # Lab bench
-        self.create_lab_bench()
+        # Floor, walls and bench (one Geom), from the compiled asset cache
+        self.lab = load_asset("physics_laboratory", build_laboratory)
+        self.lab.reparentTo(self.render)
         
         # Add professional lighting
         alight = AmbientLight('alight')
@@ -115,37 +128,6 @@ class PhysicsGame(ShowBase):
         dlnp = self.render.attachNewNode(dlight)
         self.render.setLight(dlnp)
         
-    def create_lab_walls(self):
-        """Create laboratory walls"""
-        wall_cm = CardMaker("wall")
-        wall_cm.setFrame(-20, 20, 0, 10)
-        
-        # Back wall
-        back_wall = self.lab.attachNewNode(wall_cm.generate())
-        back_wall.setPos(0, 20, 0)
-        back_wall.setColor(0.9, 0.9, 0.9, 1)
-        
-        # Side walls
-        wall_cm.setFrame(-20, 0, 0, 10)
-        left_wall = self.lab.attachNewNode(wall_cm.generate())
-        left_wall.setPos(-20, 0, 0)
-        left_wall.setH(90)
-        left_wall.setColor(0.9, 0.9, 0.9, 1)
-        
-        right_wall = self.lab.attachNewNode(wall_cm.generate())
-        right_wall.setPos(20, 0, 0)
-        right_wall.setH(-90)
-        right_wall.setColor(0.9, 0.9, 0.9, 1)
-        
-    def create_lab_bench(self):
-        """Create laboratory bench"""
-        bench_cm = CardMaker("bench")
-        bench_cm.setFrame(-8, 8, -2, 2)
-        self.bench = self.lab.attachNewNode(bench_cm.generate())
-        self.bench.setP(-90)
-        self.bench.setPos(0, 5, 1)
-        self.bench.setColor(0.6, 0.4, 0.2, 1)  # Wood color
-        
     def setup_lab_equipment(self):
         """Setup physics lab equipment"""
         self.equipment = self.render.attachNewNode("equipment")
@@ -200,18 +182,34 @@ class PhysicsGame(ShowBase):
         
     def create_wave_generator(self):
         """Create wave motion demonstration"""
-        # Wave medium
-        self.wave_points = []
-        for i in range(20):
-            point_cm = CardMaker(f"wave_point_{i}")
-            point_cm.setFrame(-0.1, 0.1, -0.1, 0.1)
-            point = self.equipment.attachNewNode(point_cm.generate())
-            point.setColor(0, 0.5, 1, 1)  # Blue wave
-            point.setPos(i - 10, 10, 2)
-            self.wave_points.append(point)
+        # One strip mesh for the whole wave medium: wave_resolution samples
+        # from x = -10 to 9, two vertices (top and bottom edge) per sample
+        samples = max(2, self.wave_resolution)
+        self.wave_x = np.linspace(-10, 9, samples, dtype=np.float32)
+        # Phase of each sample: the old 20 points were 1 unit apart, 0.5 rad each
+        self.wave_phase = (self.wave_x + 10) * 0.5
+        self.wave_vertices = np.empty((samples * 2, 3), dtype=np.float32)
+        self.wave_vertices[:, 0] = np.repeat(self.wave_x, 2)
+        self.wave_vertices[:, 1] = 10
+        self.wave_vertices[:, 2] = 2
+        
+        self.wave_vdata = GeomVertexData("wave", GeomVertexFormat.getV3(), Geom.UHDynamic)
+        self.wave_vdata.uncleanSetNumRows(samples * 2)
+        strip = GeomTristrips(Geom.UHStatic)
+        strip.addConsecutiveVertices(0, samples * 2)
+        strip.closePrimitive()
+        geom = Geom(self.wave_vdata)
+        geom.addPrimitive(strip)
+        node = GeomNode("wave")
+        node.addGeom(geom)
+        
+        self.wave = self.equipment.attachNewNode(node)
+        self.wave.setColor(0, 0.5, 1, 1)  # Blue wave
+        self.wave.setTwoSided(True)
+        self.update_wave(0)
             
-        # Animate wave
-        self.taskMgr.add(self.animate_wave, "animate_wave")
+        # Animate wave, once per rendered frame
+        self.add_frame_task(self.animate_wave, "animate_wave")
         
     def create_instruments(self):
         """Create measuring instruments"""
@@ -357,13 +355,13 @@ class PhysicsGame(ShowBase):
         
     def start_experiment(self):
         """Start a new physics experiment"""
-        experiment_key = random.choice(list(self.physics_experiments.keys()))
+        experiment_key = self.rng.choice(list(self.physics_experiments.keys()))
         experiment = self.physics_experiments[experiment_key]
         
         self.current_experiment = {
             'key': experiment_key,
             'data': experiment,
-            'problem': random.choice(experiment['problems'])
+            'problem': self.rng.choice(experiment['problems'])
         }
         
         # Update UI
@@ -432,16 +430,22 @@ class PhysicsGame(ShowBase):
             
         self.start_experiment()
         
-    def animate_wave(self, task):
+    def animate_wave(self, alpha):
         """Animate wave motion"""
-        time = task.time
+        self.update_wave(self.render_time)
         
-        for i, point in enumerate(self.wave_points):
-            # Sine wave motion
-            y_offset = math.sin(time * 2 + i * 0.5) * 0.5
-            point.setZ(2 + y_offset)
-            
-        return task.cont
+    def update_wave(self, time):
+        """Write the wave's vertex heights for a point in time"""
+        # Sine wave motion, all samples at once
+        z = np.sin(self.wave_phase + time * 2)
+        z *= 0.5
+        z += 2
+        np.add(z, 0.1, out=self.wave_vertices[0::2, 2])
+        np.subtract(z, 0.1, out=self.wave_vertices[1::2, 2])
+        
+        # Straight into the vertex buffer (x, y, z float32 per row)
+        rows = memoryview(self.wave_vdata.modifyArray(0)).cast('B')
+        np.frombuffer(rows, dtype=np.float32).reshape(-1, 3)[:] = self.wave_vertices
         
     def update_ui(self):
         """Update the user interface"""
@@ -449,17 +453,15 @@ class PhysicsGame(ShowBase):
         self.level_text.setText(f"Level: {self.level}")
         self.experiments_text.setText(f"Experiments: {self.experiments_completed}")
         
-    def game_loop(self, task):
-        """Main game loop"""
+    def game_loop(self, dt):
+        """Main game loop, once per fixed step"""
         if not self.game_running:
-            return task.done
+            return
             
         # Rotate some equipment for visual appeal
         if hasattr(self, 'pendulum_bob'):
             # Pendulum motion is handled by intervals
             pass
-            
-        return task.cont
         
     def restart_game(self):
         """Restart the game"""
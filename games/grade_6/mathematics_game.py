@@ -15,9 +15,25 @@ import random
 import math
 import sys
 
-class MathematicsGame(ShowBase):
-    def __init__(self):
-        ShowBase.__init__(self)
+from games.asset_cache import load_asset
+from games.engine import GameEngine
+from games.scene_builder import flatten_static, make_box, make_plane
+
+def build_ground():
+    """Panda3D's sample environment, or a green plane without it, merged into as few Geoms as possible"""
+    model = Loader.getGlobalPtr().loadSync("environment")
+    if model is not None:
+        ground = NodePath(model)
+    else:
+        ground = make_plane("ground", frame=(-20, 20, -20, 20), color=(0.2, 0.8, 0.2, 1))  # Green ground
+    return flatten_static(ground)
+
+# Static scenery compiled to .bam files by games/asset_cache.py
+ASSETS = {"mathematics_ground": build_ground}
+
+class MathematicsGame(GameEngine):
+    def __init__(self, seed=None):
+        GameEngine.__init__(self, seed)
         
         # Game state
         self.score = 0
@@ -33,8 +49,9 @@ class MathematicsGame(ShowBase):
         self.setup_controls()
         self.generate_math_problem()
         
-        # Start the game loop
-        self.taskMgr.add(self.game_loop, "game_loop")
+        # Game logic on the engine's fixed timestep, the player drawn in between steps
+        self.add_fixed_task(self.game_loop, "game_loop")
+        self.add_frame_task(self.draw_player, "draw_player")
         
     def setup_environment(self):
         """Setup the 3D environment"""
@@ -45,20 +62,9 @@ class MathematicsGame(ShowBase):
         self.camera.setPos(0, -20, 4)
         self.camera.lookAt(0, 0, 0)
         
-        # Create a simple ground plane
-        self.ground = self.loader.loadModel("environment")
-        if not self.ground:
-            # Create a simple colored plane if model doesn't exist
-            self.ground = self.render.attachNewNode("ground")
-            # Add a simple colored quad
-            cm = CardMaker("ground")
-            cm.setFrame(-20, 20, -20, 20)
-            ground_card = self.ground.attachNewNode(cm.generate())
-            ground_card.setP(-90)  # Rotate to be horizontal
-            ground_card.setColor(0.2, 0.8, 0.2, 1)  # Green ground
-        
+        # The ground, from the compiled asset cache (built by build_ground)
+        self.ground = load_asset("mathematics_ground", build_ground)
         self.ground.reparentTo(self.render)
-        self.ground.setScale(1, 1, 1)
         self.ground.setPos(0, 0, -2)
         
         # Add some lighting
@@ -78,31 +84,16 @@ class MathematicsGame(ShowBase):
         # Create a simple player representation
         self.player = self.render.attachNewNode("player")
         
-        # Create a simple cube for the player
-        from panda3d.core import CardMaker
-        cm = CardMaker("player_cube")
-        cm.setFrame(-0.5, 0.5, -0.5, 0.5)
-        
-        # Create 6 faces of a cube
-        faces = []
-        for i in range(6):
-            face = self.player.attachNewNode(cm.generate())
-            face.setColor(0.2, 0.4, 0.8, 1)  # Blue player
-            faces.append(face)
-        
-        # Position faces to form a cube
-        faces[0].setPos(0, 0.5, 0)  # Front
-        faces[1].setPos(0, -0.5, 0)  # Back
-        faces[2].setPos(0.5, 0, 0); faces[2].setH(90)  # Right
-        faces[3].setPos(-0.5, 0, 0); faces[3].setH(90)  # Left
-        faces[4].setPos(0, 0, 0.5); faces[4].setP(90)  # Top
-        faces[5].setPos(0, 0, -0.5); faces[5].setP(90)  # Bottom
+        # Create a simple cube for the player (one Geom; setColor recolours it)
+        make_box("player_cube", size=(1, 1, 1), color=(1, 1, 1, 1)).reparentTo(self.player)
+        self.player.setColor(0.2, 0.4, 0.8, 1)  # Blue player
         
         self.player.setPos(0, 0, 0)
         
         # Player movement variables
         self.player_speed = 5
         self.player_pos = [0, 0, 0]
+        self.player_prev_pos = [0, 0, 0]  # at the previous fixed step, for interpolation
         
     def setup_ui(self):
         """Setup the user interface"""
@@ -196,14 +187,12 @@ class MathematicsGame(ShowBase):
         self.player_pos[0] = max(-10, min(10, self.player_pos[0]))
         self.player_pos[1] = max(-10, min(10, self.player_pos[1]))
         
-        self.player.setPos(self.player_pos[0], self.player_pos[1], self.player_pos[2])
-        
     def generate_math_problem(self):
         """Generate a new math problem based on current level"""
         if self.level <= 3:
             # Addition problems
-            a = random.randint(1, 20)
-            b = random.randint(1, 20)
+            a = self.rng.randint(1, 20)
+            b = self.rng.randint(1, 20)
             self.current_problem = {
                 'question': f"{a} + {b} = ?",
                 'answer': a + b,
@@ -211,8 +200,8 @@ class MathematicsGame(ShowBase):
             }
         elif self.level <= 6:
             # Subtraction problems
-            a = random.randint(10, 50)
-            b = random.randint(1, a)
+            a = self.rng.randint(10, 50)
+            b = self.rng.randint(1, a)
             self.current_problem = {
                 'question': f"{a} - {b} = ?",
                 'answer': a - b,
@@ -220,8 +209,8 @@ class MathematicsGame(ShowBase):
             }
         elif self.level <= 9:
             # Multiplication problems
-            a = random.randint(2, 12)
-            b = random.randint(2, 12)
+            a = self.rng.randint(2, 12)
+            b = self.rng.randint(2, 12)
             self.current_problem = {
                 'question': f"{a} × {b} = ?",
                 'answer': a * b,
@@ -229,8 +218,8 @@ class MathematicsGame(ShowBase):
             }
         else:
             # Division problems
-            b = random.randint(2, 12)
-            answer = random.randint(2, 20)
+            b = self.rng.randint(2, 12)
+            answer = self.rng.randint(2, 20)
             a = b * answer
             self.current_problem = {
                 'question': f"{a} ÷ {b} = ?",
@@ -320,13 +309,12 @@ class MathematicsGame(ShowBase):
         self.level_text.setText(f"Level: {self.level}")
         self.lives_text.setText(f"Lives: {self.lives}")
         
-    def game_loop(self, task):
-        """Main game loop"""
+    def game_loop(self, dt):
+        """Main game loop, once per fixed step"""
+        self.player_prev_pos = list(self.player_pos)
         if not self.game_running:
-            return task.done
+            return
             
-        dt = globalClock.getDt()
-        
         # Handle continuous movement
         if self.keys["up"]:
             self.move_player(0, self.player_speed * dt, 0)
@@ -337,7 +325,9 @@ class MathematicsGame(ShowBase):
         if self.keys["right"]:
             self.move_player(self.player_speed * dt, 0, 0)
             
-        return task.cont
+    def draw_player(self, alpha):
+        """Place the player between its last two fixed-step positions"""
+        self.player.setPos(*self.lerp(self.player_prev_pos, self.player_pos))
         
     def game_over(self):
         """Handle game over"""
@@ -359,6 +349,7 @@ class MathematicsGame(ShowBase):
         self.lives = 3
         self.game_running = True
         self.player_pos = [0, 0, 0]
+        self.player_prev_pos = [0, 0, 0]
         self.player.setPos(0, 0, 0)
         self.player.setColor(0.2, 0.4, 0.8, 1)
         
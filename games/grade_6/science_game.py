@@ -15,14 +15,38 @@ import random
 import math
 import sys
 
-class ScienceGame(ShowBase):
-    def __init__(self):
-        ShowBase.__init__(self)
+from games.asset_cache import load_asset
+from games.engine import GameEngine
+from games.scene_builder import flatten_static, instance, make_box, make_cylinder, make_plane
+from games.spatial_grid import SpatialGrid
+
+def build_environment():
+    """Grass and pond; they never move, so they are merged into one Geom"""
+    environment = NodePath("environment")
+    make_plane("ground", frame=(-30, 30, -30, 30), z=-1, color=(0.2, 0.8, 0.2, 1)).reparentTo(environment)  # Green grass
+    make_plane("pond", frame=(6, 14, 7, 13), z=-0.5, color=(0.2, 0.4, 0.8, 0.8)).reparentTo(environment)  # Blue water
+    return flatten_static(environment)
+
+def build_tree():
+    """A brown trunk under a dark green crown"""
+    tree = NodePath("tree")
+    make_cylinder("trunk", radius=0.3, height=3, color=(0.4, 0.2, 0.1, 1)).reparentTo(tree)
+    make_box("crown", size=(3, 3, 3), center=(0, 0, 3.5), color=(0.1, 0.6, 0.1, 1)).reparentTo(tree)
+    return tree
+
+# Static scenery compiled to .bam files by games/asset_cache.py
+ASSETS = {"science_environment": build_environment, "science_tree": build_tree}
+
+class ScienceGame(GameEngine):
+    def __init__(self, seed=None, specimen_count=12):
+        GameEngine.__init__(self, seed)
         
         # Game state
         self.score = 0
         self.level = 1
         self.specimens_collected = 0
+        self.specimen_count = specimen_count
+        self.collection_range = 2.0
         self.current_question = None
         self.game_running = True
         
@@ -59,8 +83,9 @@ class ScienceGame(ShowBase):
         self.setup_controls()
         self.generate_science_question()
         
-        # Start the game loop
-        self.taskMgr.add(self.game_loop, "game_loop")
+        # Game logic on the engine's fixed timestep, the player drawn in between steps
+        self.add_fixed_task(self.game_loop, "game_loop")
+        self.add_frame_task(self.draw_player, "draw_player")
         
     def setup_environment(self):
         """Setup the 3D nature environment"""
@@ -71,23 +96,13 @@ class ScienceGame(ShowBase):
         self.camera.setPos(0, -25, 8)
         self.camera.lookAt(0, 0, 0)
         
-        # Create a nature scene
-        self.environment = self.render.attachNewNode("environment")
-        
-        # Create ground (grass)
-        cm = CardMaker("ground")
-        cm.setFrame(-30, 30, -30, 30)
-        self.ground = self.environment.attachNewNode(cm.generate())
-        self.ground.setP(-90)  # Rotate to be horizontal
-        self.ground.setColor(0.2, 0.8, 0.2, 1)  # Green grass
-        self.ground.setPos(0, 0, -1)
+        # Ground and pond (one Geom), from the compiled asset cache
+        self.environment = load_asset("science_environment", build_environment)
+        self.environment.reparentTo(self.render)
         
         # Create some trees
         self.create_trees()
         
-        # Create a pond
-        self.create_pond()
-        
         # Add lighting
         alight = AmbientLight('alight')
         alight.setColor((0.3, 0.3, 0.3, 1))
@@ -102,36 +117,17 @@ class ScienceGame(ShowBase):
         
     def create_trees(self):
         """Create simple tree models"""
+        # One tree model, drawn at every position in a single instanced draw call
+        tree = load_asset("science_tree", build_tree)
+        
+        # Position trees randomly
+        positions = []
         for i in range(8):
-            tree = self.environment.attachNewNode(f"tree_{i}")
-            
-            # Tree trunk
-            trunk_cm = CardMaker("trunk")
-            trunk_cm.setFrame(-0.3, 0.3, 0, 3)
-            trunk = tree.attachNewNode(trunk_cm.generate())
-            trunk.setColor(0.4, 0.2, 0.1, 1)  # Brown
-            
-            # Tree leaves (crown)
-            crown_cm = CardMaker("crown")
-            crown_cm.setFrame(-1.5, 1.5, -1.5, 1.5)
-            crown = tree.attachNewNode(crown_cm.generate())
-            crown.setPos(0, 0, 3.5)
-            crown.setColor(0.1, 0.6, 0.1, 1)  # Dark green
+            x = self.rng.uniform(-20, 20)
+            y = self.rng.uniform(-20, 20)
+            positions.append((x, y, 0))
+        self.trees = instance(self, tree, self.render, positions, "trees")
             
-            # Position trees randomly
-            x = random.uniform(-20, 20)
-            y = random.uniform(-20, 20)
-            tree.setPos(x, y, 0)
-            
-    def create_pond(self):
-        """Create a simple pond"""
-        pond_cm = CardMaker("pond")
-        pond_cm.setFrame(-4, 4, -3, 3)
-        self.pond = self.environment.attachNewNode(pond_cm.generate())
-        self.pond.setP(-90)
-        self.pond.setPos(10, 10, -0.5)
-        self.pond.setColor(0.2, 0.4, 0.8, 0.8)  # Blue water
-        
     def setup_player(self):
         """Setup the player (nature explorer)"""
         self.player = self.render.attachNewNode("player")
@@ -156,14 +152,18 @@ class ScienceGame(ShowBase):
         # Player movement variables
         self.player_speed = 8
         self.player_pos = [0, 0, 0]
+        self.player_prev_pos = [0, 0, 0]  # at the previous fixed step, for interpolation
         
     def setup_specimens(self):
         """Setup collectible specimens around the environment"""
         self.specimens = []
+        # Specimens don't move, so their positions are indexed once for the
+        # per-frame collection check
+        self.specimen_grid = SpatialGrid(cell_size=self.collection_range)
         specimen_types = ['leaf', 'flower', 'rock', 'insect']
         colors = [(0.2, 0.8, 0.2, 1), (1, 0.8, 0.2, 1), (0.5, 0.5, 0.5, 1), (0.8, 0.2, 0.2, 1)]
         
-        for i in range(12):
+        for i in range(self.specimen_count):
             specimen = self.render.attachNewNode(f"specimen_{i}")
             
             # Create specimen visual
@@ -171,19 +171,20 @@ class ScienceGame(ShowBase):
             cm.setFrame(-0.3, 0.3, -0.3, 0.3)
             spec_visual = specimen.attachNewNode(cm.generate())
             
-            spec_type = random.choice(specimen_types)
+            spec_type = self.rng.choice(specimen_types)
             color_idx = specimen_types.index(spec_type)
             spec_visual.setColor(colors[color_idx])
             
             # Position randomly
-            x = random.uniform(-15, 15)
-            y = random.uniform(-15, 15)
+            x = self.rng.uniform(-15, 15)
+            y = self.rng.uniform(-15, 15)
             specimen.setPos(x, y, 0.5)
             
             # Add floating animation
             specimen.hprInterval(3, (360, 0, 0)).loop()
             
             self.specimens.append({
+                'index': self.specimen_grid.add(x, y, 0.5),
                 'node': specimen,
                 'type': spec_type,
                 'collected': False
@@ -202,7 +203,7 @@ class ScienceGame(ShowBase):
         
         # Specimens collected
         self.specimens_text = OnscreenText(
-            text=f"Specimens: {self.specimens_collected}/12",
+            text=f"Specimens: {self.specimens_collected}/{self.specimen_count}",
             pos=(-1.3, 0.8),
             scale=0.07,
             fg=(1, 1, 1, 1),
@@ -274,8 +275,8 @@ class ScienceGame(ShowBase):
         
     def generate_science_question(self):
         """Generate a new science question"""
-        topic = random.choice(list(self.science_topics.keys()))
-        question_data = random.choice(self.science_topics[topic]['questions'])
+        topic = self.rng.choice(list(self.science_topics.keys()))
+        question_data = self.rng.choice(self.science_topics[topic]['questions'])
         
         self.current_question = question_data
         self.question_text.setText(question_data['q'])
@@ -326,29 +327,22 @@ class ScienceGame(ShowBase):
         
     def check_specimen_collection(self):
         """Check if player is near any specimens"""
-        player_pos = self.player.getPos()
-        
-        for specimen in self.specimens:
-            if specimen['collected']:
-                continue
-                
-            spec_pos = specimen['node'].getPos()
-            distance = (player_pos - spec_pos).length()
-            
-            if distance < 2.0:  # Collection range
-                self.collect_specimen(specimen)
+        x, y, z = self.player_pos
+        for index in self.specimen_grid.query(x, y, z, self.collection_range):
+            self.collect_specimen(self.specimens[index])
                 
     def collect_specimen(self, specimen):
         """Collect a specimen"""
         specimen['collected'] = True
         specimen['node'].hide()
+        self.specimen_grid.deactivate(specimen['index'])
         
         self.specimens_collected += 1
         self.score += 10
         self.update_ui()
         
         # Check if all specimens collected
-        if self.specimens_collected >= 12:
+        if self.specimens_collected >= self.specimen_count:
             self.level_complete()
             
     def level_complete(self):
@@ -360,6 +354,7 @@ class ScienceGame(ShowBase):
         
         # Reset specimens for next level
         self.specimens_collected = 0
+        self.specimen_grid.reset()
         for specimen in self.specimens:
             specimen['collected'] = False
             specimen['node'].show()
@@ -369,15 +364,14 @@ class ScienceGame(ShowBase):
     def update_ui(self):
         """Update the user interface"""
         self.score_text.setText(f"Score: {self.score}")
-        self.specimens_text.setText(f"Specimens: {self.specimens_collected}/12")
+        self.specimens_text.setText(f"Specimens: {self.specimens_collected}/{self.specimen_count}")
         
-    def game_loop(self, task):
-        """Main game loop"""
+    def game_loop(self, dt):
+        """Main game loop, once per fixed step"""
+        self.player_prev_pos = list(self.player_pos)
         if not self.game_running:
-            return task.done
+            return
             
-        dt = globalClock.getDt()
-        
         # Handle continuous movement
         if self.keys["up"]:
             self.player_pos[1] += self.player_speed * dt
@@ -392,12 +386,12 @@ class ScienceGame(ShowBase):
         self.player_pos[0] = max(-25, min(25, self.player_pos[0]))
         self.player_pos[1] = max(-25, min(25, self.player_pos[1]))
         
-        self.player.setPos(self.player_pos[0], self.player_pos[1], self.player_pos[2])
-        
         # Check for specimen collection
         self.check_specimen_collection()
         
-        return task.cont
+    def draw_player(self, alpha):
+        """Place the player between its last two fixed-step positions"""
+        self.player.setPos(*self.lerp(self.player_prev_pos, self.player_pos))
         
     def restart_game(self):
         """Restart the game"""
@@ -406,10 +400,12 @@ class ScienceGame(ShowBase):
         self.specimens_collected = 0
         self.game_running = True
         self.player_pos = [0, 0, 0]
+        self.player_prev_pos = [0, 0, 0]
         self.player.setPos(0, 0, 0)
         self.player.setColor(1, 1, 1, 1)
         
         # Reset specimens
+        self.specimen_grid.reset()
         for specimen in self.specimens:
             specimen['collected'] = False
             specimen['node'].show()
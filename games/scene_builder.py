@@ -0,0 +1,191 @@
+"""
+Procedural geometry for the Panda3D games
+Builds boxes, cylinders and planes as a single Geom each, with normals and
+vertex colours so they are lit like the rest of the scene and can be
+merged with each other. Static scenery is flattened into as few Geoms as
+possible, and repeated props (trees...) are drawn with hardware instancing
+- one draw call for every copy - where the GPU supports it, or flattened
+into one Geom where it doesn't.
+"""
+
+import math
+
+from panda3d.core import (BoundingBox, Geom, GeomNode, GeomTriangles, GeomVertexData, GeomVertexFormat,
+                          GeomVertexWriter, LVecBase4f, NodePath, Point3, PTA_LVecBase4f, Shader)
+
+# Largest instance count drawn with one shader (a uniform array of offsets)
+MAX_INSTANCES = 256
+
+_INSTANCE_VERTEX_SHADER = """
+#version 140
+
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform mat3 p3d_NormalMatrix;
+uniform vec4 p3d_ColorScale;
+uniform vec4 instance_offsets[%(count)d];
+
+in vec4 p3d_Vertex;
+in vec3 p3d_Normal;
+in vec4 p3d_Color;
+
+out vec3 normal;
+out vec4 color;
+
+void main() {
+    vec4 vertex = p3d_Vertex + vec4(instance_offsets[gl_InstanceID].xyz, 0);
+    gl_Position = p3d_ModelViewProjectionMatrix * vertex;
+    normal = normalize(p3d_NormalMatrix * p3d_Normal);
+    color = p3d_Color * p3d_ColorScale;
+}
+"""
+
+_INSTANCE_FRAGMENT_SHADER = """
+#version 140
+
+uniform struct {
+    vec4 ambient;
+} p3d_LightModel;
+
+uniform struct {
+    vec4 color;
+    vec4 position;
+} p3d_LightSource[2];
+
+in vec3 normal;
+in vec4 color;
+
+out vec4 fragment;
+
+void main() {
+    // Ambient plus directional lights (w = 0: position is the direction to the light)
+    vec3 light = p3d_LightModel.ambient.rgb;
+    for (int i = 0; i < 2; ++i) {
+        light += p3d_LightSource[i].color.rgb * max(dot(normal, normalize(p3d_LightSource[i].position.xyz)), 0.0);
+    }
+    fragment = vec4(color.rgb * light, color.a);
+}
+"""
+
+
+class _MeshWriter:
+    """Vertex data (position, normal, colour) and triangles of one Geom"""
+
+    def __init__(self, name, rows):
+        self.vdata = GeomVertexData(name, GeomVertexFormat.getV3n3c4(), Geom.UHStatic)
+        self.vdata.uncleanSetNumRows(rows)
+        self.vertex = GeomVertexWriter(self.vdata, 'vertex')
+        self.normal = GeomVertexWriter(self.vdata, 'normal')
+        self.color = GeomVertexWriter(self.vdata, 'color')
+        self.triangles = GeomTriangles(Geom.UHStatic)
+        self.rows = 0
+
+    def quad(self, corners, normal, color):
+        """Add a quad from four counter-clockwise corners (seen from the normal's side)"""
+        first = self.rows
+        for corner in corners:
+            self.vertex.setData3(*corner)
+            self.normal.setData3(*normal)
+            self.color.setData4(*color)
+        self.rows += 4
+        self.triangles.addVertices(first, first + 1, first + 2)
+        self.triangles.addVertices(first, first + 2, first + 3)
+
+    def triangle(self, corners, normal, color):
+        """Add a triangle from three counter-clockwise corners"""
+        first = self.rows
+        for corner in corners:
+            self.vertex.setData3(*corner)
+            self.normal.setData3(*normal)
+            self.color.setData4(*color)
+        self.rows += 3
+        self.triangles.addVertices(first, first + 1, first + 2)
+
+    def node(self, name):
+        geom = Geom(self.vdata)
+        geom.addPrimitive(self.triangles)
+        node = GeomNode(name)
+        node.addGeom(geom)
+        return NodePath(node)
+
+
+def make_box(name, size=(1, 1, 1), center=(0, 0, 0), color=(1, 1, 1, 1)):
+    """A box as one Geom (24 vertices, 12 triangles)"""
+    sx, sy, sz = (s / 2.0 for s in size)
+    cx, cy, cz = center
+    x0, x1, y0, y1, z0, z1 = cx - sx, cx + sx, cy - sy, cy + sy, cz - sz, cz + sz
+    mesh = _MeshWriter(name, 24)
+    mesh.quad([(x0, y0, z0), (x1, y0, z0), (x1, y0, z1), (x0, y0, z1)], (0, -1, 0), color)  # front
+    mesh.quad([(x1, y1, z0), (x0, y1, z0), (x0, y1, z1), (x1, y1, z1)], (0, 1, 0), color)   # back
+    mesh.quad([(x1, y0, z0), (x1, y1, z0), (x1, y1, z1), (x1, y0, z1)], (1, 0, 0), color)   # right
+    mesh.quad([(x0, y1, z0), (x0, y0, z0), (x0, y0, z1), (x0, y1, z1)], (-1, 0, 0), color)  # left
+    mesh.quad([(x0, y0, z1), (x1, y0, z1), (x1, y1, z1), (x0, y1, z1)], (0, 0, 1), color)   # top
+    mesh.quad([(x0, y1, z0), (x1, y1, z0), (x1, y0, z0), (x0, y0, z0)], (0, 0, -1), color)  # bottom
+    return mesh.node(name)
+
+
+def make_cylinder(name, radius=0.5, height=1.0, base=(0, 0, 0), color=(1, 1, 1, 1), segments=12):
+    """An upright capped cylinder as one Geom"""
+    bx, by, bz = base
+    top = bz + height
+    mesh = _MeshWriter(name, segments * 10)
+    ring = [(math.cos(2 * math.pi * i / segments), math.sin(2 * math.pi * i / segments))
+            for i in range(segments + 1)]
+    for (c0, s0), (c1, s1) in zip(ring, ring[1:]):
+        p0 = (bx + c0 * radius, by + s0 * radius)
+        p1 = (bx + c1 * radius, by + s1 * radius)
+        mid = ((c0 + c1) / 2, (s0 + s1) / 2, 0)
+        mesh.quad([(p0[0], p0[1], bz), (p1[0], p1[1], bz), (p1[0], p1[1], top), (p0[0], p0[1], top)], mid, color)
+        mesh.triangle([(bx, by, top), (p0[0], p0[1], top), (p1[0], p1[1], top)], (0, 0, 1), color)
+        mesh.triangle([(bx, by, bz), (p1[0], p1[1], bz), (p0[0], p0[1], bz)], (0, 0, -1), color)
+    return mesh.node(name)
+
+
+def make_plane(name, frame=(-1, 1, -1, 1), z=0.0, color=(1, 1, 1, 1)):
+    """A horizontal, upward-facing rectangle (x0, x1, y0, y1) as one Geom"""
+    x0, x1, y0, y1 = frame
+    mesh = _MeshWriter(name, 4)
+    mesh.quad([(x0, y0, z), (x1, y0, z), (x1, y1, z), (x0, y1, z)], (0, 0, 1), color)
+    return mesh.node(name)
+
+
+def flatten_static(nodepath):
+    """Bake transforms and colours of scenery that never moves and merge it into as few Geoms as possible"""
+    nodepath.flattenStrong()
+    return nodepath
+
+
+def instance(base, prototype, parent, positions, name='instances'):
+    """Draw prototype at every position; returns the node holding the copies.
+
+    With hardware instancing the prototype is drawn once with an instance
+    count and per-instance offsets; otherwise the copies are flattened into
+    one Geom, which costs memory instead of draw calls."""
+    group = parent.attachNewNode(name)
+    gsg = base.win.getGsg() if base.win is not None else None
+    positions = [tuple(position) for position in positions]
+    if (gsg is not None and gsg.getSupportsGeometryInstancing() and gsg.getSupportsGlsl()
+            and (gsg.getDriverShaderVersionMajor(), gsg.getDriverShaderVersionMinor()) >= (1, 40)
+            and 0 < len(positions) <= MAX_INSTANCES):
+        prototype.copyTo(group)
+        flatten_static(group)
+        offsets = PTA_LVecBase4f()
+        for x, y, z in positions:
+            offsets.pushBack(LVecBase4f(x, y, z, 0))
+        source = {'count': len(positions)}
+        group.setShader(Shader.make(Shader.SL_GLSL, _INSTANCE_VERTEX_SHADER % source, _INSTANCE_FRAGMENT_SHADER))
+        group.setShaderInput('instance_offsets', offsets)
+        group.setInstanceCount(len(positions))
+
+        # Cull against the bounds of every copy, not just the prototype's
+        low, high = prototype.getTightBounds()
+        bounds = BoundingBox(Point3(low.x + min(p[0] for p in positions), low.y + min(p[1] for p in positions),
+                                    low.z + min(p[2] for p in positions)),
+                             Point3(high.x + max(p[0] for p in positions), high.y + max(p[1] for p in positions),
+                                    high.z + max(p[2] for p in positions)))
+        group.node().setBounds(bounds)
+        group.node().setFinal(True)
+    else:
+        for position in positions:
+            prototype.copyTo(group).setPos(*position)
+        flatten_static(group)
+    return group
@@ -0,0 +1,122 @@
+"""
+Uniform-grid spatial index for the Panda3D games' collectibles
+Positions live in flat float arrays, bucketed into square cells on the
+ground plane, so a per-frame proximity check only looks at the items in the
+cells around the player instead of calling getPos() on every node. Items can
+be marked collected and respawned without rebuilding the grid.
+
+Usage: python -m games.spatial_grid --benchmark [frames]
+"""
+
+import math
+import random
+import sys
+import time
+from array import array
+
+
+class SpatialGrid:
+    """Static points bucketed by (x, y) cell, with an active flag per point"""
+
+    def __init__(self, cell_size=2.0):
+        self.cell_size = cell_size
+        self.xs = array('f')
+        self.ys = array('f')
+        self.zs = array('f')
+        self.active = bytearray()
+        self._cells = {}  # (cell x, cell y) -> [index]
+        self.active_count = 0
+
+    def __len__(self):
+        return len(self.xs)
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def add(self, x, y, z=0.0):
+        """Index a point; returns its index"""
+        index = len(self.xs)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.zs.append(z)
+        self.active.append(1)
+        self.active_count += 1
+        self._cells.setdefault(self._cell(x, y), []).append(index)
+        return index
+
+    def query(self, x, y, z, radius):
+        """Indices of active points closer than radius to (x, y, z)"""
+        cell_x0, cell_y0 = self._cell(x - radius, y - radius)
+        cell_x1, cell_y1 = self._cell(x + radius, y + radius)
+        xs, ys, zs, active, cells = self.xs, self.ys, self.zs, self.active, self._cells
+        limit = radius * radius
+        found = []
+        for cell_x in range(cell_x0, cell_x1 + 1):
+            for cell_y in range(cell_y0, cell_y1 + 1):
+                for index in cells.get((cell_x, cell_y), ()):
+                    if not active[index]:
+                        continue
+                    dx, dy, dz = xs[index] - x, ys[index] - y, zs[index] - z
+                    if dx * dx + dy * dy + dz * dz < limit:
+                        found.append(index)
+        return found
+
+    def deactivate(self, index):
+        """Take a point out of query results (e.g. collected)"""
+        if self.active[index]:
+            self.active[index] = 0
+            self.active_count -= 1
+
+    def reset(self):
+        """Make every point active again (e.g. respawn for a new level)"""
+        self.active = bytearray(b'\x01' * len(self.xs))
+        self.active_count = len(self.xs)
+
+
+def benchmark(frames=600, counts=(12, 1000, 10000), radius=2.0, extent=15.0):
+    """Per-frame collection check cost: getPos() scan over NodePaths vs grid query"""
+    from panda3d.core import NodePath, Point3
+
+    print(f"{frames} frames of a player walking through {extent * 2:.0f}x{extent * 2:.0f} units, "
+          f"collection radius {radius}")
+    for count in counts:
+        rng = random.Random(count)
+        points = [(rng.uniform(-extent, extent), rng.uniform(-extent, extent), 0.5) for _ in range(count)]
+        path = [(math.sin(frame / 50) * extent, math.cos(frame / 70) * extent, 0.0) for frame in range(frames)]
+
+        # The old check: every specimen's node, collected or not
+        root = NodePath('specimens')
+        specimens = []
+        for x, y, z in points:
+            node = root.attachNewNode('specimen')
+            node.setPos(x, y, z)
+            specimens.append({'node': node, 'collected': False})
+        start = time.perf_counter()
+        for x, y, z in path:
+            player_pos = Point3(x, y, z)
+            for specimen in specimens:
+                if specimen['collected']:
+                    continue
+                if (player_pos - specimen['node'].getPos()).length() < radius:
+                    specimen['collected'] = True
+        scan = (time.perf_counter() - start) / frames * 1000
+
+        grid = SpatialGrid(radius)
+        for x, y, z in points:
+            grid.add(x, y, z)
+        start = time.perf_counter()
+        for x, y, z in path:
+            for index in grid.query(x, y, z, radius):
+                grid.deactivate(index)
+        query = (time.perf_counter() - start) / frames * 1000
+
+        collected = sum(specimen['collected'] for specimen in specimens)
+        print(f"{count:>6} specimens: getPos() scan {scan:.4f} ms/frame, grid {query:.4f} ms/frame "
+              f"({scan / query:.0f}x), collected {collected} / {count - grid.active_count}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--benchmark']:
+        benchmark(*[int(arg) for arg in sys.argv[2:3]])
+    else:
+        print(__doc__.strip())
@@ -0,0 +1,33 @@
+"""
+gunicorn settings for Shiksha Leap (gunicorn -c gunicorn.conf.py wsgi:app)
+Worker count, threads, bind address and timeout come from the SHIKSHA_*
+settings in config.py.
+"""
+
+import os
+
+from config import Config
+
+bind = Config.BIND
+workers = Config.WORKERS if 'SHIKSHA_WORKERS' in os.environ else os.cpu_count() or 1
+# The app is created after this file is read (preload_app); tell it how many
+# processes will share it (OTP store, game launcher)
+Config.WORKERS = workers
+worker_class = 'gthread'
+threads = Config.WORKER_THREADS
+timeout = Config.WORKER_TIMEOUT
+
+# Create the app (migrations, UDISE directory, content manifest) once in the
+# master; workers fork from it and share that memory copy-on-write, and the
+# random fallback SECRET_KEY is the same in all of them
+preload_app = True
+
+# Let the game log writer thread commit what it has queued before a worker exits
+graceful_timeout = 30
+
+
+def post_worker_init(worker):
+    """Warm the game launcher's process pool (lab kiosks only, which run a single worker)"""
+    from game_launcher import get_launcher, launcher_enabled
+    if launcher_enabled():
+        get_launcher().start()
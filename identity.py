@@ -0,0 +1,126 @@
+"""
+Identity resolution for Shiksha Leap
+Resolves the logged-in user's student or teacher record (with the user's
+email) through a bounded per-worker LRU keyed by user id, so request
+handlers - the game log write path above all - don't re-query it every
+time. Registration invalidates the entry; the TTL bounds how long another
+worker can keep serving a record that changed.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+from db_pool import get_connection
+
+_QUERIES = {
+    'student': '''
+        SELECT s.*, u.email FROM students s
+        JOIN users u ON s.user_id = u.id
+        WHERE s.user_id = ?
+    ''',
+    'teacher': '''
+        SELECT t.*, u.email FROM teachers t
+        JOIN users u ON t.user_id = u.id
+        WHERE t.user_id = ?
+    '''
+}
+
+
+class IdentityCache:
+    """Thread-safe LRU of resolved student/teacher records with a TTL"""
+
+    def __init__(self, max_entries=10000, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def resolve(self, role, user_id, conn=None):
+        """The user's record for a role as a dict, or None if not registered"""
+        key = (role, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        try:
+            row = conn.execute(_QUERIES[role], (user_id,)).fetchone()
+        finally:
+            if own_conn:
+                conn.close()
+        if row is None:
+            # Not registered yet: don't cache, registration is about to happen
+            return None
+
+        record = dict(row)
+        with self._lock:
+            self._entries[key] = (record, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return record
+
+    def invalidate(self, user_id):
+        """Forget every cached record of a user"""
+        with self._lock:
+            for role in _QUERIES:
+                if self._entries.pop((role, user_id), None) is not None:
+                    self.invalidations += 1
+
+    def stats(self):
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+_cache = None
+
+
+def init_cache(config=Config):
+    """Create the process-wide identity cache from a configuration object"""
+    global _cache
+    _cache = IdentityCache(config.IDENTITY_CACHE_MAX_ENTRIES, config.IDENTITY_CACHE_TTL)
+    return _cache
+
+
+def get_cache():
+    """Get the process-wide identity cache, creating it from the default config if needed"""
+    if _cache is None:
+        return init_cache()
+    return _cache
+
+
+def get_student(user_id, conn=None):
+    """The student record (plus email) of a user, or None"""
+    return get_cache().resolve('student', user_id, conn)
+
+
+def get_teacher(user_id, conn=None):
+    """The teacher record (plus email) of a user, or None"""
+    return get_cache().resolve('teacher', user_id, conn)
+
+
+def invalidate(user_id):
+    """Call after a user's student/teacher record changes"""
+    get_cache().invalidate(user_id)
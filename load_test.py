@@ -0,0 +1,228 @@
+"""
+Multi-worker load test for Shiksha Leap
+Runs the production entry point (gunicorn -c gunicorn.conf.py wsgi:app)
+against one scratch SQLite file with 1, 2, 4... workers in turn, and drives
+it from several client processes with a mix of game log writes, teacher
+dashboard and roster reads and UDISE lookups, logged in through session
+cookies signed with the test's SHIKSHA_SECRET_KEY. Prints throughput and
+latency for each worker count.
+
+Usage: python load_test.py [workers ...] [--seconds N] [--clients N] [--students N]
+"""
+
+import http.client
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from flask import Flask
+
+from config import Config
+from database import import_udise_data, init_db
+from db_pool import get_connection, init_pool
+from game_logs import insert_game_logs
+
+SUBJECTS = ('Mathematics', 'Science', 'Physics', 'Chemistry', 'Biology')
+
+# (weight, method, path, cookie kind)
+REQUEST_MIX = [
+    (40, 'POST', '/api/game-log', 'student'),
+    (20, 'GET', '/api/teacher/dashboard-data', 'teacher'),
+    (20, 'GET', '/api/teacher/roster?sort=avg_score&order=desc&limit=50', 'teacher'),
+    (20, 'GET', '/api/school-info/{udise_code}', None)
+]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed(students, logs_per_student=5):
+    """One school with a teacher and students with some history; returns (udise_code, teacher, student user ids)"""
+    init_pool(Config)
+    init_db()
+    import_udise_data()
+    conn = get_connection()
+    try:
+        school = conn.execute('SELECT udise_code, school_name, district FROM udise_schools LIMIT 1').fetchone()
+        udise_code = school['udise_code']
+
+        def add_user(role, index):
+            return conn.execute('INSERT INTO users (email, role) VALUES (?, ?)',
+                                (f'{role}{index}@load.test', role)).lastrowid
+
+        teacher = add_user('teacher', 0)
+        conn.execute('''
+            INSERT INTO teachers (user_id, first_name, last_name, dob, qualification,
+                                  school_name, district, state, udise_code, medium)
+            VALUES (?, 'Load', 'Teacher', '1980-01-01', 'B.Ed', ?, ?, 'Odisha', ?, 'English')
+        ''', (teacher, school['school_name'], school['district'], udise_code))
+
+        student_users = []
+        for i in range(students):
+            user_id = add_user('student', i)
+            conn.execute('''
+                INSERT INTO students (user_id, first_name, last_name, dob, grade,
+                                      school_name, district, state, udise_code, medium)
+                VALUES (?, ?, 'Student', '2012-01-01', ?, ?, ?, 'Odisha', ?, 'English')
+            ''', (user_id, f'S{i:05d}', 6 + i % 7, school['school_name'], school['district'], udise_code))
+            student_users.append(user_id)
+        conn.commit()
+
+        rows = conn.execute('SELECT id, udise_code FROM students').fetchall()
+        for row in rows:
+            logs = [_game_log() for _ in range(logs_per_student)]
+            insert_game_logs(conn, {'id': row['id'], 'udise_code': row['udise_code']}, logs)
+    finally:
+        conn.close()
+    return udise_code, teacher, student_users
+
+
+def _game_log():
+    return {'subject': random.choice(SUBJECTS), 'grade': random.randint(6, 12),
+            'game_id': f'game_{random.randint(1, 20)}', 'score': random.randint(0, 10),
+            'max_score': 10, 'time_spent': random.randint(30, 600)}
+
+
+def session_cookie(secret_key, user_id, role):
+    """A session cookie the app will accept for a logged-in user"""
+    app = Flask(__name__)
+    app.secret_key = secret_key
+    return app.session_interface.get_signing_serializer(app).dumps({'user_id': user_id, 'role': role})
+
+
+def _client(args):
+    """Closed-loop client: request after request on one keep-alive connection until the deadline"""
+    port, deadline, warmup_until, udise_code, teacher_cookie, student_cookies, seed_value = args
+    rng = random.Random(seed_value)
+    mix = [(method, path.format(udise_code=udise_code), kind) for weight, method, path, kind in REQUEST_MIX
+           for _ in range(weight)]
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies = []
+    errors = 0
+    while time.time() < deadline:
+        method, path, kind = rng.choice(mix)
+        headers = {}
+        body = None
+        if kind == 'teacher':
+            headers['Cookie'] = f'session={teacher_cookie}'
+        elif kind == 'student':
+            headers['Cookie'] = f'session={rng.choice(student_cookies)}'
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(_game_log())
+
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            ok = False
+        elapsed = time.perf_counter() - start
+
+        if time.time() >= warmup_until:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+    conn.close()
+    return latencies, errors
+
+
+def _wait_ready(port, udise_code, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {process.returncode}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', f'/api/school-info/{udise_code}')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not become ready')
+
+
+def run(worker_counts=(1, 2, 4), seconds=10, clients=16, students=500, warmup=2):
+    """Load the same SQLite file through each worker count and report requests/second"""
+    secret_key = secrets.token_hex(32)
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'load.db')
+        Config.DATABASE_PATH = database
+        udise_code, teacher, student_users = seed(students)
+        teacher_cookie = session_cookie(secret_key, teacher, 'teacher')
+        student_cookies = [session_cookie(secret_key, user_id, 'student') for user_id in student_users]
+        print(f"Seeded {students} students in school {udise_code}; "
+              f"{clients} client processes, {seconds}s per run, {os.cpu_count()} CPUs")
+
+        baseline = None
+        for workers in worker_counts:
+            port = _free_port()
+            env = dict(os.environ,
+                       SHIKSHA_DATABASE_PATH=database,
+                       SHIKSHA_SECRET_KEY=secret_key,
+                       SHIKSHA_BIND=f'127.0.0.1:{port}',
+                       SHIKSHA_WORKERS=str(workers),
+                       SHIKSHA_LOG_QUEUE_SPILL_DIR=os.path.join(tmp, 'spill'))
+            log = open(os.path.join(tmp, f'gunicorn-{workers}.log'), 'w')
+            process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                                       stdout=log, stderr=subprocess.STDOUT)
+            try:
+                _wait_ready(port, udise_code, process)
+                start = time.time()
+                deadline = start + warmup + seconds
+                jobs = [(port, deadline, start + warmup, udise_code, teacher_cookie, student_cookies, i)
+                        for i in range(clients)]
+                with Pool(clients) as pool:
+                    results = pool.map(_client, jobs)
+            finally:
+                process.terminate()
+                process.wait(timeout=60)
+                log.close()
+
+            latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+            errors = sum(client_errors for _, client_errors in results)
+            throughput = len(latencies) / seconds
+            baseline = baseline or throughput
+            if latencies:
+                p50 = latencies[len(latencies) // 2] * 1000
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+            else:
+                p50 = p99 = 0.0
+            print(f"{workers} worker(s): {throughput:,.0f} req/s ({throughput / baseline:.2f}x), "
+                  f"p50 {p50:.1f} ms, p99 {p99:.1f} ms, {errors} errors")
+
+        conn = get_connection()
+        try:
+            logs = conn.execute('SELECT COUNT(*) FROM game_logs').fetchone()[0]
+        finally:
+            conn.close()
+        print(f"{logs:,} game logs in the database after the runs")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    options = {}
+    for name in ('--seconds', '--clients', '--students'):
+        if name in args:
+            index = args.index(name)
+            options[name[2:]] = int(args[index + 1])
+            del args[index:index + 2]
+    if any(not arg.isdigit() for arg in args):
+        print(__doc__.strip())
+        sys.exit(1)
+    run(tuple(int(arg) for arg in args) or (1, 2, 4), **options)
@@ -0,0 +1,367 @@
+"""
+Write-behind queue for /api/game-log
+Requests hand validated logs to an in-process queue; a dedicated writer
+thread commits them in groups (every LOG_QUEUE_FLUSH_MS or
+LOG_QUEUE_BATCH_ROWS rows, whichever comes first), so a whole class finishing
+a quiz together costs a handful of transactions instead of one fsync each.
+
+Every accepted log is first appended to a per-process spill file. The
+writer starts a new spill segment after each committed batch and deletes
+segments whose logs are all committed, so the spill stays small under
+constant load. A batch the database keeps rejecting is retried
+WRITE_ATTEMPTS times, then moved to a '.failed.spill' file instead of
+blocking the queue. Spill files left behind by a worker that is no longer
+running are claimed by renaming them (so only one worker replays each) and
+replayed by the writer thread; client_log_id de-duplication makes replaying
+a log that did get committed harmless.
+"""
+
+import atexit
+import datetime
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from config import Config
+from db_pool import get_connection
+from game_logs import write_batch
+
+_STOP = object()
+
+WRITE_ATTEMPTS = 5  # per batch, before it is parked in a .failed.spill file
+
+
+class QueueFull(Exception):
+    """Raised when the queue is at capacity; clients should retry later"""
+
+
+def _spill_owner(path):
+    """Pid of the process a spill or claimed file belongs to (None if not one of ours)"""
+    try:
+        return int(os.path.basename(path)[len('game-logs-'):].split('.')[0])
+    except ValueError:
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class GameLogWriter:
+    """Bounded ingestion queue drained by one writer thread per process"""
+
+    def __init__(self, spill_dir, capacity=10000, batch_rows=500, flush_interval_ms=50):
+        self.spill_dir = spill_dir
+        self.capacity = capacity
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._queue = None
+        self._spill = None
+        self._segment = 0
+        self._segment_rows = 0
+        self._claimed = []
+        self._in_flight = 0
+        self.submitted = 0
+        self.rejected_full = 0
+        self.batches = 0
+        self.rows_written = 0
+        self.duplicates = 0
+        self.replayed = 0
+        self.errors = 0
+        self.failed_rows = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.total_commit_time = 0.0
+        self.max_commit_time = 0.0
+
+    def _segment_path(self, segment):
+        return os.path.join(self.spill_dir, f'game-logs-{os.getpid()}.{segment}.spill')
+
+    @property
+    def spill_path(self):
+        return self._segment_path(self._segment)
+
+    @property
+    def failed_path(self):
+        return os.path.join(self.spill_dir, f'game-logs-{os.getpid()}.failed.spill')
+
+    def start(self):
+        """Start the writer thread in this process (idempotent, fork-aware)"""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.capacity)
+            self._in_flight = 0
+            os.makedirs(self.spill_dir, exist_ok=True)
+            # Only claim here (cheap renames); the writer thread replays them
+            self._claimed = self._claim_orphaned_spills()
+            self._segment = 0
+            self._segment_rows = 0
+            self._spill = open(self.spill_path, 'a', encoding='utf-8')
+            self._thread = threading.Thread(target=self._run, name='game-log-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, student, row):
+        """Queue one validated log (see game_logs.validate_log) for a student"""
+        if self._pid != os.getpid():
+            self.start()
+
+        # Fix the id and time now, so a replay after a crash is idempotent
+        # and keeps the original play time
+        row = dict(row)
+        row['client_log_id'] = row['client_log_id'] or str(uuid.uuid4())
+        if row['played_at'] is None:
+            row['played_at'] = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        student = {'id': student['id'], 'udise_code': student['udise_code']}
+
+        with self._lock:
+            if self._queue.full():
+                self.rejected_full += 1
+                raise QueueFull('Game log queue is full')
+            self._spill.write(json.dumps({'student': student, 'log': row}) + '\n')
+            self._spill.flush()
+            self._segment_rows += 1
+            # Tagged with its spill segment, so committed segments can be deleted
+            self._queue.put_nowait((student, row, self._segment))
+            self.submitted += 1
+
+        return row['client_log_id']
+
+    def _take_batch(self):
+        """Block for the first item, then gather more until the batch is full or the interval ends"""
+        first = self._queue.get()
+        if first is _STOP:
+            return None, True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        stop = False
+        while len(batch) < self.batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+        return batch, stop
+
+    def _run(self):
+        self._replay_claimed_spills()
+        stop = False
+        while not stop:
+            batch, stop = self._take_batch()
+            if batch:
+                with self._lock:
+                    self._in_flight = len(batch)
+                self._write([(student, row) for student, row, _ in batch])
+                with self._lock:
+                    self._in_flight = 0
+                    self._rotate_spill(batch[-1][2])
+
+        # Drain whatever arrived before the stop marker was processed
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                remaining.append(item)
+        if remaining:
+            self._write([(student, row) for student, row, _ in remaining])
+        with self._lock:
+            if self._spill is not None:
+                self._rotate_spill(self._segment)
+                # Everything is committed (or parked): no segment is needed
+                self._spill.close()
+                self._spill = None
+                os.remove(self.spill_path)
+
+    def _rotate_spill(self, committed_segment):
+        """After a commit: start a new segment and delete the ones whose logs are all committed.
+        Items are queued in spill order, so every segment before the last committed item's is done.
+        Call with the lock held."""
+        keep_from = committed_segment
+        if self._queue.empty():
+            keep_from = self._segment + 1  # nothing pending: the current segment is done too
+        if self._segment_rows:
+            self._spill.close()
+            self._segment += 1
+            self._segment_rows = 0
+            self._spill = open(self.spill_path, 'a', encoding='utf-8')
+        for segment in range(self._oldest_segment(), min(keep_from, self._segment)):
+            try:
+                os.remove(self._segment_path(segment))
+            except FileNotFoundError:
+                pass
+
+    def _oldest_segment(self):
+        segments = []
+        for path in glob.glob(os.path.join(self.spill_dir, f'game-logs-{os.getpid()}.*.spill')):
+            try:
+                segments.append(int(os.path.basename(path).split('.')[1]))
+            except ValueError:
+                continue  # the .failed.spill file
+        return min(segments, default=self._segment)
+
+    def _write(self, batch):
+        """Commit one batch, retrying WRITE_ATTEMPTS times; a batch that still fails is
+        parked in this process's .failed.spill file (replayed after the process exits)"""
+        delay = 0.05
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            start = time.perf_counter()
+            conn = get_connection()
+            try:
+                statuses = write_batch(conn, batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"Game log writer: batch of {len(batch)} failed (attempt {attempt}/{WRITE_ATTEMPTS}): {e}")
+                if attempt < WRITE_ATTEMPTS:
+                    time.sleep(delay)
+                    delay = min(delay * 2, 2.0)
+                continue
+            finally:
+                conn.close()
+
+            elapsed = time.perf_counter() - start
+            duplicates = statuses.count('duplicate')
+            self.batches += 1
+            self.rows_written += len(batch) - duplicates
+            self.duplicates += duplicates
+            self.last_batch_size = len(batch)
+            self.max_batch_size = max(self.max_batch_size, len(batch))
+            self.total_commit_time += elapsed
+            self.max_commit_time = max(self.max_commit_time, elapsed)
+            return statuses
+
+        with open(self.failed_path, 'a', encoding='utf-8') as f:
+            for student, row in batch:
+                f.write(json.dumps({'student': student, 'log': row}) + '\n')
+        self.failed_rows += len(batch)
+        print(f"Game log writer: gave up on a batch of {len(batch)}, kept in {self.failed_path}")
+        return None
+
+    def _claim_orphaned_spills(self):
+        """Rename spill files of processes that are no longer running to names only this
+        process uses; a file another worker renamed first is simply skipped"""
+        claimed = []
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, 'game-logs-*.spill')) +
+                           glob.glob(os.path.join(self.spill_dir, 'game-logs-*.claimed'))):
+            pid = _spill_owner(path)
+            if pid is None or (pid != os.getpid() and _pid_alive(pid)):
+                continue
+            target = os.path.join(self.spill_dir, f'game-logs-{os.getpid()}.{uuid.uuid4().hex}.claimed')
+            try:
+                os.rename(path, target)
+            except FileNotFoundError:
+                continue  # claimed by another worker
+            claimed.append((path, target))
+        return claimed
+
+    def _replay_claimed_spills(self):
+        """Commit the logs of spill files claimed at start (runs in the writer thread)"""
+        claimed, self._claimed = self._claimed, []
+        for original, path in claimed:
+            items = []
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from the crash
+                        continue
+                    items.append((entry['student'], entry['log']))
+
+            for i in range(0, len(items), self.batch_rows):
+                self._write(items[i:i + self.batch_rows])
+            self.replayed += len(items)
+            if items:
+                print(f"Game log writer: replayed {len(items)} logs from {original}")
+            os.remove(path)
+
+    def stop(self, timeout=10.0):
+        """Flush everything queued and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            if thread is None or self._pid != os.getpid():
+                return
+            self._thread = None
+        # Blocking put: the stop marker must not be dropped when the queue is full
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        with self._lock:
+            # Still set only if the thread didn't finish: keep the spill for a replay
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+    def stats(self):
+        """Queue counters for monitoring"""
+        depth = self._queue.qsize() if self._queue is not None else 0
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'depth': depth,
+            'in_flight': self._in_flight,
+            'capacity': self.capacity,
+            'submitted': self.submitted,
+            'rejected_full': self.rejected_full,
+            'batches': self.batches,
+            'rows_written': self.rows_written,
+            'duplicates': self.duplicates,
+            'replayed': self.replayed,
+            'errors': self.errors,
+            'failed_rows': self.failed_rows,
+            'last_batch_size': self.last_batch_size,
+            'max_batch_size': self.max_batch_size,
+            'avg_batch_size': round((self.rows_written + self.duplicates) / self.batches, 2) if self.batches else 0,
+            'avg_commit_ms': round(self.total_commit_time * 1000 / self.batches, 3) if self.batches else 0.0,
+            'max_commit_ms': round(self.max_commit_time * 1000, 3)
+        }
+
+
+_writer = None
+
+
+def init_writer(config=Config):
+    """Create the process-wide writer from a configuration object"""
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+    _writer = GameLogWriter(
+        config.LOG_QUEUE_SPILL_DIR,
+        capacity=config.LOG_QUEUE_CAPACITY,
+        batch_rows=config.LOG_QUEUE_BATCH_ROWS,
+        flush_interval_ms=config.LOG_QUEUE_FLUSH_MS
+    )
+    return _writer
+
+
+def get_writer():
+    """Get the process-wide writer, creating it from the default config if needed"""
+    if _writer is None:
+        return init_writer()
+    return _writer
+
+
+@atexit.register
+def _flush_on_exit():
+    if _writer is not None:
+        _writer.stop()
@@ -0,0 +1,28 @@
+"""
+Indexes for the hottest app.py queries
+students.user_id, teachers.user_id and users.email/mobile are already covered
+by the indexes SQLite creates for their UNIQUE constraints.
+"""
+
+
+def upgrade(conn):
+    # teacher_dashboard_data: students of a school, ordered by grade and name
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_students_udise_grade_name
+    ON students (udise_code, grade, first_name)''')
+
+    # teacher_dashboard_data / log_game_performance: per-student log aggregates
+    # (covering, so the aggregation never touches the table rows)
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_game_logs_student_covering
+    ON game_logs (student_id, subject, score, max_score, played_at)''')
+
+    # verify_otp_api: latest unverified, unexpired OTP for a contact
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_otp_contact_code
+    ON otp_verifications (contact, otp_code, verified, expires_at, created_at)''')
+
+    # student_profile: achievements of a student, newest first
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_achievements_student_awarded
+    ON achievements (student_id, awarded_at)''')
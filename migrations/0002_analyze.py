@@ -0,0 +1,5 @@
+"""Collect planner statistics so SQLite picks the new indexes"""
+
+
+def upgrade(conn):
+    conn.execute('ANALYZE')
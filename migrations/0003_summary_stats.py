@@ -0,0 +1,49 @@
+"""
+Summary tables for the teacher dashboard
+student_stats and school_subject_stats are kept up to date by stats.py in the
+same transaction as every game_logs insert; this migration backfills them.
+"""
+
+
+def upgrade(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS student_stats (
+        student_id INTEGER PRIMARY KEY,
+        udise_code TEXT NOT NULL,
+        total_games INTEGER NOT NULL DEFAULT 0,
+        scored_games INTEGER NOT NULL DEFAULT 0,
+        score_pct_sum REAL NOT NULL DEFAULT 0,
+        last_activity TIMESTAMP,
+        FOREIGN KEY (student_id) REFERENCES students (id)
+    )''')
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS school_subject_stats (
+        udise_code TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        total_attempts INTEGER NOT NULL DEFAULT 0,
+        scored_attempts INTEGER NOT NULL DEFAULT 0,
+        score_pct_sum REAL NOT NULL DEFAULT 0,
+        last_activity TIMESTAMP,
+        PRIMARY KEY (udise_code, subject)
+    ) WITHOUT ROWID''')
+
+    # Backfill from the existing logs (scored_* skip logs with max_score = 0,
+    # matching how AVG() ignored their NULL percentage)
+    conn.execute('''
+    INSERT OR REPLACE INTO student_stats
+    (student_id, udise_code, total_games, scored_games, score_pct_sum, last_activity)
+    SELECT s.id, s.udise_code, COUNT(gl.id), COUNT(gl.score * 100.0 / gl.max_score),
+           COALESCE(SUM(gl.score * 100.0 / gl.max_score), 0), MAX(gl.played_at)
+    FROM students s
+    LEFT JOIN game_logs gl ON s.id = gl.student_id
+    GROUP BY s.id''')
+
+    conn.execute('''
+    INSERT OR REPLACE INTO school_subject_stats
+    (udise_code, subject, total_attempts, scored_attempts, score_pct_sum, last_activity)
+    SELECT s.udise_code, gl.subject, COUNT(*), COUNT(gl.score * 100.0 / gl.max_score),
+           COALESCE(SUM(gl.score * 100.0 / gl.max_score), 0), MAX(gl.played_at)
+    FROM game_logs gl
+    JOIN students s ON gl.student_id = s.id
+    GROUP BY s.udise_code, gl.subject''')
@@ -0,0 +1,45 @@
+"""
+Full-text index for /api/school-search
+udise_schools_fts is an external-content FTS5 table over udise_schools, kept
+in sync by triggers. SQLite builds without FTS5 skip it and school_search.py
+falls back to LIKE matching.
+"""
+
+from school_search import fts5_available
+
+
+def upgrade(conn):
+    if not fts5_available(conn):
+        print("FTS5 is not available in this SQLite build; school search will use LIKE")
+        return
+
+    conn.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS udise_schools_fts USING fts5(
+        udise_code, school_name, district, block,
+        content='udise_schools', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )''')
+
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS udise_schools_fts_ai AFTER INSERT ON udise_schools BEGIN
+        INSERT INTO udise_schools_fts (rowid, udise_code, school_name, district, block)
+        VALUES (new.id, new.udise_code, new.school_name, new.district, new.block);
+    END''')
+
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS udise_schools_fts_ad AFTER DELETE ON udise_schools BEGIN
+        INSERT INTO udise_schools_fts (udise_schools_fts, rowid, udise_code, school_name, district, block)
+        VALUES ('delete', old.id, old.udise_code, old.school_name, old.district, old.block);
+    END''')
+
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS udise_schools_fts_au AFTER UPDATE ON udise_schools BEGIN
+        INSERT INTO udise_schools_fts (udise_schools_fts, rowid, udise_code, school_name, district, block)
+        VALUES ('delete', old.id, old.udise_code, old.school_name, old.district, old.block);
+        INSERT INTO udise_schools_fts (rowid, udise_code, school_name, district, block)
+        VALUES (new.id, new.udise_code, new.school_name, new.district, new.block);
+    END''')
+
+    # Index the schools that are already loaded
+    conn.execute("INSERT INTO udise_schools_fts (udise_schools_fts) VALUES ('rebuild')")
@@ -0,0 +1,16 @@
+"""
+Client-generated log ids for idempotent offline sync
+Devices retry whole batches after network failures; a unique
+(student_id, client_log_id) lets the server drop the copies. Logs written
+before this migration have no id (NULLs never conflict).
+"""
+
+
+def upgrade(conn):
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(game_logs)')]
+    if 'client_log_id' not in columns:
+        conn.execute('ALTER TABLE game_logs ADD COLUMN client_log_id TEXT')
+
+    conn.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_game_logs_client_log_id
+    ON game_logs (student_id, client_log_id)''')
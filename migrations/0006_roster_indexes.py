@@ -0,0 +1,20 @@
+"""
+Indexes for the keyset-paginated roster (roster.py)
+Each sort order seeks on (udise_code, sort key, student_id), so fetching a
+page costs the same however deep it is. The expressions must match
+roster.SORT_KEYS exactly for SQLite to use them.
+"""
+
+
+def upgrade(conn):
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_student_stats_school_avg
+    ON student_stats (udise_code, COALESCE(score_pct_sum / scored_games, -1), student_id)''')
+
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_student_stats_school_activity
+    ON student_stats (udise_code, COALESCE(last_activity, ''), student_id)''')
+
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_student_stats_school_games
+    ON student_stats (udise_code, total_games, student_id)''')
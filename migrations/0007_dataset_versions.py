@@ -0,0 +1,18 @@
+"""
+Version counters for bulk-loaded datasets
+udise_import.py bumps the udise_schools version in its import transaction;
+workers compare it with the version of their in-memory UDISE directory
+(udise_directory.py) to know when to reload.
+"""
+
+
+def upgrade(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS dataset_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID''')
+
+    conn.execute('''
+    INSERT OR IGNORE INTO dataset_versions (name, version) VALUES ('udise_schools', 1)''')
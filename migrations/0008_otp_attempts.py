@@ -0,0 +1,15 @@
+"""
+Failed OTP verification counters for otp_store.SqliteOtpStore
+Times are Unix epoch seconds; a contact is locked out of verifying until
+locked_until after too many wrong codes within one window.
+"""
+
+
+def upgrade(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS otp_attempts (
+        contact TEXT PRIMARY KEY,
+        failures INTEGER NOT NULL DEFAULT 0,
+        window_start REAL NOT NULL,
+        locked_until REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID''')
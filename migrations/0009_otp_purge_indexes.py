@@ -0,0 +1,15 @@
+"""
+Indexes for otp_store.SqliteOtpStore.purge()
+The periodic purge deletes by expiry time; without these it scanned both OTP
+tables every OTP_PURGE_INTERVAL_SECONDS.
+"""
+
+
+def upgrade(conn):
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_otp_verifications_expires
+    ON otp_verifications (expires_at)''')
+
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_otp_attempts_locked_until
+    ON otp_attempts (locked_until)''')
@@ -0,0 +1,115 @@
+"""
+Versioned schema migrations for Shiksha Leap
+Each migration is a module in this package named NNNN_description.py that
+defines upgrade(conn). Applied versions are recorded in schema_version, so
+running the migrations again (from every worker, or via the CLI) is a no-op.
+"""
+
+import importlib
+import os
+import pkgutil
+import re
+
+from db_pool import get_connection
+
+_MIGRATION_NAME = re.compile(r'^(\d{4})_(\w+)$')
+
+
+def discover_migrations():
+    """List (version, name, module) for every migration, in version order"""
+    migrations = []
+    package_dir = os.path.dirname(__file__)
+    for module_info in pkgutil.iter_modules([package_dir]):
+        match = _MIGRATION_NAME.match(module_info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f'{__name__}.{module_info.name}')
+        migrations.append((int(match.group(1)), match.group(2), module))
+
+    migrations.sort(key=lambda migration: migration[0])
+    versions = [migration[0] for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError('Duplicate migration version numbers')
+    return migrations
+
+
+def ensure_version_table(conn):
+    """Create the schema_version bookkeeping table"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    conn.commit()
+
+
+def current_version(conn):
+    """Highest applied migration version (0 for a fresh database)"""
+    ensure_version_table(conn)
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn=None, target=None):
+    """Apply pending migrations up to target; returns the versions applied"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+
+    applied = []
+    try:
+        ensure_version_table(conn)
+        for version, name, module in discover_migrations():
+            if target is not None and version > target:
+                break
+
+            # Take the write lock before checking so concurrent workers serialize
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                done = conn.execute(
+                    'SELECT 1 FROM schema_version WHERE version = ?', (version,)
+                ).fetchone()
+                if done:
+                    conn.rollback()
+                    continue
+                module.upgrade(conn)
+                conn.execute(
+                    'INSERT INTO schema_version (version, name) VALUES (?, ?)',
+                    (version, name)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            applied.append(version)
+            print(f"Applied migration {version:04d}_{name}")
+
+        if applied:
+            # Refresh planner statistics for anything the migrations touched
+            conn.execute('PRAGMA optimize')
+    finally:
+        if own_conn:
+            conn.close()
+
+    return applied
+
+
+def migration_status(conn=None):
+    """List (version, name, applied_at) for every known migration"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+
+    try:
+        ensure_version_table(conn)
+        applied = {
+            row['version']: row['applied_at']
+            for row in conn.execute('SELECT version, applied_at FROM schema_version')
+        }
+    finally:
+        if own_conn:
+            conn.close()
+
+    return [(version, name, applied.get(version)) for version, name, _ in discover_migrations()]
@@ -0,0 +1,45 @@
+"""
+Migration CLI
+Usage: python -m migrations [upgrade [target] | status | check-plans]
+"""
+
+import sys
+
+from database import init_db
+from migrations import apply_migrations, migration_status
+from migrations.query_plans import check_query_plans
+
+
+def main(argv):
+    command = argv[0] if argv else 'upgrade'
+
+    if command == 'upgrade':
+        init_db()
+        target = int(argv[1]) if len(argv) > 1 else None
+        applied = apply_migrations(target=target)
+        print(f"{len(applied)} migration(s) applied")
+        return 0
+
+    if command == 'status':
+        for version, name, applied_at in migration_status():
+            state = f"applied {applied_at}" if applied_at else "pending"
+            print(f"{version:04d}_{name}: {state}")
+        return 0
+
+    if command == 'check-plans':
+        failures = check_query_plans()
+        for module, lineno, sql, scans in failures:
+            print(f"{module}:{lineno}: unindexed plan ({'; '.join(scans)})")
+            print(f"    {sql}")
+        if failures:
+            print(f"{len(failures)} hot query(ies) scan whole tables")
+            return 1
+        print("All hot queries use indexes")
+        return 0
+
+    print(__doc__.strip())
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
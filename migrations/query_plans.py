@@ -0,0 +1,140 @@
+"""
+EXPLAIN QUERY PLAN check for the hot queries
+Every SQL string literal in the modules that run SQL on the request path is
+planned against the database; any plan step that scans a whole table is
+reported as a failure. Maintenance code in those modules (CLI rebuilds and
+checks) is listed in OFFLINE_QUERIES and skipped. Modules that build queries
+at runtime expose plan_samples() instead; their queries must also not sort
+in a temp b-tree.
+"""
+
+import ast
+import importlib
+import os
+import sqlite3
+
+from db_pool import get_connection
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules whose queries run on the request path
+HOT_QUERY_MODULES = ['app.py', 'school_search.py', 'identity.py', 'game_logs.py', 'stats.py',
+                     'roster.py', 'otp_store.py']
+
+# Modules that build their request-path queries at runtime (keyset pages
+# must come straight off an index, without sorting)
+HOT_QUERY_BUILDERS = ['roster', 'game_logs']
+
+# Functions and module-level query constants of the modules above that are
+# only used offline and read whole tables on purpose
+OFFLINE_QUERIES = {
+    'stats.py': {'STUDENT_AGGREGATES', 'SCHOOL_SUBJECT_AGGREGATES', 'rebuild_stats', 'check_consistency'}
+}
+
+# Tables that are still allowed to be scanned, with the reason why
+ALLOWED_SCANS = {
+    'udise_schools': "school-search LIKE fallback for SQLite builds without FTS5",
+    'sqlite_master': "schema lookups, a handful of rows"
+}
+
+_SQL_PREFIXES = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def _names(statement):
+    if isinstance(statement, (ast.FunctionDef, ast.ClassDef)):
+        return {statement.name}
+    if isinstance(statement, ast.Assign):
+        return {target.id for target in statement.targets if isinstance(target, ast.Name)}
+    return set()
+
+
+def extract_queries(path, skip=()):
+    """Yield (line number, sql) for every SQL string literal in a module, except
+    docstrings, f-strings and the top-level functions and assignments named in skip"""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    nodes = [node for statement in tree.body if not _names(statement) & set(skip)
+             for node in ast.walk(statement)]
+    # Docstrings, and pieces of f-strings (runtime-built queries are checked through plan_samples())
+    ignored = {id(node.value) for node in nodes
+               if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)}
+    ignored.update(id(part) for node in nodes if isinstance(node, ast.JoinedStr) for part in node.values)
+    for node in nodes:
+        if id(node) in ignored:
+            continue
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            sql = ' '.join(node.value.split())
+            if sql.upper().startswith(_SQL_PREFIXES):
+                yield node.lineno, sql
+
+
+def full_scans(conn, sql):
+    """Return the plan steps of a query that scan an entire table"""
+    params = [None] * sql.count('?')
+    plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+    subqueries = set()
+    scans = []
+    for row in plan:
+        detail = row[3]
+        if detail.startswith(('CO-ROUTINE ', 'MATERIALIZE ')):
+            subqueries.add(detail.split()[1])
+            continue
+        if detail == 'SCAN CONSTANT ROW' or 'VIRTUAL TABLE INDEX' in detail:
+            # Constant rows and index-driven virtual tables (FTS MATCH) are fine
+            continue
+        if detail.startswith('SCAN ') and detail.split()[1] not in subqueries:
+            scans.append(detail)
+    return scans
+
+
+def _scanned_table(detail, sql):
+    """Resolve the table name (or alias) of a 'SCAN x ...' plan step"""
+    name = detail.split()[1]
+    words = sql.replace(',', ' ').split()
+    for i, word in enumerate(words[:-1]):
+        if words[i + 1] == name and word not in ('FROM', 'JOIN', 'UPDATE', 'INTO'):
+            return word
+    return name
+
+
+def check_query_plans(conn=None, modules=None):
+    """Plan every hot query; returns a list of (module, line, sql, scans) failures"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+
+    failures = []
+    try:
+        for module in modules or HOT_QUERY_MODULES:
+            path = os.path.join(PROJECT_ROOT, module)
+            for lineno, sql in extract_queries(path, OFFLINE_QUERIES.get(module, ())):
+                try:
+                    plan_scans = full_scans(conn, sql)
+                except sqlite3.OperationalError as e:
+                    # e.g. the FTS table on a build without FTS5
+                    print(f"{module}:{lineno}: skipped ({e})")
+                    continue
+                scans = [
+                    detail for detail in plan_scans
+                    if _scanned_table(detail, sql) not in ALLOWED_SCANS
+                ]
+                if scans:
+                    failures.append((module, lineno, sql, scans))
+
+        if modules is None:
+            for name in HOT_QUERY_BUILDERS:
+                for sql in importlib.import_module(name).plan_samples():
+                    sql = ' '.join(sql.split())
+                    params = [None] * sql.count('?')
+                    sorts = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                             if row[3].startswith('USE TEMP B-TREE')]
+                    scans = [detail for detail in full_scans(conn, sql)
+                             if _scanned_table(detail, sql) not in ALLOWED_SCANS]
+                    if scans or sorts:
+                        failures.append((f'{name}.py', 0, sql, scans + sorts))
+    finally:
+        if own_conn:
+            conn.close()
+
+    return failures
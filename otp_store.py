@@ -0,0 +1,357 @@
+"""
+OTP storage for Shiksha Leap
+Two interchangeable stores with the same interface, picked by OTP_STORE:
+
+- MemoryOtpStore (default): per-worker dict of contacts with an expiry heap
+  that is swept on every call, so nothing outlives its TTL or rate-limit
+  window. Only safe when send and verify reach the same process, so it is
+  only used with WORKERS=1; with more workers the sqlite store is used
+  instead (and a warning printed).
+- SqliteOtpStore: the otp_verifications table shared by all workers, with
+  expired rows purged every OTP_PURGE_INTERVAL_SECONDS.
+
+Both limit sends per contact (OTP_MAX_SENDS per OTP_SEND_WINDOW_SECONDS)
+and lock a contact out of verifying for OTP_LOCKOUT_SECONDS after
+OTP_MAX_ATTEMPTS wrong codes.
+
+Usage: python otp_store.py --benchmark [verifies] [threads]
+"""
+
+import datetime
+import hashlib
+import heapq
+import hmac
+import os
+import secrets
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from db_pool import get_connection
+
+
+class OtpRateLimited(Exception):
+    """Too many sends or failed verifications for a contact"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+def _hash_otp(otp):
+    return hashlib.sha256(otp.encode()).hexdigest()
+
+
+class _ContactState:
+    __slots__ = ('codes', 'sends', 'failures', 'failure_window_start', 'locked_until')
+
+    def __init__(self):
+        self.codes = []          # [(otp_hash, expires_at)]
+        self.sends = deque()     # send times inside the rate-limit window
+        self.failures = 0
+        self.failure_window_start = 0.0
+        self.locked_until = 0.0
+
+
+class MemoryOtpStore:
+    """Per-process OTP store with expiring-heap eviction"""
+
+    def __init__(self, ttl=600, max_sends=5, send_window=900, max_attempts=5, lockout=900):
+        self.ttl = ttl
+        self.max_sends = max_sends
+        self.send_window = send_window
+        self.max_attempts = max_attempts
+        self.lockout = lockout
+        self._contacts = {}
+        self._heap = []  # (time the contact's state should be re-examined, contact)
+        self._lock = threading.Lock()
+        self.issued = 0
+        self.verified = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self.evicted = 0
+
+    def _schedule(self, contact, state):
+        """Push the next time this contact's state can change, or forget it"""
+        times = [expires for _, expires in state.codes]
+        if state.sends:
+            times.append(state.sends[0] + self.send_window)
+        if state.failures or state.locked_until:
+            times.append(max(state.failure_window_start + self.lockout, state.locked_until))
+        if times:
+            heapq.heappush(self._heap, (min(times), contact))
+        else:
+            del self._contacts[contact]
+            self.evicted += 1
+
+    def _expire(self, state, now):
+        state.codes = [(h, expires) for h, expires in state.codes if expires > now]
+        while state.sends and state.sends[0] + self.send_window <= now:
+            state.sends.popleft()
+        if state.locked_until and state.locked_until <= now:
+            state.locked_until = 0.0
+            state.failures = 0
+        if state.failures and state.failure_window_start + self.lockout <= now:
+            state.failures = 0
+
+    def sweep(self, now=None):
+        """Drop expired codes, windows and contacts whose heap entries are due"""
+        now = time.monotonic() if now is None else now
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, contact = heapq.heappop(heap)
+            state = self._contacts.get(contact)
+            if state is None:
+                continue
+            self._expire(state, now)
+            self._schedule(contact, state)
+
+    def issue(self, contact, otp):
+        """Store a freshly sent OTP; raises OtpRateLimited past the send limit"""
+        now = time.monotonic()
+        with self._lock:
+            self.sweep(now)
+            state = self._contacts.get(contact)
+            if state is None:
+                state = self._contacts[contact] = _ContactState()
+            else:
+                self._expire(state, now)
+            if len(state.sends) >= self.max_sends:
+                self.rate_limited += 1
+                raise OtpRateLimited('Too many OTP requests, try again later',
+                                     state.sends[0] + self.send_window - now)
+            state.sends.append(now)
+            state.codes.append((_hash_otp(otp), now + self.ttl))
+            # Pushed per issue; stale entries are skipped when they surface
+            heapq.heappush(self._heap, (now + self.ttl, contact))
+            self.issued += 1
+
+    def verify(self, contact, otp):
+        """True if otp is a live code for contact (consuming it); raises OtpRateLimited when locked"""
+        now = time.monotonic()
+        otp_hash = _hash_otp(otp)
+        with self._lock:
+            self.sweep(now)
+            state = self._contacts.get(contact)
+            if state is None:
+                self.rejected += 1
+                return False
+            self._expire(state, now)
+            if state.locked_until > now:
+                self.rate_limited += 1
+                raise OtpRateLimited('Too many wrong OTPs, try again later', state.locked_until - now)
+
+            if any(hmac.compare_digest(h, otp_hash) for h, _ in state.codes):
+                # One login per OTP request: every outstanding code is spent
+                state.codes = []
+                state.failures = 0
+                self.verified += 1
+                return True
+
+            if not state.failures:
+                state.failure_window_start = now
+            state.failures += 1
+            if state.failures >= self.max_attempts:
+                state.locked_until = now + self.lockout
+            heapq.heappush(self._heap, (max(state.failure_window_start + self.lockout, state.locked_until), contact))
+            self.rejected += 1
+            return False
+
+    def stats(self):
+        """Store counters for monitoring"""
+        return {
+            'store': 'memory',
+            'contacts': len(self._contacts),
+            'heap': len(self._heap),
+            'issued': self.issued,
+            'verified': self.verified,
+            'rejected': self.rejected,
+            'rate_limited': self.rate_limited,
+            'evicted': self.evicted
+        }
+
+
+class SqliteOtpStore:
+    """OTP store on the shared database, for multi-worker deployments"""
+
+    def __init__(self, ttl=600, max_sends=5, send_window=900, max_attempts=5, lockout=900,
+                 purge_interval=300):
+        self.ttl = ttl
+        self.max_sends = max_sends
+        self.send_window = send_window
+        self.max_attempts = max_attempts
+        self.lockout = lockout
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._lock = threading.Lock()
+        self.purged = 0
+
+    def issue(self, contact, otp):
+        """Store a freshly sent OTP; raises OtpRateLimited past the send limit"""
+        self._maybe_purge()
+        conn = get_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            recent = conn.execute('''
+                SELECT COUNT(*), MIN(created_at) FROM otp_verifications
+                WHERE contact = ? AND created_at > datetime('now', ?)
+            ''', (contact, f'-{self.send_window} seconds')).fetchone()
+            if recent[0] >= self.max_sends:
+                conn.rollback()
+                oldest = datetime.datetime.fromisoformat(recent[1])
+                retry_after = (oldest - datetime.datetime.utcnow()).total_seconds() + self.send_window
+                raise OtpRateLimited('Too many OTP requests, try again later', retry_after)
+
+            expires_at = datetime.datetime.now() + datetime.timedelta(seconds=self.ttl)
+            conn.execute('''
+                INSERT INTO otp_verifications (contact, otp_code, otp_hash, expires_at)
+                VALUES (?, ?, ?, ?)
+            ''', (contact, otp, _hash_otp(otp), expires_at))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def verify(self, contact, otp):
+        """True if otp is a live code for contact (consuming it); raises OtpRateLimited when locked"""
+        now = time.time()
+        conn = get_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            attempts = conn.execute('''
+                SELECT failures, window_start, locked_until FROM otp_attempts WHERE contact = ?
+            ''', (contact,)).fetchone()
+            if attempts and attempts['locked_until'] > now:
+                conn.rollback()
+                raise OtpRateLimited('Too many wrong OTPs, try again later', attempts['locked_until'] - now)
+
+            otp_record = conn.execute('''
+                SELECT id FROM otp_verifications
+                WHERE contact = ? AND otp_code = ? AND expires_at > ? AND verified = 0
+                ORDER BY created_at DESC LIMIT 1
+            ''', (contact, otp, datetime.datetime.now())).fetchone()
+
+            if otp_record:
+                # One login per OTP request: every outstanding code is spent
+                conn.execute('UPDATE otp_verifications SET verified = 1 WHERE contact = ? AND verified = 0',
+                             (contact,))
+                conn.execute('DELETE FROM otp_attempts WHERE contact = ?', (contact,))
+                conn.commit()
+                return True
+
+            if not attempts or attempts['window_start'] + self.lockout <= now:
+                failures, window_start = 1, now
+            else:
+                failures, window_start = attempts['failures'] + 1, attempts['window_start']
+            locked_until = now + self.lockout if failures >= self.max_attempts else 0
+            conn.execute('''
+                INSERT OR REPLACE INTO otp_attempts (contact, failures, window_start, locked_until)
+                VALUES (?, ?, ?, ?)
+            ''', (contact, failures, window_start, locked_until))
+            conn.commit()
+            return False
+        finally:
+            conn.close()
+
+    def _maybe_purge(self):
+        if time.monotonic() < self._next_purge:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_purge:
+                return
+            self._next_purge = time.monotonic() + self.purge_interval
+        self.purge()
+
+    def purge(self):
+        """Delete OTP rows that are expired and outside the send window, and stale attempt counters"""
+        now = time.time()
+        conn = get_connection()
+        try:
+            deleted = conn.execute('''
+                DELETE FROM otp_verifications
+                WHERE expires_at <= ? AND created_at <= datetime('now', ?)
+            ''', (datetime.datetime.now(), f'-{self.send_window} seconds')).rowcount
+            deleted += conn.execute('''
+                DELETE FROM otp_attempts WHERE locked_until <= ? AND window_start <= ?
+            ''', (now, now - self.lockout)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        self.purged += deleted
+        return deleted
+
+    def stats(self):
+        """Store counters for monitoring"""
+        return {'store': 'sqlite', 'purged': self.purged}
+
+
+def create_store(config=Config):
+    """Build the OTP store selected by config.OTP_STORE (sqlite instead of memory
+    when several workers serve requests)"""
+    options = dict(ttl=config.OTP_TTL_SECONDS, max_sends=config.OTP_MAX_SENDS,
+                   send_window=config.OTP_SEND_WINDOW_SECONDS, max_attempts=config.OTP_MAX_ATTEMPTS,
+                   lockout=config.OTP_LOCKOUT_SECONDS)
+    kind = config.OTP_STORE
+    if kind == 'memory' and config.WORKERS > 1:
+        # An OTP sent by one worker would fail to verify on another
+        print(f"Warning: OTP_STORE=memory does not work with {config.WORKERS} workers; using the sqlite store")
+        kind = 'sqlite'
+    if kind == 'sqlite':
+        return SqliteOtpStore(purge_interval=config.OTP_PURGE_INTERVAL_SECONDS, **options)
+    if kind == 'memory':
+        return MemoryOtpStore(**options)
+    raise ValueError(f"Unknown OTP_STORE {config.OTP_STORE!r} (expected 'memory' or 'sqlite')")
+
+
+_store = None
+
+
+def init_store(config=Config):
+    """Create the process-wide OTP store from a configuration object"""
+    global _store
+    _store = create_store(config)
+    return _store
+
+
+def get_store():
+    """Get the process-wide OTP store, creating it from the default config if needed"""
+    if _store is None:
+        return init_store()
+    return _store
+
+
+def benchmark(count=100000, threads=32):
+    """Issue then verify count OTPs from a thread pool, for each store"""
+    from database import init_db
+    from db_pool import init_pool
+
+    codes = {f'98{i:08d}': str(secrets.randbelow(900000) + 100000) for i in range(count)}
+    with tempfile.TemporaryDirectory() as tmp:
+        Config.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        init_pool(Config)
+        init_db()
+
+        for store in (MemoryOtpStore(), SqliteOtpStore(purge_interval=3600)):
+            name = type(store).__name__
+            with ThreadPoolExecutor(threads) as pool:
+                start = time.perf_counter()
+                list(pool.map(lambda item: store.issue(*item), codes.items(), chunksize=256))
+                issue = time.perf_counter() - start
+
+                start = time.perf_counter()
+                results = list(pool.map(lambda item: store.verify(*item), codes.items(), chunksize=256))
+                verify = time.perf_counter() - start
+            assert all(results)
+            print(f"{name}: {count:,} issues in {issue:.2f}s ({count / issue:,.0f}/s), "
+                  f"{count:,} verifies on {threads} threads in {verify:.2f}s ({count / verify:,.0f}/s)")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--benchmark']:
+        args = [int(arg) for arg in sys.argv[2:4]]
+        benchmark(*args)
+    else:
+        print(__doc__.strip())
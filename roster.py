@@ -0,0 +1,139 @@
+"""
+Keyset-paginated student roster for Shiksha Leap
+Pages through a school's students by seeking past the last row of the
+previous page on (sort key, student id) instead of using OFFSET, so every
+page is an index range scan of `limit` rows however deep it is. Sorting by
+a stat uses the expression indexes from migrations/0006_roster_indexes.py.
+"""
+
+import base64
+import binascii
+import json
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# sort name -> (key expressions, in ORDER BY order; driving table)
+# The stat expressions must match the indexes in 0006_roster_indexes.py.
+SORT_KEYS = {
+    'name': (('s.grade', 's.first_name', 's.id'), 'students'),
+    'avg_score': (('COALESCE(ss.score_pct_sum / ss.scored_games, -1)', 'ss.student_id'), 'student_stats'),
+    'last_activity': (("COALESCE(ss.last_activity, '')", 'ss.student_id'), 'student_stats'),
+    'total_games': (('ss.total_games', 'ss.student_id'), 'student_stats')
+}
+
+_COLUMNS = '''
+    s.id, s.first_name, s.last_name, s.grade, s.school_name, s.district,
+    COALESCE(ss.total_games, 0) AS total_games,
+    ss.score_pct_sum / ss.scored_games AS avg_score,
+    ss.last_activity AS last_activity
+'''
+
+
+def encode_cursor(values):
+    """Opaque page cursor for the sort key values of a row"""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """Sort key values from a cursor, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length \
+            or not all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in values):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def sort_keys(sort, grade=None):
+    """Key expressions and driving table for a sort order"""
+    if sort not in SORT_KEYS:
+        raise ValueError(f"'sort' must be one of {', '.join(SORT_KEYS)}")
+    keys, driving = SORT_KEYS[sort]
+    if sort == 'name' and grade is not None:
+        # grade is fixed by the filter; seeking on it too defeats the index
+        keys = keys[1:]
+    return keys, driving
+
+
+def build_query(sort='name', descending=False, grade=None, school=None, district=None, after=None):
+    """SQL and parameter names for one roster page"""
+    keys, driving = sort_keys(sort, grade)
+
+    if driving == 'students':
+        sql = f'SELECT {_COLUMNS} FROM students s LEFT JOIN student_stats ss ON ss.student_id = s.id WHERE s.udise_code = ?'
+    else:
+        sql = f'SELECT {_COLUMNS} FROM student_stats ss JOIN students s ON s.id = ss.student_id WHERE ss.udise_code = ?'
+    params = ['udise_code']
+
+    if grade is not None:
+        sql += ' AND s.grade = ?'
+        params.append('grade')
+    if school is not None:
+        sql += ' AND s.school_name = ?'
+        params.append('school')
+    if district is not None:
+        sql += ' AND s.district = ?'
+        params.append('district')
+
+    if after is not None:
+        # The redundant bound on the first key lets SQLite range-scan
+        # expression indexes, which it won't do for the row value alone
+        placeholders = ', '.join('?' * len(keys))
+        sql += f" AND {keys[0]} {'<=' if descending else '>='} ?"
+        sql += f" AND ({', '.join(keys)}) {'<' if descending else '>'} ({placeholders})"
+        params.append('after_0')
+        params.extend(f'after_{i}' for i in range(len(keys)))
+
+    direction = ' DESC' if descending else ''
+    sql += ' ORDER BY ' + ', '.join(key + direction for key in keys) + ' LIMIT ?'
+    params.append('limit')
+    return sql, params
+
+
+def _sort_values(row, sort, grade=None):
+    if sort == 'name':
+        values = [row['grade'], row['first_name'], row['id']]
+        return values[1:] if grade is not None else values
+    if sort == 'avg_score':
+        return [row['avg_score'] if row['avg_score'] is not None else -1, row['id']]
+    if sort == 'last_activity':
+        return [row['last_activity'] or '', row['id']]
+    return [row['total_games'], row['id']]
+
+
+def fetch_page(conn, udise_code, sort='name', descending=False, grade=None, school=None,
+               district=None, cursor=None, limit=DEFAULT_LIMIT):
+    """One page of a school's roster: {'students', 'next_cursor'}"""
+    try:
+        limit = max(1, min(int(limit), MAX_LIMIT))
+    except (TypeError, ValueError):
+        raise ValueError("'limit' must be an integer")
+    keys, _ = sort_keys(sort, grade)
+    after = decode_cursor(cursor, len(keys)) if cursor else None
+
+    sql, names = build_query(sort, descending, grade, school, district, after)
+    values = {'udise_code': udise_code, 'grade': grade, 'school': school,
+              'district': district, 'limit': limit + 1}
+    for i, value in enumerate(after or ()):
+        values[f'after_{i}'] = value
+
+    rows = conn.execute(sql, [values[name] for name in names]).fetchall()
+    students = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(_sort_values(rows[limit - 1], sort, grade))
+    return {'students': students, 'next_cursor': next_cursor}
+
+
+def plan_samples():
+    """Every query shape fetch_page() can issue, for migrations.query_plans"""
+    for sort in SORT_KEYS:
+        for descending in (False, True):
+            for grade in (None, 6):
+                for after in (None, True):
+                    yield build_query(sort, descending, grade, None, None, after)[0]
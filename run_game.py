@@ -2,52 +2,124 @@
 """
 Game Runner Script for Shiksha Leap
 Runs Panda3D games based on grade and subject
+
+--benchmark replays a synthetic session of each game (see game_replay.py):
+a scripted sequence of key presses on a fixed 60 Hz clock with a fixed
+seed, rendered into an offscreen buffer instead of a window. It reports
+frame time percentiles, Panda3D's per-task timings and scene-graph node
+counts as JSON, so runs on CI and lab machines can be compared over time.
+Each game runs in its own process (one ShowBase per process).
 """
 
 import sys
-import os
-import importlib.util
+import importlib
+
+from config import Config
+from game_registry import GameRegistry
+from game_replay import Recording, replay_isolated, summary, write_report
+
+BENCHMARK_DT = 1.0 / 60
+
+# (frame within a 240-frame cycle, event); games ignore events they don't accept
+SCRIPTED_INPUT = [
+    (0, 'arrow_right'), (40, 'arrow_right-up'),
+    (40, 'arrow_up'), (80, 'arrow_up-up'),
+    (80, 'arrow_left'), (120, 'arrow_left-up'),
+    (120, 'arrow_down'), (160, 'arrow_down-up'),
+    (170, '4'), (175, '0'), (180, 'period'), (185, '8'), (190, 'enter'),
+    (200, '1'), (210, '2'), (220, 'backspace'), (230, '3')
+]
+SCRIPT_CYCLE = 240
 
 def run_game(grade, subject):
     """Run a specific game based on grade and subject"""
     try:
-        # Construct the game module path
-        game_file = f"games/grade_{grade}/{subject}_game.py"
-        
-        if not os.path.exists(game_file):
-            print(f"Game not found: {game_file}")
-            return False
-        
-        # Load the game module dynamically
-        spec = importlib.util.spec_from_file_location(f"{subject}_game", game_file)
-        game_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(game_module)
-        
-        # Run the game's main function
-        if hasattr(game_module, 'main'):
-            game_module.main()
-        else:
-            print(f"No main function found in {game_file}")
+        # Only games the registry found under games/grade_N/ can be run
+        game = GameRegistry(Config.GAMES_DIR).python_game(int(grade), subject.lower())
+        if game is None:
+            print(f"Game not found: grade {grade} {subject}")
             return False
-            
+
+        # Import the game module and run its main function (the registry
+        # only lists modules that define one)
+        game_module = importlib.import_module(game.module)
+        game_module.main()
+
         return True
-        
+
     except Exception as e:
         print(f"Error running game: {e}")
         return False
 
+def benchmark_recording(game, frames=600, warmup=30, seed=0, options=None):
+    """A synthetic recording of a game: SCRIPTED_INPUT on a fixed 60 Hz clock"""
+    events = [(frame, event) for frame in range(warmup + frames)
+              for offset, event in SCRIPTED_INPUT if offset == frame % SCRIPT_CYCLE]
+    return Recording(game.module, game.game_id, seed, [round(BENCHMARK_DT * 1000000)] * (warmup + frames), events,
+                     options=options)
+
+def benchmark(games=None, frames=600, warmup=30, output=None, options=None):
+    """Benchmark the given (grade, subject) games, or every registry game, and write JSON;
+    options are passed to the game classes (e.g. {'specimen_count': 1000})"""
+    registry = GameRegistry(Config.GAMES_DIR)
+    if games:
+        entries = [registry.python_game(int(grade), subject.lower()) for grade, subject in games]
+        missing = [f'grade {grade} {subject}' for (grade, subject), entry in zip(games, entries) if entry is None]
+        if missing:
+            raise ValueError(f"Game not found: {', '.join(missing)}")
+    else:
+        entries = sorted(registry.python_games(), key=lambda entry: (entry.grade, entry.subject_id))
+
+    results = []
+    for entry in entries:
+        result = replay_isolated(benchmark_recording(entry, frames, warmup, options=options), warmup)
+        result.update(grade=entry.grade, subject=entry.subject)
+        print(summary(result), file=sys.stderr)
+        results.append(result)
+    return write_report(results, output)
+
+def _benchmark_main(args):
+    options = {}
+    game_options = {}
+    while '--option' in args:
+        index = args.index('--option')
+        name, _, value = args[index + 1].partition('=')
+        game_options[name] = int(value) if value.lstrip('-').isdigit() else value
+        del args[index:index + 2]
+    for name in ('--frames', '--warmup', '--output'):
+        if name in args:
+            index = args.index(name)
+            value = args[index + 1]
+            options[name[2:]] = value if name == '--output' else int(value)
+            del args[index:index + 2]
+    if len(args) % 2:
+        print("Usage: python run_game.py --benchmark [<grade> <subject> ...] "
+              "[--frames N] [--warmup N] [--option name=value ...] [--output results.json]")
+        sys.exit(1)
+    games = list(zip(args[0::2], args[1::2]))
+    try:
+        benchmark(games, options=game_options, **options)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
 if __name__ == "__main__":
+    if sys.argv[1:2] == ['--benchmark']:
+        _benchmark_main(sys.argv[2:])
+        sys.exit(0)
+
     if len(sys.argv) != 3:
         print("Usage: python run_game.py <grade> <subject>")
         print("Example: python run_game.py 6 mathematics")
+        print("       python run_game.py --benchmark [<grade> <subject> ...] [--frames N] [--output results.json]")
         sys.exit(1)
-    
+
     grade = sys.argv[1]
     subject = sys.argv[2]
-    
+
     print(f"Starting {subject} game for grade {grade}...")
     success = run_game(grade, subject)
-    
+
     if not success:
         print("Failed to start game")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
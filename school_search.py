@@ -0,0 +1,96 @@
+"""
+School search for the registration form autocomplete
+Uses the udise_schools_fts FTS5 index (prefix matching per token, bm25
+ranking, exact UDISE code first) and falls back to LIKE matching when the
+SQLite build has no FTS5.
+"""
+
+import re
+import sqlite3
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def fts5_available(conn):
+    """Check whether this SQLite build was compiled with FTS5"""
+    try:
+        conn.execute('CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)')
+        conn.execute('DROP TABLE temp._fts5_probe')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+_fts_enabled = None
+
+
+def init_search(conn):
+    """Check once whether the school search index exists in this database
+
+    The index is created by a migration, so this runs at startup after the
+    migrations rather than on every search.
+    """
+    global _fts_enabled
+    row = conn.execute('''
+        SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'udise_schools_fts'
+    ''').fetchone()
+    _fts_enabled = row is not None
+    return _fts_enabled
+
+
+def fts_enabled(conn):
+    """Whether the school search index exists, checked on first use"""
+    if _fts_enabled is None:
+        return init_search(conn)
+    return _fts_enabled
+
+
+def rebuild_index(conn):
+    """Re-index every school (caller commits)"""
+    if fts_enabled(conn):
+        conn.execute("INSERT INTO udise_schools_fts (udise_schools_fts) VALUES ('rebuild')")
+
+
+def build_match_query(query):
+    """Turn user input into an FTS5 query: every token must match as a prefix"""
+    tokens = _TOKEN.findall(query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_schools(conn, query, limit=20):
+    """Find up to limit schools matching query, exact UDISE code match first"""
+    results = []
+    exact = conn.execute('''
+        SELECT * FROM udise_schools WHERE udise_code = ?
+    ''', (query,)).fetchone()
+    if exact:
+        results.append(exact)
+
+    if fts_enabled(conn):
+        match = build_match_query(query)
+        if not match:
+            return results
+        # bm25 column weights: udise_code, school_name, district, block
+        rows = conn.execute('''
+            SELECT s.* FROM (
+                SELECT rowid, bm25(udise_schools_fts, 10.0, 5.0, 2.0, 1.0) AS score
+                FROM udise_schools_fts
+                WHERE udise_schools_fts MATCH ?
+                ORDER BY score
+                LIMIT ?
+            ) AS ranked
+            JOIN udise_schools s ON s.id = ranked.rowid
+            ORDER BY ranked.score
+        ''', (match, limit + 1)).fetchall()
+    else:
+        rows = conn.execute('''
+            SELECT * FROM udise_schools
+            WHERE udise_code LIKE ? OR school_name LIKE ? OR district LIKE ?
+            LIMIT ?
+        ''', (f'{query}%', f'%{query}%', f'%{query}%', limit + 1)).fetchall()
+
+    for row in rows:
+        if exact is None or row['id'] != exact['id']:
+            results.append(row)
+
+    return results[:limit]
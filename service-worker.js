@@ -1,5 +1,8 @@
 // Shiksha Leap Service Worker - Offline-First PWA
-const CACHE_NAME = 'shiksha-leap-v1.0.0';
+// Content updates are detected from the server manifest (see syncContent),
+// not by bumping a version string here
+const MANIFEST_URL = '/api/content/manifest';
+const MANIFEST_KEY = '/content-manifest.json';
 const STATIC_CACHE = 'shiksha-static-v1';
 const DYNAMIC_CACHE = 'shiksha-dynamic-v1';
 
@@ -20,14 +23,9 @@ const CORE_ASSETS = [
   '/manifest.json'
 ];
 
-// Game assets to cache (will be populated dynamically)
-const GAME_ASSETS = [
-  '/games/grade_6/english/game1/',
-  '/games/grade_6/maths/game1/',
-  '/games/grade_7/english/game1/',
-  '/games/grade_8/english_quiz.json',
-  '/games/grade_8/maths_quiz.json'
-];
+// Game content is cached per grade as a content-addressed bundle
+// (/games/bundles/grade_N/<hash>.json, see cacheGradeBundle)
+const GAME_ASSETS = [];
 
 // ML Models for offline AI
 const ML_MODELS = [
@@ -74,6 +72,8 @@ self.addEventListener('activate', event => {
       })
       .then(() => {
         console.log('Service Worker: Activated');
+        // Bring cached content up to date without delaying activation
+        syncContent();
         return self.clients.claim();
       })
   );
@@ -129,6 +129,53 @@ self.addEventListener('fetch', event => {
     );
 });
 
+// Download a grade's content bundle into the static cache, dropping
+// older bundles for that grade. Returns false if the grade has no content.
+async function cacheGradeBundle(grade) {
+  const infoResponse = await fetch(`/api/content/bundle/${grade}`);
+  if (!infoResponse.ok) {
+    return false;
+  }
+  const info = await infoResponse.json();
+  const cache = await caches.open(STATIC_CACHE);
+
+  const prefix = `/games/bundles/grade_${grade}/`;
+  const cachedRequests = await cache.keys();
+  let current = false;
+  for (const cachedRequest of cachedRequests) {
+    const path = new URL(cachedRequest.url).pathname;
+    if (!path.startsWith(prefix)) {
+      continue;
+    }
+    if (path === info.url) {
+      current = true;
+    } else {
+      await cache.delete(cachedRequest);
+    }
+  }
+
+  if (!current) {
+    await cache.add(info.url);
+    console.log('Service Worker: Cached content bundle', info.url);
+  }
+  cache.put(`/api/content/bundle/${grade}`, new Response(JSON.stringify(info), {
+    headers: { 'Content-Type': 'application/json' }
+  }));
+  return true;
+}
+
+// Pages ask for a grade to be taken offline
+self.addEventListener('message', event => {
+  if (event.data && event.data.type === 'SYNC_CONTENT') {
+    event.waitUntil(syncContent());
+  }
+  if (event.data && event.data.type === 'CACHE_GRADE_BUNDLE') {
+    event.waitUntil(cacheGradeBundle(event.data.grade).catch(error => {
+      console.error('Service Worker: Failed to cache content bundle', error);
+    }));
+  }
+});
+
 // Handle API requests with offline support
 async function handleApiRequest(request) {
   const url = new URL(request.url);
@@ -303,18 +350,72 @@ self.addEventListener('notificationclick', event => {
   }
 });
 
-// Periodic background sync (for future use)
+// Periodic background sync: refresh offline content from the manifest
 self.addEventListener('periodicsync', event => {
   if (event.tag === 'content-sync') {
     event.waitUntil(syncContent());
   }
 });
 
+// URLs to download and to drop when moving from one manifest to another
+// (mirrors diff_manifests() in content_manifest.py)
+function diffManifests(previous, current) {
+  const oldAssets = (previous && previous.assets) || {};
+  const newAssets = current.assets || {};
+  const changed = Object.keys(newAssets)
+    .filter(url => !oldAssets[url] || oldAssets[url].hash !== newAssets[url].hash)
+    .sort();
+  const removed = Object.keys(oldAssets).filter(url => !newAssets[url]).sort();
+  return { changed, removed };
+}
+
+// Diff the server manifest against the one stored at the last sync and
+// download only the assets whose hash changed
 async function syncContent() {
   try {
-    console.log('Service Worker: Periodic content sync');
-    // Sync new learning content, games, etc.
+    console.log('Service Worker: Content sync');
+    const cache = await caches.open(STATIC_CACHE);
+
+    const stored = await cache.match(MANIFEST_KEY);
+    const previous = stored ? await stored.json() : null;
+
+    const response = await fetch(MANIFEST_URL, { cache: 'no-cache' });
+    if (!response.ok) {
+      throw new Error(`Manifest request failed: ${response.status}`);
+    }
+    const manifest = await response.json();
+    // A partial sync (some downloads failed) is never up to date, even if
+    // the server's version hasn't changed since
+    if (previous && !previous.partial && previous.version === manifest.version) {
+      console.log('Service Worker: Content is up to date');
+      return;
+    }
+
+    const { changed, removed } = diffManifests(previous, manifest);
+    let failed = 0;
+    for (const url of changed) {
+      let assetResponse = null;
+      try {
+        assetResponse = await fetch(url, { cache: 'no-cache' });
+      } catch (error) {
+        console.error('Service Worker: Content download failed', url, error);
+      }
+      if (assetResponse && assetResponse.ok) {
+        await cache.put(url, assetResponse);
+      } else {
+        // Leave it out of the stored manifest so the next sync diffs it as changed again
+        delete manifest.assets[url];
+        failed++;
+      }
+    }
+    await Promise.all(removed.map(url => cache.delete(url)));
+    manifest.partial = failed > 0;
+
+    await cache.put(MANIFEST_KEY, new Response(JSON.stringify(manifest), {
+      headers: { 'Content-Type': 'application/json' }
+    }));
+    console.log(`Service Worker: Content sync downloaded ${changed.length - failed}, failed ${failed}, removed ${removed.length}`);
   } catch (error) {
-    console.error('Service Worker: Periodic sync failed', error);
+    console.error('Service Worker: Content sync failed', error);
   }
-}
\ No newline at end of file
+}
@@ -115,6 +115,7 @@ class DatabaseSync {
     async saveGameLog(gameLog) {
         const logEntry = {
             ...gameLog,
+            client_log_id: gameLog.client_log_id || this.newLogId(),
             timestamp: Date.now(),
             synced: false
         };
@@ -216,6 +217,13 @@ class DatabaseSync {
             
             console.log(`Syncing ${unsyncedLogs.length} game logs...`);
             
+            // Logs stored before ids were introduced get one now, so retries de-duplicate
+            const withoutId = unsyncedLogs.filter(log => !log.client_log_id);
+            if (withoutId.length > 0) {
+                withoutId.forEach(log => { log.client_log_id = this.newLogId(); });
+                await this.putInStore('gameLogs', withoutId);
+            }
+            
             const response = await fetch('/api/sync-offline-data', {
                 method: 'POST',
                 headers: {
@@ -225,13 +233,23 @@ class DatabaseSync {
             });
             
             if (response.ok) {
-                // Mark logs as synced
-                await this.markAsSynced('gameLogs', unsyncedLogs);
-                console.log('Game logs synced successfully');
+                // Mark only the logs the server acknowledged as synced
+                const result = await response.json();
+                const statusById = new Map((result.results || []).map(r => [r.client_log_id, r]));
+                const acknowledged = unsyncedLogs.filter(log => statusById.has(log.client_log_id));
+                
+                statusById.forEach(r => {
+                    if (r.status === 'rejected') {
+                        console.warn('Game log rejected by server:', r.error);
+                    }
+                });
+                
+                await this.markAsSynced('gameLogs', acknowledged);
+                console.log(`Game logs synced: ${result.accepted} new, ${result.duplicate} already synced, ${result.rejected} rejected`);
                 
                 // Dispatch event for UI updates
                 window.dispatchEvent(new CustomEvent('gameLogsSynced', {
-                    detail: { count: unsyncedLogs.length }
+                    detail: { count: acknowledged.length }
                 }));
             } else {
                 console.error('Failed to sync game logs:', response.statusText);
@@ -335,6 +353,32 @@ class DatabaseSync {
         });
     }
     
+    // Write back existing items (same keys) to a store
+    async putInStore(storeName, items) {
+        const transaction = this.db.transaction([storeName], 'readwrite');
+        const store = transaction.objectStore(storeName);
+        
+        for (const item of items) {
+            store.put(item);
+        }
+        
+        return new Promise((resolve, reject) => {
+            transaction.oncomplete = () => resolve();
+            transaction.onerror = () => reject(transaction.error);
+        });
+    }
+    
+    // Client-generated id used by the server to de-duplicate retried logs
+    newLogId() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, c => {
+            const r = Math.random() * 16 | 0;
+            return (c === 'x' ? r : (r & 0x3 | 0x8)).toString(16);
+        });
+    }
+    
     // Add item to IndexedDB store
     async addToStore(storeName, item) {
         return new Promise((resolve, reject) => {
@@ -4,6 +4,7 @@
 class GameLoader {
     constructor() {
         this.gameCache = new Map();
+        this.bundleRequests = new Map();
         this.currentGrade = null;
         this.availableGames = {};
         this.init();
@@ -107,6 +108,12 @@ class GameLoader {
             return this.gameCache.get(cacheKey);
         }
         
+        // One request for the whole grade instead of one per game
+        await this.loadGradeBundle(grade);
+        if (this.gameCache.has(cacheKey)) {
+            return this.gameCache.get(cacheKey);
+        }
+        
         try {
             const response = await fetch(`/games/grade_${grade}/${gameFile}`);
             if (!response.ok) {
@@ -127,6 +134,41 @@ class GameLoader {
         }
     }
     
+    // Fetch the grade's content bundle and fill the game cache from it.
+    // The bundle URL is content-addressed, so the service worker can serve
+    // it from cache until the content changes.
+    loadGradeBundle(grade) {
+        if (!this.bundleRequests.has(grade)) {
+            const request = fetch(`/api/content/bundle/${grade}`)
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`No bundle for grade ${grade}`);
+                    }
+                    return response.json();
+                })
+                .then(info => fetch(info.url))
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`Failed to load bundle: ${response.statusText}`);
+                    }
+                    return response.json();
+                })
+                .then(bundle => {
+                    Object.entries(bundle.files).forEach(([file, gameData]) => {
+                        this.gameCache.set(`${grade}_${file}`, gameData);
+                    });
+                    return bundle.index;
+                })
+                .catch(error => {
+                    console.warn('Grade bundle unavailable, loading games individually:', error);
+                    this.bundleRequests.delete(grade);
+                    return [];
+                });
+            this.bundleRequests.set(grade, request);
+        }
+        return this.bundleRequests.get(grade);
+    }
+    
     // Get mock game data for offline/fallback scenarios
     getMockGameData(grade, gameFile) {
         return {
@@ -250,6 +292,7 @@ class GameLoader {
     // Clear cache
     clearCache() {
         this.gameCache.clear();
+        this.bundleRequests.clear();
         console.log('Game cache cleared');
     }
     
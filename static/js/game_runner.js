@@ -30,7 +30,7 @@ class GameRunner {
             const result = await response.json();
             
             if (response.ok) {
-                this.currentGame = { grade, subject };
+                this.currentGame = { grade, subject, gameId: result.game_id };
                 this.gameStatus = 'running';
                 this.updateGameStatus('running', 'Game is running!');
                 
@@ -52,6 +52,9 @@ class GameRunner {
     
     stopGame() {
         if (this.currentGame) {
+            // Close the game window on the kiosk as well
+            fetch(`/api/run-game/${this.currentGame.gameId}/stop`, { method: 'POST' })
+                .catch(error => console.error('Error stopping game:', error));
             this.gameStatus = 'stopped';
             this.currentGame = null;
             this.updateGameStatus('stopped', 'Game stopped');
@@ -59,17 +62,31 @@ class GameRunner {
     }
     
     monitorGame() {
-        // Monitor game status (in a real implementation, this would
-        // communicate with the Python process)
-        const checkInterval = setInterval(() => {
-            if (this.gameStatus === 'stopped') {
+        // Poll the launcher until the game window is closed or the game is stopped
+        const gameId = this.currentGame.gameId;
+        const checkInterval = setInterval(async () => {
+            if (this.gameStatus === 'stopped' || !this.currentGame || this.currentGame.gameId !== gameId) {
                 clearInterval(checkInterval);
                 return;
             }
             
-            // Simulate game monitoring
-            console.log('Game is running...');
-            
+            try {
+                const response = await fetch(`/api/run-game/${gameId}`);
+                const game = await response.json();
+                if (!response.ok || game.status === 'running' || game.status === 'starting') {
+                    return;
+                }
+                clearInterval(checkInterval);
+                this.gameStatus = 'stopped';
+                this.currentGame = null;
+                if (game.status === 'failed' || game.status === 'timeout') {
+                    this.updateGameStatus('error', game.error || 'Game ended');
+                } else {
+                    this.updateGameStatus('stopped', 'Game finished');
+                }
+            } catch (error) {
+                console.error('Error checking game status:', error);
+            }
         }, 5000);
     }
     
@@ -124,9 +141,10 @@ class GameRunner {
     
     restartGame() {
         if (this.currentGame) {
+            const { grade, subject } = this.currentGame;
             this.stopGame();
             setTimeout(() => {
-                this.startGame(this.currentGame.grade, this.currentGame.subject);
+                this.startGame(grade, subject);
             }, 1000);
         }
     }
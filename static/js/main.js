@@ -190,6 +190,14 @@ class ShikshaLeap {
             const offlineLogs = JSON.parse(localStorage.getItem('offlineGameLogs') || '[]');
             
             if (offlineLogs.length > 0) {
+                // Give older logs an id before sending, so a retried batch is de-duplicated
+                offlineLogs.forEach(log => {
+                    if (!log.client_log_id) {
+                        log.client_log_id = generateLogId();
+                    }
+                });
+                localStorage.setItem('offlineGameLogs', JSON.stringify(offlineLogs));
+                
                 const response = await fetch('/api/sync-offline-data', {
                     method: 'POST',
                     headers: {
@@ -199,9 +207,22 @@ class ShikshaLeap {
                 });
                 
                 if (response.ok) {
-                    localStorage.removeItem('offlineGameLogs');
+                    // Only drop logs the server acknowledged (stored, already stored or refused)
+                    const result = await response.json();
+                    const acknowledged = new Set((result.results || []).map(r => r.client_log_id));
+                    (result.results || [])
+                        .filter(r => r.status === 'rejected')
+                        .forEach(r => console.warn('Offline log rejected by server:', r.error));
+                    
+                    const current = JSON.parse(localStorage.getItem('offlineGameLogs') || '[]');
+                    const pending = current.filter(log => !acknowledged.has(log.client_log_id));
+                    if (pending.length > 0) {
+                        localStorage.setItem('offlineGameLogs', JSON.stringify(pending));
+                    } else {
+                        localStorage.removeItem('offlineGameLogs');
+                    }
                     this.showNotification('Data synced successfully!', 'success');
-                    console.log('Offline data synced successfully');
+                    console.log(`Offline data synced: ${result.accepted} new, ${result.duplicate} already synced`);
                 }
             }
         } catch (error) {
@@ -371,6 +392,17 @@ class ShikshaLeap {
     }
 }
 
+// Client-generated id that lets the server de-duplicate retried game logs
+function generateLogId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, c => {
+        const r = Math.random() * 16 | 0;
+        return (c === 'x' ? r : (r & 0x3 | 0x8)).toString(16);
+    });
+}
+
 // Initialize Shiksha Leap when DOM is loaded
 document.addEventListener('DOMContentLoaded', () => {
     window.shikshaLeap = new ShikshaLeap();
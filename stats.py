@@ -0,0 +1,215 @@
+"""
+Incrementally maintained dashboard aggregates for Shiksha Leap
+student_stats holds per-student totals and school_subject_stats per-school,
+per-subject totals, so the teacher dashboard never aggregates game_logs.
+Call record_game_logs() inside the same transaction as the game_logs insert.
+
+Usage: python stats.py [rebuild | check]
+"""
+
+import sys
+
+from db_pool import get_connection
+
+# Fresh aggregates computed from game_logs (used by rebuild and check)
+STUDENT_AGGREGATES = '''
+    SELECT s.id AS student_id, s.udise_code,
+           COUNT(gl.id) AS total_games,
+           COUNT(gl.score * 100.0 / gl.max_score) AS scored_games,
+           COALESCE(SUM(gl.score * 100.0 / gl.max_score), 0) AS score_pct_sum,
+           MAX(gl.played_at) AS last_activity
+    FROM students s
+    LEFT JOIN game_logs gl ON s.id = gl.student_id
+    GROUP BY s.id
+'''
+
+SCHOOL_SUBJECT_AGGREGATES = '''
+    SELECT s.udise_code, gl.subject,
+           COUNT(*) AS total_attempts,
+           COUNT(gl.score * 100.0 / gl.max_score) AS scored_attempts,
+           COALESCE(SUM(gl.score * 100.0 / gl.max_score), 0) AS score_pct_sum,
+           MAX(gl.played_at) AS last_activity
+    FROM game_logs gl
+    JOIN students s ON gl.student_id = s.id
+    GROUP BY s.udise_code, gl.subject
+'''
+
+_STUDENT_COLUMNS = ('total_games', 'scored_games', 'score_pct_sum', 'last_activity')
+_SCHOOL_SUBJECT_COLUMNS = ('total_attempts', 'scored_attempts', 'score_pct_sum', 'last_activity')
+
+
+def _later(current, candidate):
+    """Most recent of two timestamps, either of which may be None"""
+    if current is None or (candidate is not None and candidate > current):
+        return candidate
+    return current
+
+
+def ensure_student_stats(conn, student_id, udise_code):
+    """Create the empty summary row for a newly registered student"""
+    conn.execute('''
+        INSERT OR IGNORE INTO student_stats (student_id, udise_code) VALUES (?, ?)
+    ''', (student_id, udise_code))
+
+
+def record_game_logs(conn, student, logs):
+    """Fold newly inserted logs into the summaries (caller commits)
+
+    student needs 'id' and 'udise_code'; each log needs 'subject', 'score',
+    'max_score' and optionally 'played_at' (None means the insert used
+    CURRENT_TIMESTAMP).
+    """
+    if not logs:
+        return
+
+    totals = [0, 0, 0.0, None]
+    subjects = {}
+    uses_now = False
+
+    for log in logs:
+        played_at = log.get('played_at')
+        if played_at is None:
+            uses_now = True
+        else:
+            played_at = str(played_at)
+
+        max_score = log['max_score']
+        pct = log['score'] * 100.0 / max_score if max_score else None
+
+        for agg in (totals, subjects.setdefault(log['subject'], [0, 0, 0.0, None])):
+            agg[0] += 1
+            if pct is not None:
+                agg[1] += 1
+                agg[2] += pct
+            agg[3] = _later(agg[3], played_at)
+
+    if uses_now:
+        now = conn.execute('SELECT CURRENT_TIMESTAMP').fetchone()[0]
+        totals[3] = _later(totals[3], now)
+        for agg in subjects.values():
+            agg[3] = _later(agg[3], now)
+
+    conn.execute('''
+        INSERT INTO student_stats
+        (student_id, udise_code, total_games, scored_games, score_pct_sum, last_activity)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (student_id) DO UPDATE SET
+            total_games = total_games + excluded.total_games,
+            scored_games = scored_games + excluded.scored_games,
+            score_pct_sum = score_pct_sum + excluded.score_pct_sum,
+            last_activity = CASE
+                WHEN last_activity IS NULL OR excluded.last_activity > last_activity
+                THEN excluded.last_activity ELSE last_activity END
+    ''', (student['id'], student['udise_code'], *totals))
+
+    conn.executemany('''
+        INSERT INTO school_subject_stats
+        (udise_code, subject, total_attempts, scored_attempts, score_pct_sum, last_activity)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (udise_code, subject) DO UPDATE SET
+            total_attempts = total_attempts + excluded.total_attempts,
+            scored_attempts = scored_attempts + excluded.scored_attempts,
+            score_pct_sum = score_pct_sum + excluded.score_pct_sum,
+            last_activity = CASE
+                WHEN last_activity IS NULL OR excluded.last_activity > last_activity
+                THEN excluded.last_activity ELSE last_activity END
+    ''', [(student['udise_code'], subject, *agg) for subject, agg in subjects.items()])
+
+
+def rebuild_stats(conn=None):
+    """Recompute both summary tables from game_logs in one transaction"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM student_stats')
+        conn.execute('DELETE FROM school_subject_stats')
+        conn.execute(f'''
+            INSERT INTO student_stats
+            (student_id, udise_code, total_games, scored_games, score_pct_sum, last_activity)
+            SELECT * FROM ({STUDENT_AGGREGATES})
+        ''')
+        conn.execute(f'''
+            INSERT INTO school_subject_stats
+            (udise_code, subject, total_attempts, scored_attempts, score_pct_sum, last_activity)
+            SELECT * FROM ({SCHOOL_SUBJECT_AGGREGATES})
+        ''')
+        students = conn.execute('SELECT COUNT(*) FROM student_stats').fetchone()[0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+
+    return students
+
+
+def _differs(stored, fresh, columns):
+    for column in columns:
+        a, b = stored[column], fresh[column]
+        if isinstance(a, float) or isinstance(b, float):
+            if abs((a or 0) - (b or 0)) > 1e-6:
+                return True
+        elif a != b:
+            return True
+    return False
+
+
+def check_consistency(conn=None):
+    """Compare the summaries with fresh aggregates; returns a list of problems"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+
+    problems = []
+    try:
+        # Read both sides from one snapshot
+        conn.execute('BEGIN')
+        fresh = {row['student_id']: row for row in conn.execute(STUDENT_AGGREGATES)}
+        stored = {row['student_id']: row for row in conn.execute('SELECT * FROM student_stats')}
+        for student_id, row in fresh.items():
+            if student_id not in stored:
+                if row['total_games']:
+                    problems.append(f"student {student_id}: missing summary row")
+            elif _differs(stored[student_id], row, _STUDENT_COLUMNS):
+                problems.append(f"student {student_id}: summary {dict(stored[student_id])} != {dict(row)}")
+        for student_id in stored.keys() - fresh.keys():
+            problems.append(f"student {student_id}: summary row for unknown student")
+
+        fresh = {(row['udise_code'], row['subject']): row for row in conn.execute(SCHOOL_SUBJECT_AGGREGATES)}
+        stored = {(row['udise_code'], row['subject']): row
+                  for row in conn.execute('SELECT * FROM school_subject_stats')}
+        for key, row in fresh.items():
+            if key not in stored:
+                problems.append(f"school {key[0]} / {key[1]}: missing summary row")
+            elif _differs(stored[key], row, _SCHOOL_SUBJECT_COLUMNS):
+                problems.append(f"school {key[0]} / {key[1]}: summary {dict(stored[key])} != {dict(row)}")
+        for key in stored.keys() - fresh.keys():
+            problems.append(f"school {key[0]} / {key[1]}: summary row without logs")
+        conn.rollback()
+    finally:
+        if own_conn:
+            conn.close()
+
+    return problems
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+
+    if command == 'rebuild':
+        count = rebuild_stats()
+        print(f"Rebuilt summaries for {count} students")
+    elif command == 'check':
+        problems = check_consistency()
+        for problem in problems:
+            print(problem)
+        print(f"{len(problems)} inconsistency(ies) found")
+        sys.exit(1 if problems else 0)
+    else:
+        print(__doc__.strip())
+        sys.exit(2)
@@ -0,0 +1,353 @@
+"""
+In-memory UDISE school directory for Shiksha Leap
+Loads udise_schools once and serves code lookups and district -> block ->
+school drill-down without touching SQLite. Storage is column-oriented to
+stay small for a national list (~1.5M schools):
+
+- rows are sorted by (district, block, school_name), so every district and
+  block is a contiguous row range and the tree is just ranges with counts
+- UDISE codes (11 digits) are int64s in an array, looked up through an
+  open-addressing hash table of row numbers (O(1), no per-row objects)
+- school names are one UTF-8 blob plus an offsets array
+- district, block, category, area and management are interned into small
+  string tables and stored as narrow integer arrays
+
+Usage: python udise_directory.py --benchmark [schools]
+"""
+
+import sys
+import threading
+import time
+import tracemalloc
+from array import array
+
+from config import Config
+from db_pool import get_connection
+
+CODE_DIGITS = 11
+
+_EMPTY = -1
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+def _narrow_array(values):
+    """Copy of an array in the smallest unsigned type that holds every value"""
+    largest = max(values) if len(values) else 0
+    for typecode in ('B', 'H', 'I', 'Q'):
+        if largest < 1 << (8 * array(typecode).itemsize):
+            return array(typecode, values)
+
+
+class _StringTable:
+    """Interns repeated strings as small integer ids"""
+
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+        self.column = array('I')
+
+    def add(self, value):
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(sys.intern(value) if value is not None else None)
+        self.column.append(string_id)
+
+
+class UdiseDirectory:
+    """Read-only, column-oriented snapshot of udise_schools"""
+
+    def __init__(self, rows, version=None):
+        """Build from (id, udise_code, school_name, district, block, category,
+        area, management) rows sorted by district, block, school_name"""
+        self.version = version
+        self.ids = array('q')
+        self.codes = array('q')
+        self._other_codes = {}
+        self._other_codes_by_index = {}
+        names = bytearray()
+        self.name_offsets = array('I', [0])
+        districts, blocks = _StringTable(), _StringTable()
+        categories, areas, managements = _StringTable(), _StringTable(), _StringTable()
+
+        # district -> [start, end, {block: [start, end]}]
+        tree = {}
+        for index, row in enumerate(rows):
+            row_id, code, name, district, block, category, area, management = row
+            self.ids.append(row_id)
+            if code.isdigit() and len(code) == CODE_DIGITS:
+                self.codes.append(int(code))
+            else:
+                self.codes.append(_EMPTY)
+                self._other_codes[code] = index
+                self._other_codes_by_index[index] = code
+            names += name.encode('utf-8')
+            self.name_offsets.append(len(names))
+            districts.add(district)
+            blocks.add(block)
+            categories.add(category)
+            areas.add(area)
+            managements.add(management)
+
+            node = tree.get(district)
+            if node is None:
+                node = tree[district] = [index, index, {}]
+            node[1] = index + 1
+            block_range = node[2].get(block)
+            if block_range is None:
+                block_range = node[2][block] = [index, index]
+            block_range[1] = index + 1
+
+        self.names = bytes(names)
+        self.district_strings, self.district_ids = districts.strings, _narrow_array(districts.column)
+        self.block_strings, self.block_ids = blocks.strings, _narrow_array(blocks.column)
+        self.category_strings, self.category_ids = categories.strings, _narrow_array(categories.column)
+        self.area_strings, self.area_ids = areas.strings, _narrow_array(areas.column)
+        self.management_strings, self.management_ids = managements.strings, _narrow_array(managements.column)
+        self.tree = {
+            sys.intern(district): (start, end, {sys.intern(block): tuple(r) for block, r in sorted(blocks.items())})
+            for district, (start, end, blocks) in sorted(tree.items())
+        }
+        self._build_code_table()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _slot(self, code):
+        return ((code * _HASH_MULTIPLIER) & _MASK64) >> self._shift
+
+    def _build_code_table(self):
+        """Open-addressing (linear probing) table of row numbers, load factor <= 0.7"""
+        bits = 4
+        while (1 << bits) * 0.7 < len(self.codes):
+            bits += 1
+        self._shift = 64 - bits
+        mask = (1 << bits) - 1
+        table = array('i', [_EMPTY]) * (1 << bits)
+        for index, code in enumerate(self.codes):
+            if code == _EMPTY:
+                continue
+            slot = self._slot(code)
+            while table[slot] != _EMPTY:
+                slot = (slot + 1) & mask
+            table[slot] = index
+        self._table = table
+        self._mask = mask
+
+    def find(self, udise_code):
+        """Row number for a UDISE code, or None"""
+        if not (udise_code.isdigit() and len(udise_code) == CODE_DIGITS):
+            return self._other_codes.get(udise_code)
+        code = int(udise_code)
+        table, codes, mask = self._table, self.codes, self._mask
+        slot = self._slot(code)
+        while True:
+            index = table[slot]
+            if index == _EMPTY:
+                return None
+            if codes[index] == code:
+                return index
+            slot = (slot + 1) & mask
+
+    def _code(self, index):
+        code = self.codes[index]
+        if code != _EMPTY:
+            return str(code).zfill(CODE_DIGITS)
+        return self._other_codes_by_index[index]
+
+    def school(self, index):
+        """The udise_schools row at a row number, as a dict"""
+        return {
+            'id': self.ids[index],
+            'udise_code': self._code(index),
+            'school_name': self.names[self.name_offsets[index]:self.name_offsets[index + 1]].decode('utf-8'),
+            'district': self.district_strings[self.district_ids[index]],
+            'block': self.block_strings[self.block_ids[index]],
+            'category': self.category_strings[self.category_ids[index]],
+            'area': self.area_strings[self.area_ids[index]],
+            'management': self.management_strings[self.management_ids[index]]
+        }
+
+    def get(self, udise_code):
+        """School dict for a UDISE code, or None"""
+        index = self.find(udise_code)
+        return None if index is None else self.school(index)
+
+    def districts(self):
+        """Every district with its block and school counts"""
+        return [{'district': district, 'blocks': len(blocks), 'schools': end - start}
+                for district, (start, end, blocks) in self.tree.items()]
+
+    def blocks(self, district):
+        """Blocks of a district with school counts, or None for an unknown district"""
+        node = self.tree.get(district)
+        if node is None:
+            return None
+        return [{'block': block, 'schools': end - start} for block, (start, end) in node[2].items()]
+
+    def schools(self, district, block, offset=0, limit=100):
+        """A slice of a block's schools (sorted by name) and the block total, or None"""
+        node = self.tree.get(district)
+        block_range = node[2].get(block) if node else None
+        if block_range is None:
+            return None
+        start, end = block_range
+        first = min(start + max(offset, 0), end)
+        return [self.school(i) for i in range(first, min(first + limit, end))], end - start
+
+
+def _dataset_version(conn):
+    row = conn.execute("SELECT version FROM dataset_versions WHERE name = 'udise_schools'").fetchone()
+    return row[0] if row else 0
+
+
+def load_directory(conn=None):
+    """Build a directory from the current udise_schools table"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        version = _dataset_version(conn)
+        rows = conn.execute('''
+            SELECT id, udise_code, school_name, district, block, category, area, management
+            FROM udise_schools
+            ORDER BY district, block, school_name, udise_code
+        ''')
+        return UdiseDirectory(rows, version)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+_directory = None
+_lock = threading.Lock()
+_checked_at = 0.0
+_check_seconds = Config.UDISE_DIRECTORY_CHECK_SECONDS
+_reloading = False
+
+
+def init_directory(config=Config):
+    """Load the process-wide directory now, with a configuration's check interval
+
+    Called before workers fork, the directory is shared copy-on-write.
+    """
+    global _check_seconds
+    _check_seconds = config.UDISE_DIRECTORY_CHECK_SECONDS
+    return reload_directory()
+
+
+def get_directory():
+    """The process-wide directory, loaded on first use
+
+    Every UDISE_DIRECTORY_CHECK_SECONDS the udise_schools dataset version
+    is compared with the loaded one; after an import in another process
+    the directory is rebuilt in the background while the old one keeps
+    serving.
+    """
+    global _directory, _checked_at
+    if _directory is None:
+        with _lock:
+            if _directory is None:
+                _directory = load_directory()
+                _checked_at = time.monotonic()
+        return _directory
+
+    if time.monotonic() - _checked_at >= _check_seconds:
+        _checked_at = time.monotonic()
+        conn = get_connection()
+        try:
+            changed = _dataset_version(conn) != _directory.version
+        finally:
+            conn.close()
+        if changed:
+            _reload_in_background()
+    return _directory
+
+
+def _reload_in_background():
+    global _reloading
+    with _lock:
+        if _reloading:
+            return
+        _reloading = True
+
+    def run():
+        global _reloading
+        try:
+            reload_directory()
+        finally:
+            _reloading = False
+
+    threading.Thread(target=run, name='udise-directory-reload', daemon=True).start()
+
+
+def reload_directory():
+    """Rebuild the directory now and swap it in"""
+    global _directory, _checked_at
+    directory = load_directory()
+    _directory = directory
+    _checked_at = time.monotonic()
+    print(f"UDISE directory loaded: {len(directory)} schools, {len(directory.tree)} districts")
+    return directory
+
+
+def reload_if_loaded():
+    """Reload the directory after an import in this process, if it is in use"""
+    if _directory is not None:
+        reload_directory()
+
+
+def _synthetic_rows(count):
+    """Sorted rows shaped like a national list (~750 districts, ~7000 blocks)"""
+    districts = [f'DISTRICT {i:03d}' for i in range(750)]
+    per_district = count // len(districts) + 1
+    index = 0
+    for district_number, district in enumerate(districts):
+        for i in range(per_district):
+            if index >= count:
+                return
+            block = f'{district} BLOCK {i * 9 // per_district}'
+            yield (index + 1, f'{(district_number + 1) * 10 ** 8 + i:011d}',
+                   f'GOVT SCHOOL {district_number}-{i:05d}', district, block,
+                   ('Primary', 'Upper Primary', 'Secondary')[i % 3],
+                   ('Rural', 'Urban')[i % 2], 'Government')
+            index += 1
+
+
+def benchmark(count=1500000):
+    """Measure the memory and lookup cost of a national-size directory"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    directory = UdiseDirectory(_synthetic_rows(count))
+    build = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{len(directory):,} schools, {len(directory.tree)} districts: built in {build:.1f}s, "
+          f"{current / 2 ** 20:.1f} MiB resident ({current / len(directory):.0f} B/school), "
+          f"{peak / 2 ** 20:.1f} MiB peak")
+
+    # The same rows as one dict per school keyed by code, for comparison
+    sample = min(count, 100000)
+    tracemalloc.start()
+    naive = {row[1]: dict(zip(('id', 'udise_code', 'school_name', 'district', 'block',
+                                'category', 'area', 'management'), row))
+             for row in _synthetic_rows(sample)}
+    naive_bytes = tracemalloc.get_traced_memory()[0] / len(naive)
+    tracemalloc.stop()
+    print(f"dict-of-dicts for comparison: {naive_bytes:.0f} B/school "
+          f"(~{naive_bytes * count / 2 ** 20:.0f} MiB for {count:,})")
+
+    codes = [directory._code(i) for i in range(0, len(directory), max(1, len(directory) // 100000))]
+    start = time.perf_counter()
+    for code in codes:
+        directory.get(code)
+    lookup = (time.perf_counter() - start) / len(codes)
+    print(f"lookup by code: {lookup * 1e6:.2f} us")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--benchmark']:
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 1500000)
+    else:
+        print(__doc__.strip())
@@ -0,0 +1,313 @@
+"""
+Bulk UDISE school importer for Shiksha Leap
+Streams a (optionally gzipped) CSV into a staging table in chunks, then
+upserts udise_schools by udise_code and deletes schools missing from the
+file, all in one transaction. Under WAL, readers keep seeing the old data
+until the single commit, so lookups never see a half-loaded table.
+
+A file missing required columns is rejected before anything is staged, and
+the delete step refuses to run when the file has no schools or would remove
+more than MAX_DELETE_FRACTION of the table (a truncated or wrong file);
+pass --keep-missing to import such a file without deleting.
+
+Usage: python udise_import.py [path.csv[.gz]] [--keep-missing]
+       python udise_import.py --benchmark [rows]
+       python udise_import.py --check
+"""
+
+import csv
+import gzip
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from db_pool import get_connection
+
+CHUNK_SIZE = 5000
+
+# CSV header -> udise_schools column
+CSV_COLUMNS = {
+    'UDISE_Code': 'udise_code',
+    'School_Name': 'school_name',
+    'District': 'district',
+    'Block': 'block',
+    'Category': 'category',
+    'Area': 'area',
+    'Management': 'management'
+}
+
+_DATA_COLUMNS = ('school_name', 'district', 'block', 'category', 'area', 'management')
+
+# Headers a UDISE CSV must have; the others may be missing or empty
+REQUIRED_HEADERS = ('UDISE_Code', 'School_Name', 'District', 'Block')
+
+# Refuse imports that would delete more than this share of the current schools
+MAX_DELETE_FRACTION = 0.5
+
+
+def open_csv(path):
+    """Open a CSV file for reading text, transparently un-gzipping it"""
+    with open(path, 'rb') as f:
+        is_gzip = f.read(2) == b'\x1f\x8b'
+    if is_gzip:
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def read_rows(path):
+    """Yield (udise_code, school_name, district, block, category, area, management);
+    raises ValueError if the file lacks a required header"""
+    with open_csv(path) as file:
+        reader = csv.DictReader(file)
+        missing = [header for header in REQUIRED_HEADERS if header not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{path} is missing UDISE columns: {', '.join(missing)}")
+        for row in reader:
+            code = (row.get('UDISE_Code') or '').strip()
+            if not code:
+                continue
+            yield (
+                code,
+                row['School_Name'].strip(),
+                row['District'].strip(),
+                row['Block'].strip(),
+                (row.get('Category') or '').strip(),
+                (row.get('Area') or '').strip(),
+                (row.get('Management') or '').strip()
+            )
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_schools(path='a.csv', delete_missing=True, chunk_size=CHUNK_SIZE, conn=None):
+    """Import a UDISE CSV; returns inserted/updated/unchanged/deleted counts.
+    Raises ValueError (nothing is changed) for a file without the required
+    headers, or one whose deletions would empty most of the table"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+
+    staged_differs = ' OR '.join(f's.{column} IS NOT u.{column}' for column in _DATA_COLUMNS)
+    upsert_differs = ' OR '.join(f'udise_schools.{column} IS NOT excluded.{column}' for column in _DATA_COLUMNS)
+    upsert_assignments = ', '.join(f'{column} = excluded.{column}' for column in _DATA_COLUMNS)
+
+    try:
+        conn.execute('DROP TABLE IF EXISTS temp.udise_import')
+        conn.execute('''
+        CREATE TEMP TABLE udise_import (
+            udise_code TEXT PRIMARY KEY,
+            school_name TEXT NOT NULL,
+            district TEXT NOT NULL,
+            block TEXT NOT NULL,
+            category TEXT,
+            area TEXT,
+            management TEXT
+        )''')
+
+        # Everything below is one write transaction: the live table only
+        # changes at the final commit
+        conn.execute('BEGIN IMMEDIATE')
+
+        # Later rows for the same code win, like the old row-by-row import
+        for chunk in _chunks(read_rows(path), chunk_size):
+            conn.executemany('''
+                INSERT OR REPLACE INTO temp.udise_import
+                (udise_code, school_name, district, block, category, area, management)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', chunk)
+
+        counts = {'rows': conn.execute('SELECT COUNT(*) FROM temp.udise_import').fetchone()[0]}
+        counts['inserted'] = conn.execute('''
+            SELECT COUNT(*) FROM temp.udise_import u
+            WHERE NOT EXISTS (SELECT 1 FROM udise_schools s WHERE s.udise_code = u.udise_code)
+        ''').fetchone()[0]
+        counts['updated'] = conn.execute(f'''
+            SELECT COUNT(*) FROM temp.udise_import u
+            JOIN udise_schools s ON s.udise_code = u.udise_code
+            WHERE {staged_differs}
+        ''').fetchone()[0]
+        counts['unchanged'] = counts['rows'] - counts['inserted'] - counts['updated']
+
+        if delete_missing:
+            existing = conn.execute('SELECT COUNT(*) FROM udise_schools').fetchone()[0]
+            missing = existing - (counts['rows'] - counts['inserted'])
+            if existing and (counts['rows'] == 0 or missing > existing * MAX_DELETE_FRACTION):
+                raise ValueError(f"{path} would delete {missing} of {existing} schools; "
+                                 f"refusing (use --keep-missing to import without deleting)")
+            counts['deleted'] = conn.execute('''
+                DELETE FROM udise_schools
+                WHERE udise_code NOT IN (SELECT udise_code FROM temp.udise_import)
+            ''').rowcount
+        else:
+            counts['deleted'] = 0
+
+        # Upsert only rows that actually changed, so unchanged schools keep
+        # their ids and don't churn the search index
+        conn.execute(f'''
+            INSERT INTO udise_schools
+            (udise_code, school_name, district, block, category, area, management)
+            SELECT udise_code, school_name, district, block, category, area, management
+            FROM temp.udise_import u WHERE true
+            ON CONFLICT (udise_code) DO UPDATE SET {upsert_assignments}
+            WHERE {upsert_differs}
+        ''')
+
+        # Tells workers to reload their in-memory directory (udise_directory.py)
+        if counts['inserted'] or counts['updated'] or counts['deleted']:
+            conn.execute('''
+                INSERT INTO dataset_versions (name, version) VALUES ('udise_schools', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+            ''')
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute('DROP TABLE IF EXISTS temp.udise_import')
+        if own_conn:
+            conn.close()
+
+    return counts
+
+
+def generate_csv(path, rows, seed=42):
+    """Write a synthetic gzipped UDISE CSV for benchmarking"""
+    rng = random.Random(seed)
+    districts = [f'DISTRICT {i}' for i in range(30)]
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(CSV_COLUMNS))
+        for i in range(rows):
+            district = rng.choice(districts)
+            writer.writerow([
+                f'21{i:09d}',
+                f'SCHOOL {rng.randint(1, 99999)} {"PS" if i % 3 else "HS"}',
+                district,
+                f'{district} BLOCK {rng.randint(1, 12)}',
+                rng.choice(['Primary', 'Upper Primary', 'Secondary']),
+                rng.choice(['Rural', 'Urban']),
+                'Government'
+            ])
+
+
+def benchmark(rows=500000):
+    """Time a fresh import, a no-op re-import and a 1% change re-import"""
+    from config import Config
+    from database import init_db
+    from db_pool import init_pool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        Config.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        init_pool(Config)
+        init_db()
+
+        csv_path = os.path.join(tmp, 'udise.csv.gz')
+        start = time.perf_counter()
+        generate_csv(csv_path, rows)
+        print(f"Generated {rows} rows in {time.perf_counter() - start:.1f}s")
+
+        for label in ('initial import', 're-import, no changes'):
+            start = time.perf_counter()
+            counts = import_schools(csv_path)
+            elapsed = time.perf_counter() - start
+            print(f"{label}: {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s) {counts}")
+
+        # Change 1% of the schools and drop the last 1%
+        changed_path = os.path.join(tmp, 'udise_changed.csv.gz')
+        with open_csv(csv_path) as src, gzip.open(changed_path, 'wt', encoding='utf-8', newline='') as dst:
+            reader, writer = csv.reader(src), csv.writer(dst)
+            writer.writerow(next(reader))
+            for i, row in enumerate(reader):
+                if i >= rows * 0.99:
+                    break
+                if i % 100 == 0:
+                    row[1] += ' (RENAMED)'
+                writer.writerow(row)
+
+        start = time.perf_counter()
+        counts = import_schools(changed_path)
+        elapsed = time.perf_counter() - start
+        print(f"re-import, 1% changed / 1% removed: {elapsed:.2f}s {counts}")
+
+
+def check():
+    """Import into a scratch database, then verify bad files change nothing"""
+    from config import Config
+    from database import init_db
+    from db_pool import init_pool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        Config.DATABASE_PATH = os.path.join(tmp, 'check.db')
+        init_pool(Config)
+        init_db()
+
+        good = os.path.join(tmp, 'udise.csv.gz')
+        generate_csv(good, 100)
+        counts = import_schools(good)
+        assert counts['inserted'] == 100, counts
+
+        def school_count():
+            conn = get_connection()
+            try:
+                return conn.execute('SELECT COUNT(*) FROM udise_schools').fetchone()[0]
+            finally:
+                conn.close()
+
+        # Lowercase headers: rejected before staging
+        bad_header = os.path.join(tmp, 'lowercase.csv')
+        with open(bad_header, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([header.lower() for header in CSV_COLUMNS])
+            writer.writerow(['21000000001', 'SCHOOL', 'DISTRICT', 'BLOCK', '', '', ''])
+        # Right headers, no schools: would delete everything
+        empty = os.path.join(tmp, 'empty.csv')
+        with open(empty, 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerow(list(CSV_COLUMNS))
+        # A truncated file: would delete 90% of the schools
+        truncated = os.path.join(tmp, 'truncated.csv')
+        with open_csv(good) as src, open(truncated, 'w', encoding='utf-8', newline='') as dst:
+            dst.writelines(list(src)[:11])
+
+        for path in (bad_header, empty, truncated):
+            try:
+                import_schools(path)
+            except ValueError as e:
+                print(f"rejected: {e}")
+            else:
+                raise AssertionError(f'{path} was imported')
+            assert school_count() == 100, f'{path} changed the table'
+
+        # Importing without deleting is still allowed
+        assert import_schools(truncated, delete_missing=False)['deleted'] == 0
+        assert school_count() == 100
+        print("OK: bad-header, empty and truncated files left all 100 schools in place")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args and args[0] == '--benchmark':
+        benchmark(int(args[1]) if len(args) > 1 else 500000)
+    elif args[:1] == ['--check']:
+        check()
+    else:
+        keep_missing = '--keep-missing' in args
+        paths = [arg for arg in args if not arg.startswith('--')]
+        try:
+            counts = import_schools(paths[0] if paths else 'a.csv', delete_missing=not keep_missing)
+        except ValueError as e:
+            print(f"Import failed, nothing changed: {e}")
+            sys.exit(1)
+        print(f"Imported UDISE data: {counts}")
@@ -0,0 +1,10 @@
+"""
+WSGI entry point for Shiksha Leap
+Run with several worker processes sharing one SQLite file:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from app import create_app
+
+app = create_app()